@@ -1,18 +1,152 @@
-from fastapi import Depends, HTTPException, status
+import asyncio
+import hashlib
+import hmac
+import time
+from typing import Optional
+
+import httpx
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.database import supabase
+from jose import JWTError, jwt
+
+from app.cache import TTLCache
+from app.config import settings
+from app.http import get_http_clients
 
 bearer_scheme = HTTPBearer()
 
+JWKS_PATH = "/.well-known/jwks.json"
+ASYMMETRIC_ALGORITHMS = {"ES256", "RS256"}
+
+# Don't hit the JWKS endpoint more than this often when a token names an unknown key
+JWKS_MIN_REFRESH_INTERVAL = 30
+
+
+class SigningKeys:
+    """The project's asymmetric JWT signing keys, loaded from its JWKS endpoint.
+
+    Keys are refetched every `refresh_interval` seconds, and early when a token
+    references a key id we haven't seen (e.g. after a key rotation).
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._keys: dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, kid: Optional[str], client: httpx.AsyncClient) -> Optional[dict]:
+        age = time.monotonic() - self._fetched_at
+        if age > self.refresh_interval or (kid not in self._keys and age > JWKS_MIN_REFRESH_INTERVAL):
+            await self.refresh(client)
+        return self._keys.get(kid)
+
+    async def refresh(self, client: httpx.AsyncClient) -> None:
+        async with self._lock:
+            if time.monotonic() - self._fetched_at < JWKS_MIN_REFRESH_INTERVAL:
+                return  # another request refreshed while we waited
+            self._fetched_at = time.monotonic()
+            try:
+                res = await client.get(JWKS_PATH)
+                res.raise_for_status()
+                keys = res.json().get("keys", [])
+            except (httpx.HTTPError, ValueError):
+                return  # keep the keys we have; unknown tokens fall back to the auth server
+            self._keys = {k["kid"]: k for k in keys if k.get("kid")}
+
+
+signing_keys = SigningKeys(settings.jwks_refresh_interval)
+_verified_tokens = TTLCache(ttl=settings.auth_cache_ttl, max_entries=settings.auth_cache_max_entries)
+
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _verify_locally(token: str, request: Request) -> Optional[dict]:
+    """Check a token's signature and expiry without calling Supabase.
+
+    Returns the token's claims, or None when it can't be checked locally (no
+    secret configured, unknown algorithm or key id). Raises JWTError when the
+    token is checked and rejected.
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        key = settings.supabase_jwt_secret
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        key = await signing_keys.get(header.get("kid"), get_http_clients(request)["supabase_auth"])
+    else:
+        key = None
+    if not key:
+        return None
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience="authenticated",
+        options={"require_exp": True, "require_sub": True},
+    )
+    if claims.get("role") != "authenticated":
+        raise JWTError("Not a user access token")
+    return claims
+
+
+async def _verify_remotely(token: str, request: Request) -> dict:
+    # Supabase Auth's GET /user, through the shared (and timed) auth client
+    response = await get_http_clients(request)["supabase_auth"].get(
+        "/user",
+        headers={"apikey": settings.supabase_anon_key, "Authorization": f"Bearer {token}"},
+    )
+    if response.status_code in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+    response.raise_for_status()
+    user = response.json()
+    if not user.get("id"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+    return {"id": user["id"], "email": user.get("email"), "token": token}
+
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ) -> dict:
     token = credentials.credentials
+    if settings.auth_mode != "local":
+        try:
+            return await _verify_remotely(token, request)
+        except HTTPException:
+            raise
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+
+    cache_key = _token_cache_key(token)
+    user = _verified_tokens.get(cache_key)
+    if user is not None:
+        return user
+
     try:
-        response = supabase.auth.get_user(token)
-        if response.user is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-        return {"id": response.user.id, "email": response.user.email, "token": token}
+        claims = await _verify_locally(token, request)
+        if claims is not None:
+            user = {"id": claims["sub"], "email": claims.get("email"), "token": token}
+            expires_at = claims["exp"]
+        else:
+            user = await _verify_remotely(token, request)
+            expires_at = jwt.get_unverified_claims(token).get("exp", 0)
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+
+    _verified_tokens.set(cache_key, user, ttl=expires_at - time.time())
+    return user
+
+
+def require_metrics_token(request: Request) -> None:
+    # Operational endpoints (/metrics, cache and lookup stats) are for scrapers,
+    # not users: closed unless METRICS_TOKEN is set, and then only with it
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {settings.metrics_token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
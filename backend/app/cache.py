@@ -0,0 +1,227 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from app.database import db
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after a time-to-live (seconds)."""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MemoryCacheBackend:
+    """UserCache's default backend: a TTLCache in this process."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self._entries = TTLCache(ttl=ttl, max_entries=max_entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self._entries.delete(key)
+
+
+class UserCache:
+    """Per-user values that rarely change, read through and dropped on every write to them.
+
+    Entries live for `ttl` seconds in `backend`, by default this process's
+    memory. With several workers, a write only invalidates the worker that
+    served it and the others keep the old value until it expires; to
+    invalidate everywhere, pass a backend shared between workers (any object
+    with async `get`, `set(key, value, ttl)` and `delete`, e.g. over Redis)
+    that stores JSON-compatible values. Backend failures only cost a miss.
+
+    Each user also has a generation key in the backend, replaced by every
+    invalidate. Entries record the generation they were loaded under and only
+    count as hits while it's still current, so a slow load that raced a write,
+    in this worker or another, can't put the old value back.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 10000, backend: Any = None):
+        self.name = name
+        self.ttl = ttl
+        # Outlives any entry stored under the generation it replaced
+        self.generation_ttl = 2 * ttl
+        self.backend = backend or MemoryCacheBackend(self.generation_ttl, max_entries)
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.name}:{user_id}"
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"{self.name}:{user_id}:generation"
+
+    async def get_or_load(self, user_id: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            entry, generation = await asyncio.gather(
+                self.backend.get(self._key(user_id)),
+                self.backend.get(self._generation_key(user_id)),
+            )
+        except Exception:
+            self.stats["errors"] += 1
+            # Without the current generation, the loaded value can't be stored safely
+            entry = generation = None
+            cacheable = False
+        else:
+            cacheable = True
+        if entry is not None and entry["generation"] == generation:
+            self.stats["hits"] += 1
+            return entry["value"]
+        self.stats["misses"] += 1
+        value = await load()
+        if cacheable:
+            try:
+                await self.backend.set(self._key(user_id), {"generation": generation, "value": value}, self.ttl)
+            except Exception:
+                self.stats["errors"] += 1
+        return value
+
+    async def invalidate(self, user_id: str) -> None:
+        results = await asyncio.gather(
+            self.backend.set(self._generation_key(user_id), uuid.uuid4().hex, self.generation_ttl),
+            self.backend.delete(self._key(user_id)),
+            return_exceptions=True,
+        )
+        self.stats["errors"] += sum(isinstance(r, Exception) for r in results)
+
+
+class PostgresCacheStore:
+    """Persistent cache tier: a `(key text, value jsonb, fetched_at timestamptz)` table."""
+
+    def __init__(self, table: str):
+        self.table = table
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        res = await db.table(self.table).select("value, fetched_at").eq("key", key).limit(1).execute()
+        if not res.data:
+            return None
+        row = res.data[0]
+        return row["value"], datetime.fromisoformat(row["fetched_at"]).timestamp()
+
+    async def set(self, key: str, value: Any, fetched_at: float) -> None:
+        await db.table(self.table).upsert({
+            "key": key,
+            "value": value,
+            "fetched_at": datetime.fromtimestamp(fetched_at, timezone.utc).isoformat(),
+        }).execute()
+
+
+class StaleWhileRevalidateCache:
+    """Cache for slow upstream lookups.
+
+    Entries are fresh for `ttl` seconds and then served stale for up to
+    `stale_ttl` more while a background task refreshes them. Concurrent misses
+    for the same key share one upstream fetch. Misses in memory fall through to
+    the optional persistent `store`, which survives restarts and is shared
+    between workers; store failures only cost a cache miss.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int, store: Optional[PostgresCacheStore] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.store = store
+        self.stats = {"hits": 0, "stale_hits": 0, "store_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+        self._memory = TTLCache(ttl=ttl + stale_ttl, max_entries=max_entries)
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._memory.get(key)
+        if entry is None and self.store is not None:
+            entry = await self._load(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self.stats["refreshes"] += 1
+                    self._start_fetch(key, fetch).add_done_callback(self._swallow_error)
+                return value
+        self.stats["misses"] += 1
+        task = self._inflight.get(key) or self._start_fetch(key, fetch)
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch_and_store(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        fetched_at = time.time()
+        self._memory.set(key, (value, fetched_at))
+        if self.store is not None:
+            try:
+                await self.store.set(key, value, fetched_at)
+            except Exception:
+                self.stats["errors"] += 1
+        return value
+
+    async def _load(self, key: str) -> Optional[tuple[Any, float]]:
+        try:
+            entry = await self.store.get(key)
+        except Exception:
+            self.stats["errors"] += 1
+            return None
+        if entry is not None:
+            self.stats["store_hits"] += 1
+            remaining = entry[1] + self.ttl + self.stale_ttl - time.time()
+            self._memory.set(key, entry, ttl=remaining)
+        return entry
+
+    def _swallow_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "entries": len(self._memory)}
@@ -0,0 +1,71 @@
+"""Load the USDA Branded Foods CSV download into the local UPC index.
+
+Fills upc_products from branded_food.csv, so scans of those products resolve
+without calling USDA or Open Food Facts. Names and nutrients come from the
+fdc_foods mirror, which is loaded from the same download first (the passes of
+app.commands.import_fdc; pass --skip-foods if it's already been imported
+there). Barcodes are then streamed through the import_branded_upcs RPC in
+batches, which joins them to the mirror, so memory use doesn't grow with the
+download. When several foods share a barcode, the most recent FDC record
+(highest fdc_id) wins. Safe to re-run with a newer download: rows are upserted
+by normalized UPC.
+
+    cd backend
+    python -m app.commands.import_branded_upcs ~/Downloads/FoodData_Central_branded_food_csv_2024-04-18.zip
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from app.commands.import_fdc import import_foods, import_nutrients
+from app.database import db
+from app.fdc_csv import read_rows
+
+
+async def import_products(source: Path, batch_size: int) -> None:
+    batch: list[dict] = []
+    sent = upserted = 0
+
+    async def flush():
+        nonlocal sent, upserted
+        res = await db.rpc("import_branded_upcs", {"p_rows": batch}).execute()
+        sent += len(batch)
+        upserted += res.data[0]["upserted_count"]
+        print(f"  barcodes: {sent}", end="\r", flush=True)
+        batch.clear()
+
+    for row in read_rows(source, "branded_food.csv"):
+        upc = row["gtin_upc"].strip()
+        normalized = upc.lstrip("0")
+        if not normalized.isdigit():
+            continue
+        batch.append({"upc_normalized": normalized, "upc": upc, "fdc_id": int(row["fdc_id"])})
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    # Fewer than sent: barcodes shared by several foods, and foods missing from fdc_foods
+    print(f"  barcodes: {sent}, products written: {upserted}")
+
+
+async def run(source: Path, skip_foods: bool, batch_size: int) -> None:
+    try:
+        if not skip_foods:
+            await import_foods(source, None, batch_size)
+            await import_nutrients(source, None, batch_size)
+        await import_products(source, batch_size)
+    finally:
+        await db.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the USDA Branded Foods CSV download into upc_products.")
+    parser.add_argument("source", type=Path, help="the download's .zip file, or the directory it was extracted to")
+    parser.add_argument("--skip-foods", action="store_true", help="the download is already in fdc_foods (imported with app.commands.import_fdc)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.source, args.skip_foods, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Load USDA FoodData Central CSV downloads into the local fdc_foods mirror.
+
+Pass one or more downloads (Foundation, SR Legacy, FNDDS, Branded, or the full
+dataset) as zip files or extracted directories. Both passes stream: foods are
+upserted from food.csv in batches, then food_nutrient.csv is streamed through
+the import_fdc_nutrients RPC, so memory use doesn't grow with the download.
+
+For the monthly refresh, import the new release with --incremental: only foods
+published on or after the newest publication_date already in the mirror for
+their data_type are sent. Each type keeps its own watermark because Branded
+releases monthly while Foundation, SR Legacy and FNDDS release far less often.
+Foods USDA withdraws are not deleted; reimport in full to prune them.
+
+    cd backend
+    python -m app.commands.import_fdc ~/Downloads/FoodData_Central_sr_legacy_food_csv_2018-04.zip
+    python -m app.commands.import_fdc --incremental ~/Downloads/FoodData_Central_branded_food_csv_2024-10-31.zip
+"""
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+from app.database import db
+from app.fdc_csv import NUTRIENT_COLUMNS, read_rows
+
+# food.csv data_type values that /usda/search serves
+DATA_TYPES = {"foundation_food", "sr_legacy_food", "survey_fndds_food", "branded_food"}
+
+
+async def _latest_publication_date(data_type: str) -> Optional[str]:
+    res = await (
+        db.table("fdc_foods")
+        .select("publication_date")
+        .eq("data_type", data_type)
+        .not_.is_("publication_date", "null")
+        .order("publication_date", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return res.data[0]["publication_date"] if res.data else None
+
+
+async def _latest_publication_dates() -> dict[str, Optional[str]]:
+    """The mirror's newest publication_date for each data_type."""
+    types = sorted(DATA_TYPES)
+    dates = await asyncio.gather(*(_latest_publication_date(t) for t in types))
+    return dict(zip(types, dates))
+
+
+async def import_foods(source: Path, since: Optional[dict[str, Optional[str]]], batch_size: int) -> Optional[set[str]]:
+    """Upsert food.csv; returns the imported fdc_ids when filtering by date, else None.
+
+    `since` maps each data_type to the oldest publication_date to import; a type
+    mapped to None (nothing in the mirror yet) is imported in full.
+    """
+    imported: Optional[set[str]] = set() if since is not None else None
+    batch: list[dict] = []
+    count = 0
+
+    async def flush():
+        nonlocal count
+        await db.table("fdc_foods").upsert(batch, on_conflict="fdc_id").execute()
+        count += len(batch)
+        print(f"  foods: {count}", end="\r", flush=True)
+        batch.clear()
+
+    for row in read_rows(source, "food.csv"):
+        published = row.get("publication_date") or None
+        if row["data_type"] not in DATA_TYPES:
+            continue
+        watermark = since.get(row["data_type"]) if since is not None else None
+        if watermark and (published is None or published < watermark):
+            continue
+        if imported is not None:
+            imported.add(row["fdc_id"])
+        batch.append({
+            "fdc_id": int(row["fdc_id"]),
+            "data_type": row["data_type"],
+            "description": row["description"],
+            "publication_date": published,
+        })
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    print(f"  foods: {count}")
+    return imported
+
+
+async def import_nutrients(source: Path, fdc_ids: Optional[set[str]], batch_size: int) -> None:
+    wanted = {str(nutrient_id): column for nutrient_id, column in NUTRIENT_COLUMNS.items()}
+    # food_nutrient.csv lists a food's nutrients together, so merge them per food before
+    # sending; a food split across two batches is merged again by the RPC
+    batch: dict[str, dict] = {}
+    count = 0
+
+    async def flush():
+        nonlocal count
+        res = await db.rpc("import_fdc_nutrients", {"p_rows": list(batch.values())}).execute()
+        count += res.data[0]["updated_count"]
+        print(f"  nutrient updates: {count}", end="\r", flush=True)
+        batch.clear()
+
+    for row in read_rows(source, "food_nutrient.csv"):
+        column = wanted.get(row["nutrient_id"])
+        if column is None or (fdc_ids is not None and row["fdc_id"] not in fdc_ids):
+            continue
+        food = batch.setdefault(row["fdc_id"], {"fdc_id": int(row["fdc_id"])})
+        food[column] = round(float(row["amount"] or 0), 2)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    print(f"  nutrient updates: {count}")
+
+
+async def run(sources: list[Path], incremental: bool, batch_size: int) -> None:
+    try:
+        since = await _latest_publication_dates() if incremental else None
+        if since is not None:
+            for data_type, published in since.items():
+                print(f"Importing {data_type} published on or after {published or 'the beginning'}")
+        for source in sources:
+            print(source)
+            fdc_ids = await import_foods(source, since, batch_size)
+            await import_nutrients(source, fdc_ids, batch_size)
+    finally:
+        await db.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import USDA FoodData Central CSV downloads into fdc_foods.")
+    parser.add_argument("sources", type=Path, nargs="+", help="download .zip files, or the directories they were extracted to")
+    parser.add_argument("--incremental", action="store_true", help="only import foods as new as the mirror's latest of the same data_type, or newer")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.sources, args.incremental, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
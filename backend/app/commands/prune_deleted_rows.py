@@ -0,0 +1,35 @@
+"""Prune sync tombstones older than the retention window.
+
+Every delete of a synced row leaves a tombstone in deleted_rows, so offline
+clients can replay it on their next GET /sync. Run this daily (cron, or a
+scheduled job) to keep the table bounded: tombstones older than
+SYNC_TOMBSTONE_RETENTION_DAYS (or --days) are removed, and clients whose cursor
+predates them get 410 Gone from GET /sync and resync from scratch.
+
+    cd backend
+    python -m app.commands.prune_deleted_rows
+"""
+import argparse
+import asyncio
+
+from app.config import settings
+from app.database import db
+
+
+async def run(days: int) -> None:
+    try:
+        res = await db.rpc("prune_deleted_rows", {"p_older_than": f"{days} days"}).execute()
+        print(f"Pruned {res.data[0]['pruned_count']} tombstones older than {days} days")
+    finally:
+        await db.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune sync tombstones older than the retention window.")
+    parser.add_argument("--days", type=int, default=settings.sync_tombstone_retention_days, help="retention window (default: SYNC_TOMBSTONE_RETENTION_DAYS)")
+    args = parser.parse_args()
+    asyncio.run(run(args.days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Rebuild the daily_totals rollup from the meals table.
+
+The rollup is maintained by a trigger on meals; run this to backfill it, or to
+reconcile it after meals were changed with the trigger disabled.
+
+    cd backend
+    python -m app.commands.rebuild_daily_totals            # every user
+    python -m app.commands.rebuild_daily_totals --user ID  # one user
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+from app.database import db
+
+
+async def rebuild(user_id: Optional[str]) -> dict:
+    try:
+        res = await db.rpc("rebuild_daily_totals", {"p_user_id": user_id}).execute()
+    finally:
+        await db.aclose()
+    return res.data[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily_totals rollup from meals.")
+    parser.add_argument("--user", help="only rebuild this user's rows")
+    args = parser.parse_args()
+    result = asyncio.run(rebuild(args.user))
+    print(f"Rebuilt {result['day_count']} days across {result['user_count']} users")
+
+
+if __name__ == "__main__":
+    main()
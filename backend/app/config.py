@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -8,6 +10,61 @@ class Settings(BaseSettings):
     frontend_url: str = "http://localhost:5173"
     usda_api_key: str
 
+    # Auth: "local" verifies JWTs in-process, "remote" asks Supabase on every request
+    auth_mode: str = "local"
+    supabase_jwt_secret: Optional[str] = None  # legacy HS256 secret (Settings → API → JWT Secret)
+    auth_cache_ttl: int = 300
+    auth_cache_max_entries: int = 10000
+    jwks_refresh_interval: int = 600
+
+    # PostgREST connection pool
+    db_max_connections: int = 100
+    db_max_keepalive_connections: int = 50
+    db_timeout: float = 30.0
+
+    # Outbound APIs: one pooled client per upstream (see app/http.py)
+    usda_api_url: str = "https://api.nal.usda.gov/fdc/v1"
+    open_food_facts_url: str = "https://world.openfoodfacts.org"
+    usda_timeout: float = 20.0
+    open_food_facts_timeout: float = 10.0
+    auth_timeout: float = 5.0
+    http_connect_timeout: float = 5.0
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 30.0
+    http2: bool = True
+
+    # UPC lookup: "race" queries every source at once, "sequential" falls back one by one
+    upc_lookup_mode: str = "race"
+    upc_preferred_source: str = "usda"  # or "open_food_facts"
+
+    # USDA search: "api" (live FoodData Central), "local" (the fdc_foods mirror only),
+    # or "auto" (the mirror, falling back to the API when it has no matches)
+    usda_search_source: str = "api"
+
+    # USDA search cache: fresh for a day, then served stale while refreshing for a week
+    usda_cache_ttl: int = 86400
+    usda_cache_stale_ttl: int = 604800
+    usda_cache_max_entries: int = 2000
+    usda_cache_persistent: bool = False  # also keep results in the usda_search_cache table
+
+    # Per-user cache of the profile's default day type and the day types list
+    user_cache_ttl: int = 300
+    user_cache_max_entries: int = 10000
+
+    # Sync tombstones (deleted_rows) are pruned after this many days by
+    # app.commands.prune_deleted_rows; clients with older cursors resync in full
+    sync_tombstone_retention_days: int = 30
+
+    # Response compression, off by default (a fronting proxy often handles it):
+    # "gzip", or "auto" to prefer Brotli where the client accepts it
+    response_compression: str = "off"
+    compression_minimum_size: int = 1000
+
+    # GET /metrics (Prometheus text format) is only served when this is set, to
+    # scrapers sending it as a bearer token
+    metrics_token: Optional[str] = None
+
     class Config:
         env_file = ".env"
 
@@ -1,5 +1,35 @@
-from supabase import create_client, Client
+import httpx
+from postgrest import AsyncPostgrestClient
 from app.config import settings
+from app.metrics import InstrumentedTransport, db_duration, postgrest_labels
 
-supabase: Client = create_client(settings.supabase_url, settings.supabase_anon_key)
-supabase_admin: Client = create_client(settings.supabase_url, settings.supabase_service_role_key)
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client whose HTTP/2 connection pool is shared by every request."""
+
+    def create_session(self, base_url, headers, timeout, verify=True) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            verify=verify,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.db_max_connections,
+                max_keepalive_connections=settings.db_max_keepalive_connections,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=InstrumentedTransport(transport, db_duration, postgrest_labels),
+        )
+
+
+# Service-role client: bypasses RLS, so every query must scope rows to the caller itself
+db = PooledPostgrestClient(
+    f"{settings.supabase_url}/rest/v1",
+    headers={
+        "apikey": settings.supabase_service_role_key,
+        "Authorization": f"Bearer {settings.supabase_service_role_key}",
+    },
+    timeout=settings.db_timeout,
+)
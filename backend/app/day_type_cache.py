@@ -0,0 +1,31 @@
+from app.cache import UserCache
+from app.config import settings
+from app.database import db
+
+# Cleared by every write to the profile or the user's day types
+day_type_cache = UserCache("day_types", ttl=settings.user_cache_ttl, max_entries=settings.user_cache_max_entries)
+
+
+async def _load(user_id: str) -> dict:
+    # day_types relates to profiles both ways (its user_id and the profile's
+    # default), so the embed names the user_id foreign key
+    res = await (
+        db.table("profiles")
+        .select("default_day_type_id, day_types!day_types_user_id_fkey(*)")
+        .eq("id", user_id)
+        .execute()
+    )
+    profile = res.data[0] if res.data else {}
+    return {
+        "default_day_type_id": profile.get("default_day_type_id"),
+        "day_types": {dt["id"]: dt for dt in profile.get("day_types") or []},
+    }
+
+
+async def cached_day_types(user_id: str) -> dict:
+    """The profile's `default_day_type_id` and the user's `day_types` rows, keyed by id."""
+    return await day_type_cache.get_or_load(user_id, lambda: _load(user_id))
+
+
+async def invalidate_day_types(user_id: str) -> None:
+    await day_type_cache.invalidate(user_id)
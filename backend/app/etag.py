@@ -0,0 +1,54 @@
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from app.auth import get_current_user
+from app.database import db
+
+# Scope of resources shared by every user (the ingredients catalog)
+GLOBAL_SCOPE = "00000000-0000-0000-0000-000000000000"
+
+
+async def resource_etag(request: Request, scope: str, resources: tuple[str, ...]) -> str:
+    """Weak ETag for a read of `resources`: their change counters plus the request URL.
+
+    Counters are bumped by triggers on every write (see resource_versions in the
+    migrations). They're read before the data, so a write racing the read can
+    only make the tag older than the body, never newer.
+    """
+    res = await (
+        db.table("resource_versions")
+        .select("resource, version")
+        .eq("scope", scope)
+        .in_("resource", list(resources))
+        .execute()
+    )
+    versions = {row["resource"]: row["version"] for row in res.data or []}
+    tag = ",".join(f"{r}:{versions.get(r, 0)}" for r in resources)
+    url = request.url.path + ("?" + request.url.query if request.url.query else "")
+    return 'W/"' + hashlib.sha1(f"{url}|{tag}".encode()).hexdigest()[:20] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes don't matter
+    return etag.removeprefix("W/") in {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+
+
+def conditional(*resources: str, shared: bool = False):
+    """Dependency answering 304 Not Modified when If-None-Match still matches.
+
+    Otherwise the route runs as usual and its response carries the ETag.
+    "no-cache" lets browsers keep the body but revalidate it on every use.
+    """
+
+    async def check(request: Request, response: Response, user=Depends(get_current_user)):
+        etag = await resource_etag(request, GLOBAL_SCOPE if shared else user["id"], resources)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return check
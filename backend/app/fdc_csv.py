@@ -0,0 +1,39 @@
+"""Streaming readers for USDA FoodData Central CSV downloads.
+
+The downloads (https://fdc.nal.usda.gov/download-datasets) are zip files of
+several CSVs, the largest of which (food_nutrient.csv) runs to tens of
+millions of rows, so everything here reads one row at a time. `source` is
+either the zip itself or the directory it was extracted to.
+"""
+import csv
+import io
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from app.nutrients import NUTRIENT_FIELDS
+
+# food_nutrient.csv nutrient_id -> per-100g column in our tables
+NUTRIENT_COLUMNS = {nutrient_id: column for column, nutrient_id in NUTRIENT_FIELDS.items()}
+
+
+@contextmanager
+def _open(source: Path, name: str) -> Iterator[io.TextIOBase]:
+    if source.is_dir():
+        with open(source / name, newline="", encoding="utf-8") as f:
+            yield f
+        return
+    with zipfile.ZipFile(source) as archive:
+        # Members sit in a dated top-level folder, e.g. FoodData_Central_branded_food_csv_2024-04-18/
+        member = next((m for m in archive.namelist() if m.rsplit("/", 1)[-1] == name), None)
+        if member is None:
+            raise FileNotFoundError(f"{name} not found in {source}")
+        with archive.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def read_rows(source: Path, name: str) -> Iterator[dict]:
+    with _open(source, name) as f:
+        yield from csv.DictReader(f)
+
@@ -0,0 +1,54 @@
+import httpx
+from fastapi import Request
+
+from app.config import settings
+from app.metrics import InstrumentedTransport, upstream_duration, upstream_labels
+
+
+class HTTPClients:
+    """Long-lived httpx clients for outbound APIs, one connection pool per upstream host.
+
+    Created in the app's lifespan and handed to endpoints with
+    `Depends(get_http_clients)`, so lookups reuse keep-alive connections
+    instead of paying a TCP and TLS handshake each time.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def add(self, name: str, base_url: str, timeout: float, **kwargs) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            http2=settings.http2,  # negotiated via ALPN; falls back to HTTP/1.1
+        )
+        self._clients[name] = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=settings.http_connect_timeout),
+            transport=InstrumentedTransport(transport, upstream_duration, upstream_labels(name)),
+            **kwargs,
+        )
+        return self._clients[name]
+
+    def __getitem__(self, name: str) -> httpx.AsyncClient:
+        return self._clients[name]
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+def create_http_clients() -> HTTPClients:
+    clients = HTTPClients()
+    clients.add("usda", settings.usda_api_url, settings.usda_timeout)
+    clients.add("open_food_facts", settings.open_food_facts_url, settings.open_food_facts_timeout)
+    clients.add("supabase_auth", f"{settings.supabase_url}/auth/v1", settings.auth_timeout)
+    return clients
+
+
+def get_http_clients(request: Request) -> HTTPClients:
+    return request.app.state.http
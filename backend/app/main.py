@@ -1,9 +1,27 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from app import metrics
+from app.auth import require_metrics_token
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.routers import meals, profile, usda, recipes, ingredients, day_types
+from app.database import db
+from app.http import create_http_clients
+from app.pagination import NEXT_CURSOR_HEADER
+from app.routers import meals, profile, usda, recipes, ingredients, day_types, sync
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = create_http_clients()
+    yield
+    await app.state.http.aclose()
+    await db.aclose()
+
 
-app = FastAPI(title="Fuel API", version="0.1.0")
+app = FastAPI(title="Fuel API", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,16 +29,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+if settings.response_compression != "off":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        prefer_brotli=settings.response_compression == "auto",
+    )
+
+# Outermost, so the recorded latency includes every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(meals.router)
 app.include_router(profile.router)
 app.include_router(usda.router)
 app.include_router(recipes.router)
 app.include_router(ingredients.router)
 app.include_router(day_types.router)
+app.include_router(sync.router)
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
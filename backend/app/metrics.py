@@ -0,0 +1,152 @@
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """A labelled Prometheus histogram, rendered in the text exposition format."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., sum, count]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "fuel_http_request_duration_seconds",
+    "Time to serve an API request, by route template.",
+    ("method", "route", "status"),
+)
+request_db_calls = Histogram(
+    "fuel_http_request_db_calls",
+    "PostgREST round-trips made while serving one API request.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+db_duration = Histogram(
+    "fuel_db_request_duration_seconds",
+    "PostgREST call latency, by table (or rpc/<function>) and HTTP method.",
+    ("table", "method", "status"),
+)
+upstream_duration = Histogram(
+    "fuel_upstream_request_duration_seconds",
+    "Outbound API call latency, by upstream.",
+    ("upstream", "status"),
+)
+
+REGISTRY = (request_duration, request_db_calls, db_duration, upstream_duration)
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# PostgREST calls made by the request being served, for request_db_calls
+_db_calls: ContextVar[Optional[list[int]]] = ContextVar("db_calls", default=None)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport to time each call until its response headers arrive.
+
+    `labels` maps the request to the histogram's labels except the status.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, histogram: Histogram, labels: Callable[[httpx.Request], tuple[str, ...]]):
+        self._transport = transport
+        self._histogram = histogram
+        self._labels = labels
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            self._histogram.observe(time.perf_counter() - started, *self._labels(request), status)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def postgrest_labels(request: httpx.Request) -> tuple[str, str]:
+    calls = _db_calls.get()
+    if calls is not None:
+        calls[0] += 1
+    # /rest/v1/<table> or /rest/v1/rpc/<function>
+    table = request.url.path.split("/rest/v1/", 1)[-1]
+    return table, request.method
+
+
+def upstream_labels(name: str) -> Callable[[httpx.Request], tuple[str]]:
+    return lambda _request: (name,)
+
+
+class MetricsMiddleware:
+    """Records request_duration and request_db_calls for every HTTP request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        calls = [0]
+        token = _db_calls.set(calls)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _db_calls.reset(token)
+            # The route template, not the raw path, to keep label values bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_duration.observe(time.perf_counter() - started, scope["method"], route, status)
+            request_db_calls.observe(calls[0], scope["method"], route)
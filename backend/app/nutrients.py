@@ -0,0 +1,17 @@
+# Nutrient IDs in USDA FoodData Central
+NUTRIENT_ENERGY   = 1008
+NUTRIENT_PROTEIN  = 1003
+NUTRIENT_FAT      = 1004
+NUTRIENT_CARBS    = 1005
+NUTRIENT_FIBER    = 1079
+
+# Per-100g result fields and the nutrient each is read from. Tracking another
+# nutrient (e.g. sodium 1093, total sugars 2000, saturated fat 1258) is one entry
+# here plus the matching schema field; extraction stays one pass per food.
+NUTRIENT_FIELDS = {
+    "calories_per_100g": NUTRIENT_ENERGY,
+    "protein_per_100g": NUTRIENT_PROTEIN,
+    "carbs_per_100g": NUTRIENT_CARBS,
+    "fat_per_100g": NUTRIENT_FAT,
+    "fiber_per_100g": NUTRIENT_FIBER,
+}
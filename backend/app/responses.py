@@ -0,0 +1,18 @@
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def prevalidated(content: Any, response: Response) -> ORJSONResponse:
+    """Send `content` without FastAPI re-validating it against the route's response_model.
+
+    For hot list endpoints whose items are already models, or rows selected with
+    exactly the model's columns: the route keeps response_model for its OpenAPI
+    schema, but the body is only serialized once, by orjson. Headers set on the
+    route's injected `response` (ETag, X-Next-Cursor) are carried over.
+    """
+    if isinstance(content, list):
+        content = [item.model_dump() if isinstance(item, BaseModel) else item for item in content]
+    return ORJSONResponse(content, headers=dict(response.headers))
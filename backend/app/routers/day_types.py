@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from datetime import date
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
 
 from app.auth import get_current_user
-from app.database import supabase_admin
+from app.database import db
+from app.day_type_cache import cached_day_types, invalidate_day_types
+from app.etag import conditional
 from app.schemas.nutrition import DayTypeCreate, DayTypeUpdate, DayTypeResponse
 
 
@@ -13,10 +16,10 @@ class DayLogSet(BaseModel):
 router = APIRouter(prefix="/day-types", tags=["day_types"])
 
 
-@router.get("/", response_model=list[DayTypeResponse])
+@router.get("/", response_model=list[DayTypeResponse], dependencies=[Depends(conditional("day_types"))])
 async def get_day_types(user=Depends(get_current_user)):
-    res = (
-        supabase_admin.table("day_types")
+    res = await (
+        db.table("day_types")
         .select("*")
         .eq("user_id", user["id"])
         .order("name")
@@ -29,9 +32,10 @@ async def get_day_types(user=Depends(get_current_user)):
 async def create_day_type(data: DayTypeCreate, user=Depends(get_current_user)):
     payload = data.model_dump()
     payload["user_id"] = user["id"]
-    res = supabase_admin.table("day_types").insert(payload).execute()
+    res = await db.table("day_types").insert(payload).execute()
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to create day type")
+    await invalidate_day_types(user["id"])
     return DayTypeResponse(**res.data[0])
 
 
@@ -40,8 +44,8 @@ async def update_day_type(day_type_id: str, data: DayTypeUpdate, user=Depends(ge
     updates = data.model_dump(exclude_none=True)
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
-    res = (
-        supabase_admin.table("day_types")
+    res = await (
+        db.table("day_types")
         .update(updates)
         .eq("id", day_type_id)
         .eq("user_id", user["id"])
@@ -49,13 +53,14 @@ async def update_day_type(day_type_id: str, data: DayTypeUpdate, user=Depends(ge
     )
     if not res.data:
         raise HTTPException(status_code=404, detail="Day type not found")
+    await invalidate_day_types(user["id"])
     return DayTypeResponse(**res.data[0])
 
 
 @router.delete("/{day_type_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_day_type(day_type_id: str, user=Depends(get_current_user)):
-    res = (
-        supabase_admin.table("day_types")
+    res = await (
+        db.table("day_types")
         .delete()
         .eq("id", day_type_id)
         .eq("user_id", user["id"])
@@ -63,34 +68,39 @@ async def delete_day_type(day_type_id: str, user=Depends(get_current_user)):
     )
     if not res.data:
         raise HTTPException(status_code=404, detail="Day type not found")
+    await invalidate_day_types(user["id"])
 
 
 @router.put("/log/{logged_date}", response_model=DayTypeResponse)
 async def set_day_log(logged_date: date, body: DayLogSet, user=Depends(get_current_user)):
     day_type_id = body.day_type_id
 
-    # Verify the day type belongs to this user
-    dt_res = (
-        supabase_admin.table("day_types")
-        .select("*")
-        .eq("id", day_type_id)
-        .eq("user_id", user["id"])
-        .single()
-        .execute()
-    )
-    if not dt_res.data:
+    # Verify the day type belongs to this user; one created through another
+    # worker may not be in this worker's cache yet, so look again before a 404
+    day_type = (await cached_day_types(user["id"]))["day_types"].get(day_type_id)
+    if day_type is None:
+        await invalidate_day_types(user["id"])
+        day_type = (await cached_day_types(user["id"]))["day_types"].get(day_type_id)
+    if day_type is None:
         raise HTTPException(status_code=404, detail="Day type not found")
 
     # Upsert day_logs row
-    supabase_admin.table("day_logs").upsert({
-        "user_id": user["id"],
-        "logged_date": str(logged_date),
-        "day_type_id": day_type_id,
-    }).execute()
+    try:
+        await db.table("day_logs").upsert({
+            "user_id": user["id"],
+            "logged_date": str(logged_date),
+            "day_type_id": day_type_id,
+        }).execute()
+    except APIError as e:
+        # foreign_key_violation: deleted through another worker since it was cached
+        if e.code != "23503":
+            raise
+        await invalidate_day_types(user["id"])
+        raise HTTPException(status_code=404, detail="Day type not found")
 
-    return DayTypeResponse(**dt_res.data)
+    return DayTypeResponse(**day_type)
 
 
 @router.delete("/log/{logged_date}", status_code=status.HTTP_204_NO_CONTENT)
 async def clear_day_log(logged_date: date, user=Depends(get_current_user)):
-    supabase_admin.table("day_logs").delete().eq("user_id", user["id"]).eq("logged_date", str(logged_date)).execute()
+    await db.table("day_logs").delete().eq("user_id", user["id"]).eq("logged_date", str(logged_date)).execute()
@@ -1,23 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
 from app.auth import get_current_user
-from app.database import supabase_admin
+from app.database import db
+from app.etag import conditional
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.responses import prevalidated
 from app.schemas.nutrition import IngredientCreate, IngredientUpdate, IngredientResponse
 
 router = APIRouter(prefix="/ingredients", tags=["ingredients"])
 
 # TODO: Restrict write operations to admin users once a roles system is in place.
 
+# Exactly the response model's columns, so list rows can be sent without re-validation
+INGREDIENT_COLUMNS = tuple(IngredientResponse.model_fields)
+
+
+def _quote(value: str) -> str:
+    # PostgREST filter value, quoted so commas and parentheses in names are literal
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _cursor_id(value) -> str:
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search", response_model=list[IngredientResponse], dependencies=[Depends(conditional("ingredients", shared=True))])
+async def search_ingredients(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    _user=Depends(get_current_user),
+):
+    # Ranked substring search (see search_ingredients in the migrations); the
+    # cursor for the next page comes back in X-Next-Cursor
+    term = q.strip()
+    if not term:
+        raise HTTPException(status_code=400, detail="Query is empty")
+    params = {"p_query": term, "p_limit": limit + 1}
+    if cursor:
+        rank, name, ingredient_id = decode_cursor(cursor, 3)
+        if not isinstance(rank, int) or not isinstance(name, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        params.update(p_after_rank=rank, p_after_name=name, p_after_id=_cursor_id(ingredient_id))
+    res = await db.rpc("search_ingredients", params).execute()
+    matches = res.data or []
+    if len(matches) > limit:
+        matches = matches[:limit]
+        last = matches[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["rank"], last["ingredient"]["name"], last["ingredient"]["id"])
+    return prevalidated([{c: m["ingredient"][c] for c in INGREDIENT_COLUMNS} for m in matches], response)
+
 
-@router.get("/", response_model=list[IngredientResponse])
-async def list_ingredients(_user=Depends(get_current_user)):
-    res = supabase_admin.table("ingredients").select("*").order("name").execute()
-    return res.data or []
+@router.get("/export", response_model=list[IngredientResponse], dependencies=[Depends(conditional("ingredients", shared=True))])
+async def export_ingredients(
+    response: Response,
+    limit: int = Query(500, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    _user=Depends(get_current_user),
+):
+    # The whole catalog, a page at a time in (name, id) order
+    query = db.table("ingredients").select(", ".join(INGREDIENT_COLUMNS))
+    if cursor:
+        name, ingredient_id = decode_cursor(cursor, 2)
+        if not isinstance(name, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        ingredient_id = _cursor_id(ingredient_id)
+        query = query.or_(f"name.gt.{_quote(name)},and(name.eq.{_quote(name)},id.gt.{ingredient_id})")
+    res = await query.order("name").order("id").limit(limit + 1).execute()
+    rows = res.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["name"], rows[-1]["id"])
+    return prevalidated(rows, response)
 
 
 @router.post("/", response_model=IngredientResponse, status_code=status.HTTP_201_CREATED)
 async def create_ingredient(data: IngredientCreate, _user=Depends(get_current_user)):
-    res = supabase_admin.table("ingredients").insert(data.model_dump()).execute()
+    res = await db.table("ingredients").insert(data.model_dump()).execute()
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to create ingredient")
     return res.data[0]
@@ -28,8 +94,8 @@ async def update_ingredient(ingredient_id: str, data: IngredientUpdate, _user=De
     update = {k: v for k, v in data.model_dump().items() if v is not None}
     if not update:
         raise HTTPException(status_code=400, detail="No fields to update")
-    res = (
-        supabase_admin.table("ingredients")
+    res = await (
+        db.table("ingredients")
         .update(update)
         .eq("id", ingredient_id)
         .execute()
@@ -41,4 +107,4 @@ async def update_ingredient(ingredient_id: str, data: IngredientUpdate, _user=De
 
 @router.delete("/{ingredient_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_ingredient(ingredient_id: str, _user=Depends(get_current_user)):
-    supabase_admin.table("ingredients").delete().eq("id", ingredient_id).execute()
+    await db.table("ingredients").delete().eq("id", ingredient_id).execute()
@@ -1,71 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import date
-from supabase import create_client
-from collections import defaultdict
+import asyncio
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
+from datetime import date, timedelta
+from typing import Literal, Optional
 
 from app.auth import get_current_user
-from app.database import supabase_admin
-from app.schemas.nutrition import MealCreate, MealResponse, DailySummary, MealPortionUpdate, DayTypeResponse
+from app.database import db
+from app.day_type_cache import cached_day_types, invalidate_day_types
+from app.etag import conditional
+from app.responses import prevalidated
+from app.schemas.nutrition import MealBatchItem, MealCreate, MealResponse, DailySummary, DayTypeResponse, MealPortionUpdate
 
 router = APIRouter(prefix="/meals", tags=["meals"])
 
 
-@router.get("/day/{day}", response_model=DailySummary)
+@router.get("/day/{day}", response_model=DailySummary, dependencies=[Depends(conditional("meals", "day_types", "profile"))])
 async def get_day(day: date, user=Depends(get_current_user)):
-    response = (
-        supabase_admin.table("meals")
-        .select("*")
-        .eq("user_id", user["id"])
-        .eq("logged_date", str(day))
-        .order("created_at")
-        .execute()
-    )
-    meals = response.data or []
-
-    # Fetch day type assignment for this date
-    log_res = (
-        supabase_admin.table("day_logs")
-        .select("day_type_id, day_types(*)")
-        .eq("user_id", user["id"])
-        .eq("logged_date", str(day))
-        .limit(1)
-        .execute()
-    )
-    day_type = None
-    if log_res.data and log_res.data[0].get("day_types"):
-        day_type = DayTypeResponse(**log_res.data[0]["day_types"])
-
-    if day_type is None:
-        profile_res = (
-            supabase_admin.table("profiles")
-            .select("default_day_type_id")
-            .eq("id", user["id"])
-            .single()
-            .execute()
-        )
-        default_id = profile_res.data.get("default_day_type_id") if profile_res.data else None
-        if default_id:
-            dt_res = (
-                supabase_admin.table("day_types")
-                .select("*")
-                .eq("id", default_id)
-                .eq("user_id", user["id"])
-                .single()
-                .execute()
-            )
-            if dt_res.data:
-                day_type = DayTypeResponse(**dt_res.data)
-
-    return DailySummary(
-        date=day,
-        total_calories=sum(m["calories"] for m in meals),
-        total_protein=sum(m["protein_g"] or 0 for m in meals),
-        total_carbs=sum(m["carbs_g"] or 0 for m in meals),
-        total_fat=sum(m["fat_g"] or 0 for m in meals),
-        total_fiber=sum(m["fiber_g"] or 0 for m in meals),
-        meals=[MealResponse(**m) for m in meals],
-        day_type=day_type,
+    # Meals, SQL-side totals and the effective day type in a single round-trip
+    res = await db.rpc("get_daily_summary", {"p_user_id": user["id"], "p_date": str(day)}).execute()
+    return DailySummary(date=day, **res.data[0])
+
+
+# Six calendar weeks fit, while a range's meals stay well under PostgREST's row limit
+MAX_RANGE_DAYS = 62
+
+
+@router.get("/range", response_model=list[DailySummary])
+async def get_range(response: Response, start: date, end: date, user=Depends(get_current_user)):
+    # Every day from start to end, as GET /day/{day} would return it: meals and
+    # day logs for the whole range in one query each (concurrently), and the
+    # default day type from the per-user cache
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    days = (end - start).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    meals_res, logs_res, day_types = await asyncio.gather(
+        db.table("meals").select("*").eq("user_id", user["id"])
+        .gte("logged_date", str(start)).lte("logged_date", str(end))
+        .order("logged_date").order("created_at").execute(),
+        db.table("day_logs").select("logged_date, day_type_id").eq("user_id", user["id"])
+        .gte("logged_date", str(start)).lte("logged_date", str(end)).execute(),
+        cached_day_types(user["id"]),
     )
+    logged = {log["logged_date"]: log["day_type_id"] for log in logs_res.data}
+    if not set(filter(None, logged.values())) <= day_types["day_types"].keys():
+        # A day type created through another worker since this one cached the list
+        await invalidate_day_types(user["id"])
+        day_types = await cached_day_types(user["id"])
+
+    meals_by_day: dict[str, list[dict]] = {}
+    for meal in meals_res.data:
+        meals_by_day.setdefault(meal["logged_date"], []).append(meal)
+
+    summaries = []
+    for offset in range(days):
+        day = str(start + timedelta(days=offset))
+        meals = meals_by_day.get(day, [])
+        day_type = day_types["day_types"].get(logged.get(day) or day_types["default_day_type_id"])
+        summaries.append(DailySummary(
+            date=day,
+            total_calories=sum(m["calories"] for m in meals),
+            total_protein=round(sum(m["protein_g"] or 0 for m in meals), 1),
+            total_carbs=round(sum(m["carbs_g"] or 0 for m in meals), 1),
+            total_fat=round(sum(m["fat_g"] or 0 for m in meals), 1),
+            total_fiber=round(sum(m["fiber_g"] or 0 for m in meals), 1),
+            meals=[MealResponse(**m) for m in meals],
+            day_type=DayTypeResponse(**day_type) if day_type else None,
+        ))
+    return prevalidated(summaries, response)
 
 
 @router.post("/", response_model=MealResponse, status_code=status.HTTP_201_CREATED)
@@ -73,16 +76,56 @@ async def create_meal(meal: MealCreate, user=Depends(get_current_user)):
     payload = meal.model_dump()
     payload["user_id"] = user["id"]
     payload["logged_date"] = str(payload["logged_date"])
-    response = supabase_admin.table("meals").insert(payload).execute()
+    response = await db.table("meals").insert(payload).execute()
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to create meal")
     return MealResponse(**response.data[0])
 
 
+@router.post("/batch", response_model=list[MealResponse], status_code=status.HTTP_201_CREATED)
+async def create_meals(
+    meals: list[MealBatchItem] = Body(..., min_length=1, max_length=200),
+    user=Depends(get_current_user),
+):
+    # Repeated client keys within the batch log one meal
+    rows, keyed = [], set()
+    for meal in meals:
+        if meal.client_key in keyed:
+            continue
+        if meal.client_key:
+            keyed.add(meal.client_key)
+        payload = meal.model_dump()
+        payload["user_id"] = user["id"]
+        payload["logged_date"] = str(payload["logged_date"])
+        rows.append(payload)
+
+    # One bulk insert; rows whose client key was logged before (a retry) are skipped
+    res = await (
+        db.table("meals")
+        .upsert(rows, on_conflict="user_id,client_key", ignore_duplicates=True)
+        .execute()
+    )
+    by_key = {m["client_key"]: m for m in res.data if m.get("client_key")}
+    unkeyed = iter(m for m in res.data if not m.get("client_key"))
+
+    missing = keyed - by_key.keys()
+    if missing:
+        existing = await (
+            db.table("meals")
+            .select("*")
+            .eq("user_id", user["id"])
+            .in_("client_key", list(missing))
+            .execute()
+        )
+        by_key.update((m["client_key"], m) for m in existing.data)
+
+    return [MealResponse(**(by_key[meal.client_key] if meal.client_key else next(unkeyed))) for meal in meals]
+
+
 @router.patch("/{meal_id}/portion", response_model=MealResponse)
 async def update_meal_portion(meal_id: str, data: MealPortionUpdate, user=Depends(get_current_user)):
-    meal_res = (
-        supabase_admin.table("meals")
+    meal_res = await (
+        db.table("meals")
         .select("*")
         .eq("id", meal_id)
         .eq("user_id", user["id"])
@@ -109,8 +152,8 @@ async def update_meal_portion(meal_id: str, data: MealPortionUpdate, user=Depend
             update["fat_g"] = round(meal["fat_g"] * ratio, 1)
             update["fiber_g"] = round(meal["fiber_g"] * ratio, 1)
 
-    res = (
-        supabase_admin.table("meals")
+    res = await (
+        db.table("meals")
         .update(update)
         .eq("id", meal_id)
         .execute()
@@ -122,8 +165,8 @@ async def update_meal_portion(meal_id: str, data: MealPortionUpdate, user=Depend
 
 @router.delete("/{meal_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_meal(meal_id: str, user=Depends(get_current_user)):
-    response = (
-        supabase_admin.table("meals")
+    response = await (
+        db.table("meals")
         .delete()
         .eq("id", meal_id)
         .eq("user_id", user["id"])
@@ -134,22 +177,23 @@ async def delete_meal(meal_id: str, user=Depends(get_current_user)):
 
 
 @router.get("/history", response_model=list[dict])
-async def get_history(limit: int = 14, user=Depends(get_current_user)):
-    response = (
-        supabase_admin.table("meals")
-        .select("logged_date, calories, protein_g, carbs_g, fat_g, fiber_g")
-        .eq("user_id", user["id"])
-        .order("logged_date", desc=True)
-        .limit(limit * 10)
-        .execute()
-    )
-    rows = response.data or []
-    days: dict = defaultdict(lambda: {"calories": 0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0, "fiber_g": 0.0})
-    for row in rows:
-        d = row["logged_date"]
-        days[d]["calories"] += row["calories"]
-        days[d]["protein_g"] += row["protein_g"] or 0
-        days[d]["carbs_g"] += row["carbs_g"] or 0
-        days[d]["fat_g"] += row["fat_g"] or 0
-        days[d]["fiber_g"] += row["fiber_g"] or 0
-    return [{"date": d, **totals} for d, totals in sorted(days.items(), reverse=True)][:limit]
+async def get_history(
+    limit: Optional[int] = Query(None, ge=1),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Literal["day", "week", "month"] = "day",
+    user=Depends(get_current_user),
+):
+    # Without a date range, return the most recent `limit` periods that have meals
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    if limit is None and start is None and end is None:
+        limit = 14
+    res = await db.rpc("get_meal_history", {
+        "p_user_id": user["id"],
+        "p_start": str(start) if start else None,
+        "p_end": str(end) if end else None,
+        "p_bucket": group_by,
+        "p_limit": limit,
+    }).execute()
+    return res.data or []
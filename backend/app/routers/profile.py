@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.auth import get_current_user
-from app.database import supabase_admin
+from app.database import db
+from app.day_type_cache import invalidate_day_types
+from app.etag import conditional
 from app.schemas.nutrition import ProfileResponse, ProfileUpdate
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
 
-@router.get("/", response_model=ProfileResponse)
+@router.get("/", response_model=ProfileResponse, dependencies=[Depends(conditional("profile"))])
 async def get_profile(user=Depends(get_current_user)):
-    response = supabase_admin.table("profiles").select("*").eq("id", user["id"]).single().execute()
+    response = await db.table("profiles").select("*").eq("id", user["id"]).single().execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Profile not found")
     return ProfileResponse(**response.data)
@@ -19,7 +21,8 @@ async def update_profile(updates: ProfileUpdate, user=Depends(get_current_user))
     payload = updates.model_dump(exclude_none=True)
     if not payload:
         raise HTTPException(status_code=400, detail="No fields to update")
-    response = supabase_admin.table("profiles").update(payload).eq("id", user["id"]).execute()
+    response = await db.table("profiles").update(payload).eq("id", user["id"]).execute()
     if not response.data:
         raise HTTPException(status_code=500, detail="Update failed")
+    await invalidate_day_types(user["id"])
     return ProfileResponse(**response.data[0])
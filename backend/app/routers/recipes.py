@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import date
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from datetime import date, datetime
+from typing import Optional, Union
+from postgrest.exceptions import APIError
 
 from app.auth import get_current_user
-from app.database import supabase_admin
+from app.database import db
+from app.etag import conditional
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.responses import prevalidated
 from app.schemas.nutrition import (
     RecipeCreate,
     RecipeIngredientAdd,
@@ -11,6 +17,7 @@ from app.schemas.nutrition import (
     RecipeIngredientOverride,
     RecipeLogRequest,
     RecipeResponse,
+    RecipeSummary,
     RecipeUpdate,
     MealResponse,
     MealPortionUpdate,
@@ -19,314 +26,254 @@ from app.schemas.nutrition import (
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
 
-def _compute_totals(ingredients: list[dict]) -> dict:
-    checked = [i for i in ingredients if i.get("checked", True)]
-    return {
-        "total_calories": sum(i["quantity"] * i["calories_per_unit"] for i in checked),
-        "total_protein": sum(i["quantity"] * i["protein_per_unit"] for i in checked),
-        "total_carbs": sum(i["quantity"] * i["carbs_per_unit"] for i in checked),
-        "total_fat": sum(i["quantity"] * i["fat_per_unit"] for i in checked),
-        "total_fiber": sum(i["quantity"] * i["fiber_per_unit"] for i in checked),
-    }
+# Totals of the checked ingredients are maintained on the recipe row by a trigger
+SUMMARY_COLUMNS = "id, name, servings, last_cooked_weight, last_meal_type, total_calories, total_protein, total_carbs, total_fat, total_fiber"
 
 
 def _build_response(recipe: dict, ingredients: list[dict]) -> RecipeResponse:
-    totals = _compute_totals(ingredients)
     return RecipeResponse(
-        id=recipe["id"],
-        name=recipe["name"],
-        servings=recipe["servings"],
-        last_cooked_weight=recipe.get("last_cooked_weight"),
-        last_meal_type=recipe.get("last_meal_type"),
+        **RecipeSummary(**recipe).model_dump(),
         ingredients=[RecipeIngredientResponse(**i) for i in ingredients],
-        **totals,
     )
 
 
-def _get_recipe_or_404(recipe_id: str, user_id: str) -> dict:
-    res = (
-        supabase_admin.table("recipes")
-        .select("*")
-        .eq("id", recipe_id)
-        .eq("user_id", user_id)
-        .single()
-        .execute()
-    )
-    if not res.data:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    return res.data
+def _raise_for_rpc_error(e: APIError):
+    # Recipe RPCs raise no_data_found (P0002) for rows that don't exist or aren't
+    # the caller's; a malformed id (22P02) can't name one either
+    if e.code in ("P0002", "22P02"):
+        raise HTTPException(status_code=404, detail=e.message)
+    raise e
 
 
 @router.post("/", response_model=RecipeResponse, status_code=status.HTTP_201_CREATED)
 async def create_recipe(recipe: RecipeCreate, user=Depends(get_current_user)):
     payload = {**recipe.model_dump(), "user_id": user["id"]}
-    res = supabase_admin.table("recipes").insert(payload).execute()
+    res = await db.table("recipes").insert(payload).execute()
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to create recipe")
     return _build_response(res.data[0], [])
 
 
-@router.get("/", response_model=list[RecipeResponse])
-async def list_recipes(user=Depends(get_current_user)):
-    recipes_res = (
-        supabase_admin.table("recipes")
-        .select("*")
+def _with_ordered_ingredients(query):
+    # Embedded rows are ordered with "<embed>.order"; the client's foreign_table
+    # option renders "order=<embed>(column)", which sorts the parent rows instead
+    query.params = query.params.add("recipe_ingredients.order", "created_at")
+    return query
+
+
+def _returning(query, columns: str):
+    # Writes return "*" unless told otherwise; the client's update() and
+    # delete() take no select, so the representation's columns are set here
+    query.params = query.params.add("select", columns)
+    return query
+
+
+def _decode_recipe_cursor(cursor: str) -> tuple[str, str]:
+    created_at, recipe_id = decode_cursor(cursor, 2)
+    try:
+        datetime.fromisoformat(created_at)
+        uuid.UUID(recipe_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, recipe_id
+
+
+def _parse_fields(fields: str) -> list[str]:
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in RecipeResponse.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if not requested:
+        raise HTTPException(status_code=400, detail="No fields requested")
+    return requested
+
+
+@router.get("/", response_model=list[Union[RecipeResponse, RecipeSummary]], dependencies=[Depends(conditional("recipes"))])
+async def list_recipes(
+    response: Response,
+    summary: bool = False,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user=Depends(get_current_user),
+):
+    # Newest first, keyset-paginated on (created_at, id); the cursor for the
+    # next page comes back in X-Next-Cursor
+    requested = _parse_fields(fields) if fields else None
+    with_ingredients = not summary if requested is None else "ingredients" in requested
+    columns = SUMMARY_COLUMNS if requested is None else ", ".join(f for f in requested if f != "ingredients")
+    select = ", ".join(c for c in (columns, "id, created_at", "recipe_ingredients(*)" if with_ingredients else "") if c)
+
+    query = db.table("recipes").select(select).eq("user_id", user["id"])
+    if cursor:
+        created_at, recipe_id = _decode_recipe_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{recipe_id})')
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if with_ingredients:
+        query = _with_ordered_ingredients(query)
+    recipes = (await query.limit(limit + 1).execute()).data or []
+
+    if len(recipes) > limit:
+        recipes = recipes[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(recipes[-1]["created_at"], recipes[-1]["id"])
+
+    if requested is not None:
+        # Sparse rows don't fit the response models, so the recipe columns are
+        # returned as selected; ingredients still go through their model, to
+        # come back in the same shape as in the full response
+        keep = set(requested) - {"ingredients"}
+        content = [
+            {
+                **{k: v for k, v in r.items() if k in keep},
+                **({"ingredients": [RecipeIngredientResponse(**i).model_dump() for i in r["recipe_ingredients"]]} if with_ingredients else {}),
+            }
+            for r in recipes
+        ]
+        return prevalidated(content, response)
+
+    if summary:
+        return prevalidated([RecipeSummary(**r) for r in recipes], response)
+    return prevalidated([_build_response(r, r["recipe_ingredients"]) for r in recipes], response)
+
+
+@router.get("/{recipe_id}/ingredients", response_model=list[RecipeIngredientResponse], dependencies=[Depends(conditional("recipes"))])
+async def list_recipe_ingredients(recipe_id: str, user=Depends(get_current_user)):
+    res = await _with_ordered_ingredients(
+        db.table("recipes")
+        .select("id, recipe_ingredients(*)")
+        .eq("id", recipe_id)
         .eq("user_id", user["id"])
-        .order("created_at", desc=True)
-        .execute()
-    )
-    recipes = recipes_res.data or []
-    if not recipes:
-        return []
-    recipe_ids = [r["id"] for r in recipes]
-    ingredients_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .in_("recipe_id", recipe_ids)
-        .execute()
-    )
-    ingredients_by_recipe: dict[str, list] = {r["id"]: [] for r in recipes}
-    for ing in (ingredients_res.data or []):
-        ingredients_by_recipe[ing["recipe_id"]].append(ing)
-    return [_build_response(r, ingredients_by_recipe[r["id"]]) for r in recipes]
+    ).execute()
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return res.data[0]["recipe_ingredients"]
 
 
 @router.get("/{recipe_id}", response_model=RecipeResponse)
 async def get_recipe(recipe_id: str, user=Depends(get_current_user)):
-    recipe = _get_recipe_or_404(recipe_id, user["id"])
-    ingredients_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .eq("recipe_id", recipe_id)
-        .order("created_at")
-        .execute()
-    )
-    return _build_response(recipe, ingredients_res.data or [])
+    res = await _with_ordered_ingredients(
+        db.table("recipes")
+        .select("*, recipe_ingredients(*)")
+        .eq("id", recipe_id)
+        .eq("user_id", user["id"])
+    ).execute()
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return _build_response(res.data[0], res.data[0]["recipe_ingredients"])
 
 
+# Writes are scoped to the caller in the statement itself (a user_id filter,
+# or a join to recipes in the ingredient functions); no rows written means
+# the recipe or ingredient doesn't exist or isn't theirs
+
 @router.patch("/{recipe_id}", response_model=RecipeResponse)
 async def update_recipe(recipe_id: str, data: RecipeUpdate, user=Depends(get_current_user)):
-    _get_recipe_or_404(recipe_id, user["id"])
-    res = supabase_admin.table("recipes").update({"name": data.name}).eq("id", recipe_id).execute()
+    res = await _with_ordered_ingredients(_returning(
+        db.table("recipes")
+        .update({"name": data.name})
+        .eq("id", recipe_id)
+        .eq("user_id", user["id"]),
+        "*, recipe_ingredients(*)",
+    )).execute()
     if not res.data:
-        raise HTTPException(status_code=500, detail="Failed to update recipe")
-    ingredients_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .eq("recipe_id", recipe_id)
-        .order("created_at")
-        .execute()
-    )
-    return _build_response(res.data[0], ingredients_res.data or [])
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return _build_response(res.data[0], res.data[0]["recipe_ingredients"])
 
 
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_recipe(recipe_id: str, user=Depends(get_current_user)):
-    _get_recipe_or_404(recipe_id, user["id"])
-    supabase_admin.table("recipes").delete().eq("id", recipe_id).execute()
+    res = await _returning(
+        db.table("recipes").delete().eq("id", recipe_id).eq("user_id", user["id"]),
+        "id",
+    ).execute()
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Recipe not found")
 
 
 @router.post("/{recipe_id}/ingredients", response_model=RecipeIngredientResponse, status_code=status.HTTP_201_CREATED)
 async def add_ingredient(recipe_id: str, ingredient: RecipeIngredientAdd, user=Depends(get_current_user)):
-    _get_recipe_or_404(recipe_id, user["id"])
-    payload = {**ingredient.model_dump(), "recipe_id": recipe_id}
-    res = supabase_admin.table("recipe_ingredients").insert(payload).execute()
+    try:
+        res = await db.rpc("add_recipe_ingredient", {
+            "p_user_id": user["id"],
+            "p_recipe_id": recipe_id,
+            "p_ingredient": ingredient.model_dump(),
+        }).execute()
+    except APIError as e:
+        _raise_for_rpc_error(e)
     if not res.data:
-        raise HTTPException(status_code=500, detail="Failed to add ingredient")
+        raise HTTPException(status_code=404, detail="Recipe not found")
     return RecipeIngredientResponse(**res.data[0])
 
 
 @router.patch("/{recipe_id}/ingredients/{ingredient_id}", response_model=RecipeIngredientResponse)
 async def update_ingredient(recipe_id: str, ingredient_id: str, data: RecipeIngredientUpdate, user=Depends(get_current_user)):
-    _get_recipe_or_404(recipe_id, user["id"])
-    update = {k: v for k, v in data.model_dump().items() if v is not None}
-    if not update:
+    if data.checked is None and data.quantity is None:
         raise HTTPException(status_code=400, detail="No fields to update")
-    res = (
-        supabase_admin.table("recipe_ingredients")
-        .update(update)
-        .eq("id", ingredient_id)
-        .eq("recipe_id", recipe_id)
-        .execute()
-    )
+    try:
+        res = await db.rpc("update_recipe_ingredient", {
+            "p_user_id": user["id"],
+            "p_recipe_id": recipe_id,
+            "p_ingredient_id": ingredient_id,
+            "p_checked": data.checked,
+            "p_quantity": data.quantity,
+        }).execute()
+    except APIError as e:
+        _raise_for_rpc_error(e)
     if not res.data:
-        raise HTTPException(status_code=500, detail="Failed to update ingredient")
+        raise HTTPException(status_code=404, detail="Ingredient not found")
     return RecipeIngredientResponse(**res.data[0])
 
 
 @router.delete("/{recipe_id}/ingredients/{ingredient_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_ingredient(recipe_id: str, ingredient_id: str, user=Depends(get_current_user)):
-    _get_recipe_or_404(recipe_id, user["id"])
-    supabase_admin.table("recipe_ingredients").delete().eq("id", ingredient_id).eq("recipe_id", recipe_id).execute()
+    try:
+        res = await db.rpc("delete_recipe_ingredient", {
+            "p_user_id": user["id"],
+            "p_recipe_id": recipe_id,
+            "p_ingredient_id": ingredient_id,
+        }).execute()
+    except APIError as e:
+        _raise_for_rpc_error(e)
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
 
 
 @router.post("/{recipe_id}/log", response_model=MealResponse, status_code=status.HTTP_201_CREATED)
 async def log_recipe(recipe_id: str, body: RecipeLogRequest, user=Depends(get_current_user)):
-    recipe = _get_recipe_or_404(recipe_id, user["id"])
     if not body.ingredient_overrides:
         raise HTTPException(status_code=400, detail="No ingredients selected")
 
-    # Fetch only the selected ingredients, scoped to this recipe for security
-    override_ids = [o.ingredient_id for o in body.ingredient_overrides]
-    ingredients_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .in_("id", override_ids)
-        .eq("recipe_id", recipe_id)
-        .execute()
-    )
-    ingredient_by_id = {i["id"]: i for i in (ingredients_res.data or [])}
-
-    # Compute raw totals using the override quantities
-    total_calories = 0.0
-    total_protein = 0.0
-    total_carbs = 0.0
-    total_fat = 0.0
-    total_fiber = 0.0
-    for override in body.ingredient_overrides:
-        ing = ingredient_by_id.get(override.ingredient_id)
-        if ing:
-            total_calories += override.quantity * ing["calories_per_unit"]
-            total_protein += override.quantity * ing["protein_per_unit"]
-            total_carbs += override.quantity * ing["carbs_per_unit"]
-            total_fat += override.quantity * ing["fat_per_unit"]
-            total_fiber += override.quantity * ing["fiber_per_unit"]
-
-    # Scale by portion weight if provided
-    if body.total_cooked_weight and body.portion_weight and body.total_cooked_weight > 0:
-        scale = body.portion_weight / body.total_cooked_weight
-    else:
-        scale = 1.0
-
-    raw_weight = sum(o.quantity for o in body.ingredient_overrides)
-
-    payload = {
-        "user_id": user["id"],
-        "logged_date": str(body.logged_date),
-        "meal_type": body.meal_type,
-        "name": recipe["name"],
-        "calories": round(total_calories * scale),
-        "protein_g": round(total_protein * scale, 1),
-        "carbs_g": round(total_carbs * scale, 1),
-        "fat_g": round(total_fat * scale, 1),
-        "fiber_g": round(total_fiber * scale, 1),
-        "raw_weight": round(raw_weight, 1),
-        "total_cooked_weight": round(body.total_cooked_weight, 1) if body.total_cooked_weight else None,
-        "portion_weight": round(body.portion_weight, 1) if body.portion_weight else None,
-        "recipe_id": recipe_id,
-    }
-    res = supabase_admin.table("meals").insert(payload).execute()
+    # Totals (scaled to the portion eaten), the meal, its ingredient snapshot and
+    # the recipe's last meal type / cooked weight, in one transaction
+    try:
+        res = await db.rpc("log_recipe", {
+            "p_user_id": user["id"],
+            "p_recipe_id": recipe_id,
+            "p_logged_date": str(body.logged_date),
+            "p_meal_type": body.meal_type,
+            "p_ingredient_overrides": [o.model_dump() for o in body.ingredient_overrides],
+            "p_total_cooked_weight": body.total_cooked_weight,
+            "p_portion_weight": body.portion_weight,
+        }).execute()
+    except APIError as e:
+        _raise_for_rpc_error(e)
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to log recipe")
-
-    # Snapshot ingredient composition for dish immutability
-    meal_id = res.data[0]["id"]
-    meal_ing_rows = []
-    for override in body.ingredient_overrides:
-        ing = ingredient_by_id.get(override.ingredient_id)
-        if ing:
-            meal_ing_rows.append({
-                "meal_id": meal_id,
-                "recipe_ingredient_id": ing["id"],
-                "food_name": ing["food_name"],
-                "quantity": override.quantity,
-                "unit": ing["unit"],
-                "calories_per_unit": ing["calories_per_unit"],
-                "protein_per_unit": ing["protein_per_unit"],
-                "carbs_per_unit": ing["carbs_per_unit"],
-                "fat_per_unit": ing["fat_per_unit"],
-                "fiber_per_unit": ing["fiber_per_unit"],
-                "usda_fdc_id": ing.get("usda_fdc_id"),
-            })
-    if meal_ing_rows:
-        supabase_admin.table("meal_ingredients").insert(meal_ing_rows).execute()
-
-    recipe_update: dict = {"last_meal_type": body.meal_type}
-    if body.total_cooked_weight:
-        recipe_update["last_cooked_weight"] = round(body.total_cooked_weight, 1)
-    supabase_admin.table("recipes").update(recipe_update).eq("id", recipe_id).execute()
-
     return MealResponse(**res.data[0])
 
 
 @router.post("/{recipe_id}/restore-from-meal/{meal_id}", response_model=RecipeResponse)
 async def restore_from_meal(recipe_id: str, meal_id: str, user=Depends(get_current_user)):
-    recipe = _get_recipe_or_404(recipe_id, user["id"])
-
-    # Verify meal belongs to user and links to this recipe
-    meal_res = (
-        supabase_admin.table("meals")
-        .select("id")
-        .eq("id", meal_id)
-        .eq("user_id", user["id"])
-        .eq("recipe_id", recipe_id)
-        .single()
-        .execute()
-    )
-    if not meal_res.data:
-        raise HTTPException(status_code=404, detail="Meal not found")
-
-    # Fetch the ingredient snapshot for this meal
-    meal_ings_res = (
-        supabase_admin.table("meal_ingredients")
-        .select("*")
-        .eq("meal_id", meal_id)
-        .execute()
-    )
-    meal_ings = meal_ings_res.data or []
-
-    # Fetch current recipe ingredients
-    recipe_ings_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .eq("recipe_id", recipe_id)
-        .execute()
-    )
-    current_ings = {i["id"]: i for i in (recipe_ings_res.data or [])}
-
-    # IDs of recipe ingredients that were used in this meal
-    used_recipe_ing_ids = {
-        mi["recipe_ingredient_id"]
-        for mi in meal_ings
-        if mi.get("recipe_ingredient_id")
-    }
-
-    # Uncheck current recipe ingredients not used in this meal
-    ings_to_uncheck = [id for id in current_ings if id not in used_recipe_ing_ids]
-    if ings_to_uncheck:
-        supabase_admin.table("recipe_ingredients").update({"checked": False}).in_("id", ings_to_uncheck).execute()
-
-    # Restore each meal ingredient into the recipe template
-    for mi in meal_ings:
-        rid = mi.get("recipe_ingredient_id")
-        if rid and rid in current_ings:
-            # Restore quantity and check it
-            supabase_admin.table("recipe_ingredients").update({
-                "quantity": mi["quantity"],
-                "checked": True,
-            }).eq("id", rid).execute()
-        else:
-            # Ingredient was removed from the template — re-add it
-            supabase_admin.table("recipe_ingredients").insert({
-                "recipe_id": recipe_id,
-                "food_name": mi["food_name"],
-                "quantity": mi["quantity"],
-                "unit": mi["unit"],
-                "calories_per_unit": mi["calories_per_unit"],
-                "protein_per_unit": mi["protein_per_unit"],
-                "carbs_per_unit": mi["carbs_per_unit"],
-                "fat_per_unit": mi["fat_per_unit"],
-                "fiber_per_unit": mi["fiber_per_unit"],
-                "usda_fdc_id": mi.get("usda_fdc_id"),
-                "checked": True,
-            }).execute()
-
-    # Return updated recipe
-    updated_ings_res = (
-        supabase_admin.table("recipe_ingredients")
-        .select("*")
-        .eq("recipe_id", recipe_id)
-        .order("created_at")
-        .execute()
-    )
-    return _build_response(recipe, updated_ings_res.data or [])
+    # Restores the template to the meal's ingredient snapshot in one transaction:
+    # used ingredients are re-checked at the meal's quantities, unused ones are
+    # unchecked, and ingredients since removed from the template are re-added
+    try:
+        res = await db.rpc("restore_recipe_from_meal", {
+            "p_user_id": user["id"],
+            "p_recipe_id": recipe_id,
+            "p_meal_id": meal_id,
+        }).execute()
+    except APIError as e:
+        _raise_for_rpc_error(e)
+    restored = res.data[0]
+    return _build_response(restored["recipe"], restored["ingredients"])
@@ -0,0 +1,78 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.auth import get_current_user
+from app.database import db
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.schemas.nutrition import SyncResponse
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Synced tables in the order the initial sync pages through them, with their key
+SYNC_KEYS = {"meals": "id", "recipes": "id", "recipe_ingredients": "id", "day_types": "id", "day_logs": "logged_date"}
+SYNC_TABLES = list(SYNC_KEYS)
+
+
+def _decode_xid(value) -> str:
+    if not isinstance(value, str) or not value.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    response: Response,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    user=Depends(get_current_user),
+):
+    # With `since`, only rows written or deleted since the client's last call;
+    # rows can repeat across calls. Tombstones are pruned after a retention
+    # window, so a cursor older than that answers 410 and the client resyncs.
+    if since:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Pass either since or cursor")
+        (xid,) = decode_cursor(since, 1)
+        res = await db.rpc("sync_changes", {"p_user_id": user["id"], "p_since": _decode_xid(xid)}).execute()
+        changes = res.data[0]
+        if changes.pop("expired"):
+            raise HTTPException(status_code=410, detail="Sync cursor expired; sync again without one")
+        return SyncResponse(cursor=encode_cursor(str(changes.pop("next_cursor"))), **changes)
+
+    # Without it, everything the client owns, up to `limit` rows a page, table by
+    # table in key order; the cursor for the next page comes back in X-Next-Cursor.
+    # The body's cursor, for the deltas after the last page, is the same on every
+    # page: it's taken when the first one is read, so writes made while paging
+    # come back in the first delta.
+    xid, table_index, after = None, 0, None
+    if cursor:
+        xid, table_index, after = decode_cursor(cursor, 3)
+        _decode_xid(xid)
+        if not isinstance(table_index, int) or not 0 <= table_index < len(SYNC_TABLES) or not isinstance(after, (str, type(None))):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    page = {table: [] for table in SYNC_TABLES}
+    remaining = limit
+    while table_index < len(SYNC_TABLES) and remaining:
+        table = SYNC_TABLES[table_index]
+        res = await db.rpc("sync_page", {
+            "p_user_id": user["id"],
+            "p_table": table,
+            "p_after": after,
+            "p_limit": remaining + 1,
+        }).execute()
+        xid = xid or str(res.data[0]["next_cursor"])
+        rows = res.data[0]["rows"]
+        if len(rows) > remaining:
+            page[table] = rows[:remaining]
+            after = str(rows[remaining - 1][SYNC_KEYS[table]])
+            break
+        page[table] = rows
+        remaining -= len(rows)
+        table_index, after = table_index + 1, None
+
+    if table_index < len(SYNC_TABLES):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(xid, table_index, after)
+    return SyncResponse(cursor=encode_cursor(xid), deleted=[], **page)
@@ -1,51 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 import httpx
+from postgrest.exceptions import APIError
 
-from app.auth import get_current_user
+from app.auth import get_current_user, require_metrics_token
+from app.cache import PostgresCacheStore, StaleWhileRevalidateCache
 from app.config import settings
+from app.database import db
+from app.http import HTTPClients, get_http_clients
+from app.nutrients import NUTRIENT_FIELDS
+from app.responses import prevalidated
 from app.schemas.nutrition import USDAFoodResult, UPCLookupResult
 
 router = APIRouter(prefix="/usda", tags=["usda"])
 
-USDA_SEARCH_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
+USDA_SEARCH_PATH = "/foods/search"
 
-# Nutrient IDs in USDA FoodData Central
-NUTRIENT_ENERGY   = 1008
-NUTRIENT_PROTEIN  = 1003
-NUTRIENT_FAT      = 1004
-NUTRIENT_CARBS    = 1005
-NUTRIENT_FIBER    = 1079
+_FIELD_BY_NUTRIENT_ID = {nutrient_id: field for field, nutrient_id in NUTRIENT_FIELDS.items()}
 
 
-def _extract_nutrient(nutrients: list[dict], nutrient_id: int) -> float:
+def _extract_nutrients(nutrients: list[dict]) -> dict[str, float]:
+    """Read every NUTRIENT_FIELDS value in one pass over a food's `foodNutrients`."""
+    found: dict[str, float] = {}
+    field_for = _FIELD_BY_NUTRIENT_ID.get
     for n in nutrients:
-        if n.get("nutrientId") == nutrient_id:
-            return round(n.get("value", 0.0), 2)
-    return 0.0
+        field = field_for(n.get("nutrientId"))
+        if field is not None and field not in found:
+            found[field] = round(n.get("value", 0.0), 2)
+            if len(found) == len(NUTRIENT_FIELDS):
+                break
+    return {field: found.get(field, 0.0) for field in NUTRIENT_FIELDS}
 
 
-def _normalize(value: float, serving_size: float) -> float:
-    """Convert a per-serving nutrient value to per-100g."""
-    if serving_size <= 0:
-        return value
-    return round((value / serving_size) * 100, 2)
+def _search_cache_key(query: str) -> str:
+    return " ".join(query.replace("'", "").replace('"', "").lower().split())
 
 
-@router.get("/search", response_model=list[USDAFoodResult])
-async def search_foods(
-    query: str = Query(..., min_length=1),
-    _user=Depends(get_current_user),
-):
-    usda_query = query.replace("'", "").replace('"', "")
+search_cache = StaleWhileRevalidateCache(
+    ttl=settings.usda_cache_ttl,
+    stale_ttl=settings.usda_cache_stale_ttl,
+    max_entries=settings.usda_cache_max_entries,
+    store=PostgresCacheStore("usda_search_cache") if settings.usda_cache_persistent else None,
+)
+
+
+async def _fetch_search_results(client: httpx.AsyncClient, usda_query: str) -> list[dict]:
     params = {
         "query": usda_query,
         "api_key": settings.usda_api_key,
         "dataType": ["Foundation", "SR Legacy", "Survey (FNDDS)", "Branded Food"],
         "pageSize": 20,
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(USDA_SEARCH_URL, params=params, timeout=20.0)
-        print("USDA request URL:", response.request.url)
+    response = await client.get(USDA_SEARCH_PATH, params=params)
 
     if response.status_code != 200:
         raise HTTPException(
@@ -53,94 +64,247 @@ async def search_foods(
             detail=f"USDA API error {response.status_code}: {response.text[:300]}",
         )
 
-    foods = response.json().get("foods", [])
-    results = []
-    for food in foods:
-        nutrients = food.get("foodNutrients", [])
-        is_branded = food.get("dataType") == "Branded Food"
-        serving_size = food.get("servingSize", 100) if is_branded else 100
+    return _parse_search_foods(response.json().get("foods", []))
+
 
-        def extract(nutrient_id: int) -> float:
-            raw = _extract_nutrient(nutrients, nutrient_id)
-            return _normalize(raw, serving_size) if is_branded else raw
+def _food_nutrients_per_100g(food: dict) -> dict[str, float]:
+    # FDC reports foodNutrients per 100 g for every data type, branded foods included
+    # (their per-serving label values are in labelNutrients): the same basis as
+    # food_nutrient.csv, and so as fdc_foods and the bulk-imported upc_products rows
+    return _extract_nutrients(food.get("foodNutrients", []))
 
-        results.append(USDAFoodResult(
+
+def _parse_search_foods(foods: list[dict]) -> list[dict]:
+    return [
+        USDAFoodResult(
             fdc_id=food["fdcId"],
             name=food["description"].title(),
-            calories_per_100g=extract(NUTRIENT_ENERGY),
-            protein_per_100g=extract(NUTRIENT_PROTEIN),
-            carbs_per_100g=extract(NUTRIENT_CARBS),
-            fat_per_100g=extract(NUTRIENT_FAT),
-            fiber_per_100g=extract(NUTRIENT_FIBER),
-        ))
-    return results
+            **_food_nutrients_per_100g(food),
+        ).model_dump()
+        for food in foods
+    ]
 
 
-def _usda_food_to_upc_result(food: dict, upc: str) -> UPCLookupResult:
-    nutrients = food.get("foodNutrients", [])
-    serving_size = food.get("servingSize", 100)
+async def _search_local(query: str) -> list[USDAFoodResult]:
+    res = await db.rpc("search_fdc_foods", {"p_query": query, "p_limit": 20}).execute()
+    return [
+        USDAFoodResult(
+            fdc_id=food["fdc_id"],
+            name=food["description"].title(),
+            calories_per_100g=food["calories_per_100g"],
+            protein_per_100g=food["protein_per_100g"],
+            carbs_per_100g=food["carbs_per_100g"],
+            fat_per_100g=food["fat_per_100g"],
+            fiber_per_100g=food["fiber_per_100g"],
+        )
+        for food in res.data
+    ]
 
-    def extract(nutrient_id: int) -> float:
-        raw = _extract_nutrient(nutrients, nutrient_id)
-        return _normalize(raw, serving_size)
 
+@router.get("/search", response_model=list[USDAFoodResult])
+async def search_foods(
+    response: Response,
+    query: str = Query(..., min_length=1),
+    clients: HTTPClients = Depends(get_http_clients),
+    _user=Depends(get_current_user),
+):
+    key = _search_cache_key(query)
+    if not key:
+        raise HTTPException(status_code=400, detail="Query is empty")
+    if settings.usda_search_source != "api":
+        results = await _search_local(key)
+        if results or settings.usda_search_source == "local":
+            return prevalidated(results, response)
+    # Cached results were built as USDAFoodResult before being stored
+    results = await search_cache.get_or_fetch(key, lambda: _fetch_search_results(clients["usda"], key))
+    return prevalidated(results, response)
+
+
+@router.get("/search/cache", dependencies=[Depends(require_metrics_token)])
+async def search_cache_stats():
+    return search_cache.snapshot()
+
+
+def _usda_food_to_upc_result(food: dict, upc: str) -> UPCLookupResult:
     return UPCLookupResult(
         upc=upc,
         source="usda",
         source_name=food["description"].title(),
         usda_fdc_id=str(food["fdcId"]),
-        calories_per_100g=extract(NUTRIENT_ENERGY),
-        protein_per_100g=extract(NUTRIENT_PROTEIN),
-        carbs_per_100g=extract(NUTRIENT_CARBS),
-        fat_per_100g=extract(NUTRIENT_FAT),
-        fiber_per_100g=extract(NUTRIENT_FIBER),
+        **_food_nutrients_per_100g(food),
+    )
+
+
+async def _lookup_usda_upc(client: httpx.AsyncClient, upc: str) -> Optional[UPCLookupResult]:
+    # USDA branded food search by GTIN/UPC
+    res = await client.get(
+        USDA_SEARCH_PATH,
+        params={
+            "query": upc,
+            "api_key": settings.usda_api_key,
+            "dataType": ["Branded Food"],
+            "pageSize": 10,
+        },
+    )
+    if res.status_code != 200:
+        return None
+    normalized_upc = upc.lstrip("0")
+    for food in res.json().get("foods", []):
+        gtin = food.get("gtinUpc", "")
+        if gtin and gtin.lstrip("0") == normalized_upc:
+            return _usda_food_to_upc_result(food, upc)
+    return None
+
+
+async def _lookup_open_food_facts_upc(client: httpx.AsyncClient, upc: str) -> Optional[UPCLookupResult]:
+    res = await client.get(f"/api/v0/product/{upc}.json")
+    if res.status_code != 200:
+        return None
+    data = res.json()
+    if data.get("status") != 1:
+        return None
+    product = data["product"]
+    n = product.get("nutriments", {})
+    return UPCLookupResult(
+        upc=upc,
+        source="open_food_facts",
+        source_name=product.get("product_name", ""),
+        calories_per_100g=round(float(n.get("energy-kcal_100g", 0) or 0), 2),
+        protein_per_100g=round(float(n.get("proteins_100g", 0) or 0), 2),
+        carbs_per_100g=round(float(n.get("carbohydrates_100g", 0) or 0), 2),
+        fat_per_100g=round(float(n.get("fat_100g", 0) or 0), 2),
+        fiber_per_100g=round(float(n.get("fiber_100g", 0) or 0), 2),
     )
 
 
+# UPC sources, keyed by the name of their client in app.http
+UPC_SOURCES: dict[str, Callable[[httpx.AsyncClient, str], Awaitable[Optional[UPCLookupResult]]]] = {
+    "usda": _lookup_usda_upc,
+    "open_food_facts": _lookup_open_food_facts_upc,
+}
+
+
+class SourceStats:
+    """Latency and hit rate of one UPC source, over its recent lookups."""
+
+    def __init__(self, window: int = 1000):
+        self.lookups = 0
+        self.hits = 0
+        self.errors = 0
+        self.cancelled = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float, hit: bool = False, error: bool = False) -> None:
+        self.lookups += 1
+        self.hits += hit
+        self.errors += error
+        self._latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(latencies[int(p * (len(latencies) - 1))] * 1000, 1) if latencies else None
+
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else None,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p95": percentile(0.95),
+        }
+
+
+upc_stats = {"local": SourceStats(), **{source: SourceStats() for source in UPC_SOURCES}}
+
+
+async def _timed_upc_lookup(source: str, client: httpx.AsyncClient, upc: str) -> Optional[UPCLookupResult]:
+    stats = upc_stats[source]
+    started = time.perf_counter()
+    try:
+        result = await UPC_SOURCES[source](client, upc)
+    except asyncio.CancelledError:
+        stats.cancelled += 1
+        raise
+    except (httpx.HTTPError, ValueError):
+        stats.record(time.perf_counter() - started, error=True)
+        raise
+    stats.record(time.perf_counter() - started, hit=result is not None)
+    return result
+
+
+async def _remember_upc(result: UPCLookupResult) -> None:
+    # Best effort: if the write fails, the next scan of this barcode just goes remote again
+    normalized = result.upc.lstrip("0")
+    if not normalized:
+        return
+    try:
+        await db.table("upc_products").upsert({
+            **result.model_dump(),
+            "upc_normalized": normalized,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }, on_conflict="upc_normalized").execute()
+    except (APIError, httpx.HTTPError):
+        pass
+
+
+def _upc_source_order() -> list[str]:
+    preferred = settings.upc_preferred_source
+    return [preferred] + [source for source in UPC_SOURCES if source != preferred]
+
+
+@router.get("/upc/stats", dependencies=[Depends(require_metrics_token)])
+async def upc_lookup_stats():
+    return {source: stats.snapshot() for source, stats in upc_stats.items()}
+
+
 @router.get("/upc/{upc}", response_model=UPCLookupResult)
-async def lookup_by_upc(upc: str, _user=Depends(get_current_user)):
-    # Step 1: Try USDA branded food search by GTIN/UPC
-    async with httpx.AsyncClient() as client:
-        usda_res = await client.get(
-            USDA_SEARCH_URL,
-            params={
-                "query": upc,
-                "api_key": settings.usda_api_key,
-                "dataType": ["Branded Food"],
-                "pageSize": 10,
-            },
-            timeout=20.0,
-        )
+async def lookup_by_upc(
+    upc: str,
+    background_tasks: BackgroundTasks,
+    clients: HTTPClients = Depends(get_http_clients),
+    _user=Depends(get_current_user),
+):
+    # Local index first: curated ingredients, then products seen before or bulk-imported
+    started = time.perf_counter()
+    res = await db.rpc("lookup_upc", {"p_upc": upc}).execute()
+    upc_stats["local"].record(time.perf_counter() - started, hit=bool(res.data))
+    if res.data:
+        return UPCLookupResult(**{**res.data[0], "upc": upc})
 
-    if usda_res.status_code == 200:
-        foods = usda_res.json().get("foods", [])
-        normalized_upc = upc.lstrip("0")
-        for food in foods:
-            gtin = food.get("gtinUpc", "")
-            if gtin and gtin.lstrip("0") == normalized_upc:
-                return _usda_food_to_upc_result(food, upc)
-
-    # Step 2: Fall back to Open Food Facts
-    async with httpx.AsyncClient() as client:
-        off_res = await client.get(
-            f"https://world.openfoodfacts.org/api/v0/product/{upc}.json",
-            timeout=10.0,
-        )
+    order = _upc_source_order()
+    # "race" asks every source at once; "sequential" only asks the next one after a miss
+    if settings.upc_lookup_mode == "race":
+        lookups = {source: asyncio.create_task(_timed_upc_lookup(source, clients[source], upc)) for source in order}
+    else:
+        lookups = {source: None for source in order}
 
-    if off_res.status_code == 200:
-        data = off_res.json()
-        if data.get("status") == 1:
-            product = data["product"]
-            n = product.get("nutriments", {})
-            return UPCLookupResult(
-                upc=upc,
-                source="open_food_facts",
-                source_name=product.get("product_name", ""),
-                calories_per_100g=round(float(n.get("energy-kcal_100g", 0) or 0), 2),
-                protein_per_100g=round(float(n.get("proteins_100g", 0) or 0), 2),
-                carbs_per_100g=round(float(n.get("carbohydrates_100g", 0) or 0), 2),
-                fat_per_100g=round(float(n.get("fat_100g", 0) or 0), 2),
-                fiber_per_100g=round(float(n.get("fiber_100g", 0) or 0), 2),
-            )
+    result = None
+    failures = 0
+    try:
+        # Answers are taken in order of preference, so a less preferred source that
+        # answers first only wins once every source ahead of it has missed
+        for source, lookup in lookups.items():
+            try:
+                result = await (lookup or _timed_upc_lookup(source, clients[source], upc))
+            except (httpx.HTTPError, ValueError):
+                failures += 1
+                continue
+            if result is not None:
+                break
+    finally:
+        # Cancel the losers and wait for them to unwind, so none outlives the
+        # request and the error of one that already failed is retrieved here
+        pending = [lookup for lookup in lookups.values() if lookup is not None]
+        for lookup in pending:
+            lookup.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
+    if result is not None:
+        background_tasks.add_task(_remember_upc, result)
+        return result
+    if failures == len(lookups):
+        raise HTTPException(status_code=502, detail="UPC lookup failed")
     raise HTTPException(status_code=404, detail="Product not found")
@@ -31,9 +31,15 @@ class MealCreate(BaseModel):
     recipe_id: Optional[str] = None
 
 
+class MealBatchItem(MealCreate):
+    # Idempotency key, unique per user: re-sending it returns the meal already logged
+    client_key: Optional[str] = Field(None, min_length=1, max_length=100)
+
+
 class MealResponse(MealCreate):
     id: str
     user_id: str
+    client_key: Optional[str] = None
     created_at: str
 
 
@@ -123,11 +129,10 @@ class RecipeUpdate(BaseModel):
     name: str = Field(..., min_length=1, max_length=200)
 
 
-class RecipeResponse(BaseModel):
+class RecipeSummary(BaseModel):
     id: str
     name: str
     servings: int
-    ingredients: list[RecipeIngredientResponse]
     total_calories: float
     total_protein: float
     total_carbs: float
@@ -137,6 +142,10 @@ class RecipeResponse(BaseModel):
     last_meal_type: Optional[str] = None
 
 
+class RecipeResponse(RecipeSummary):
+    ingredients: list[RecipeIngredientResponse]
+
+
 class MealPortionUpdate(BaseModel):
     portion_weight: float = Field(..., gt=0)
 
@@ -194,3 +203,24 @@ class RecipeLogRequest(BaseModel):
     ingredient_overrides: list[RecipeIngredientOverride]
     total_cooked_weight: Optional[float] = None
     portion_weight: Optional[float] = None
+
+
+class DayLogResponse(BaseModel):
+    logged_date: date
+    day_type_id: Optional[str] = None
+
+
+class DeletedRow(BaseModel):
+    table: str
+    key: str  # the row's id; its logged_date for day_logs
+    deleted_at: str
+
+
+class SyncResponse(BaseModel):
+    cursor: str
+    meals: list[MealResponse]
+    recipes: list[RecipeSummary]
+    recipe_ingredients: list[RecipeIngredientResponse]
+    day_types: list[DayTypeResponse]
+    day_logs: list[DayLogResponse]
+    deleted: list[DeletedRow]
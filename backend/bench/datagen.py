@@ -0,0 +1,191 @@
+"""Seeded synthetic data at production sizes: N users, each with years of meals and a recipe box.
+
+    cd backend
+    python -m bench.datagen --users 50 --years 3 --out dataset.json
+
+The same arguments always produce the same rows. `load` bulk-inserts a
+dataset into the PostgREST stand-in.
+"""
+import argparse
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from bench.fixtures import FOODS, ingredient_rows, recipe_rows
+
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+MACROS = ("calories", "protein", "carbs", "fat", "fiber")
+
+# Parents before children
+TABLES = ("ingredients", "profiles", "day_types", "day_logs", "recipes", "recipe_ingredients", "meals", "meal_ingredients")
+
+
+@dataclass
+class Dataset:
+    users: list[str]
+    start: date
+    end: date
+    tables: dict[str, list[dict]] = field(default_factory=lambda: {t: [] for t in TABLES})
+
+    def counts(self) -> dict[str, int]:
+        return {table: len(rows) for table, rows in self.tables.items()}
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _day_types(rng: random.Random, user_id: str) -> list[dict]:
+    def targets(calories: int) -> dict:
+        return {
+            "calories_min": calories - 200, "calories_max": calories + 200,
+            "protein_min": 120, "protein_max": 180,
+            "carbs_min": calories // 10, "carbs_max": calories // 8,
+            "fat_min": 50, "fat_max": 90,
+            "fiber_min": 25, "fiber_max": 40,
+        }
+
+    return [
+        {"id": _uuid(rng), "user_id": user_id, "name": name, **targets(calories), "created_at": "2024-01-01T00:00:00+00:00"}
+        for name, calories in (("Training", rng.randrange(2400, 3000, 50)), ("Rest", rng.randrange(1800, 2300, 50)))
+    ]
+
+
+def _recipe_meal(rng: random.Random, recipe: dict, ingredients: list[dict], meal: dict) -> tuple[dict, list[dict]]:
+    # What log_recipe writes: checked ingredients at this session's quantities, and their snapshot
+    used = [(i, round(i["quantity"] * rng.uniform(0.8, 1.2), 2)) for i in ingredients if i["checked"]]
+    totals = {m: sum(q * i[f"{m}_per_unit"] for i, q in used) for m in MACROS}
+    meal.update({
+        "name": recipe["name"],
+        "calories": round(totals["calories"]),
+        **{f"{m}_g": round(totals[m], 1) for m in MACROS[1:]},
+        "raw_weight": round(sum(q for _, q in used), 1),
+        "recipe_id": recipe["id"],
+    })
+    snapshot = [
+        {
+            "id": _uuid(rng),
+            "meal_id": meal["id"],
+            "recipe_ingredient_id": i["id"],
+            "quantity": q,
+            **{k: i[k] for k in ("food_name", "unit", "usda_fdc_id", *(f"{m}_per_unit" for m in MACROS))},
+            "created_at": meal["created_at"],
+        }
+        for i, q in used
+    ]
+    return meal, snapshot
+
+
+def generate(
+    users: int = 20,
+    years: float = 2,
+    meals_per_day: int = 4,
+    recipes: int = 25,
+    ingredients_per_recipe: int = 10,
+    recipe_meal_share: float = 0.25,
+    catalog: int = 2000,
+    end: date = date(2026, 9, 30),
+    seed: int = 0,
+) -> Dataset:
+    """Rows for every table the benchmarked endpoints read.
+
+    Each user gets a profile with two day types (one the default), a day type
+    logged on about a third of days, `recipes` recipes, and `meals_per_day`
+    (give or take one) meals on every day of the last `years` years, of which
+    `recipe_meal_share` were logged from a recipe along with their ingredient
+    snapshot.
+    """
+    rng = random.Random(seed)
+    start = end - timedelta(days=round(365 * years) - 1)
+    dataset = Dataset(users=[], start=start, end=end)
+    tables = dataset.tables
+    tables["ingredients"] = ingredient_rows(catalog, seed=seed)
+
+    for n in range(users):
+        user_id = _uuid(rng)
+        dataset.users.append(user_id)
+        day_types = _day_types(rng, user_id)
+        tables["day_types"] += day_types
+        tables["profiles"].append({
+            "id": user_id,
+            "email": f"bench{n}@example.com",
+            "display_name": f"Bench User {n}",
+            "default_day_type_id": day_types[1]["id"],
+        })
+
+        box = recipe_rows(recipes, ingredients_per_recipe, seed=rng.getrandbits(32))
+        box_ingredients = {}
+        for recipe in box:
+            box_ingredients[recipe["id"]] = ingredients = recipe.pop("recipe_ingredients")
+            tables["recipes"].append({**recipe, "user_id": user_id})
+            tables["recipe_ingredients"] += ingredients
+
+        day = start
+        while day <= end:
+            if rng.random() < 0.3:
+                tables["day_logs"].append({"user_id": user_id, "logged_date": str(day), "day_type_id": rng.choice(day_types)["id"]})
+            for i in range(max(1, meals_per_day + rng.randint(-1, 1))):
+                meal = {
+                    "id": _uuid(rng),
+                    "user_id": user_id,
+                    "logged_date": str(day),
+                    "meal_type": MEAL_TYPES[min(i, 3)],
+                    "name": rng.choice(FOODS).title(),
+                    "calories": rng.randint(100, 900),
+                    "protein_g": round(rng.uniform(0, 60), 1),
+                    "carbs_g": round(rng.uniform(0, 100), 1),
+                    "fat_g": round(rng.uniform(0, 40), 1),
+                    "fiber_g": round(rng.uniform(0, 12), 1),
+                    "notes": None,
+                    "raw_weight": None,
+                    "total_cooked_weight": None,
+                    "portion_weight": None,
+                    "recipe_id": None,
+                    "client_key": None,
+                    "created_at": f"{day}T{7 + 4 * i:02d}:{rng.randint(0, 59):02d}:00+00:00",
+                }
+                if box and rng.random() < recipe_meal_share:
+                    recipe = rng.choice(box)
+                    meal, snapshot = _recipe_meal(rng, recipe, box_ingredients[recipe["id"]], meal)
+                    tables["meal_ingredients"] += snapshot
+                tables["meals"].append(meal)
+            day += timedelta(days=1)
+    return dataset
+
+
+def load(supabase_url: str, dataset: Dataset, headers: Optional[dict] = None, chunk: int = 1000) -> None:
+    """Bulk-insert every table of `dataset`, `chunk` rows per request."""
+    with httpx.Client(base_url=f"{supabase_url}/rest/v1", headers={**(headers or {}), "Prefer": "return=minimal"}, timeout=120) as client:
+        for table in TABLES:
+            rows = dataset.tables[table]
+            for i in range(0, len(rows), chunk):
+                client.post(f"/{table}", json=rows[i:i + chunk]).raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--meals-per-day", type=int, default=4)
+    parser.add_argument("--recipes", type=int, default=25, help="recipes per user")
+    parser.add_argument("--ingredients", type=int, default=10, help="ingredients per recipe")
+    parser.add_argument("--catalog", type=int, default=2000, help="rows in the shared ingredients catalog")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="also write the rows here, as JSON")
+    args = parser.parse_args()
+
+    dataset = generate(args.users, args.years, args.meals_per_day, args.recipes, args.ingredients, catalog=args.catalog, seed=args.seed)
+    if args.out:
+        args.out.write_text(json.dumps({"users": dataset.users, "start": str(dataset.start), "end": str(dataset.end), "tables": dataset.tables}))
+    for table, count in dataset.counts().items():
+        print(f"{table:<20} {count:>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Requests/sec of GET /meals/day/{day} with blocking vs. async database calls.
+
+"before" is the previous implementation of the endpoint: an `async def` route
+calling the synchronous PostgREST client, which stalls the event loop for each
+round-trip. "after" is the real app on the pooled async client, which now
+serves the endpoint with a single RPC. Both run against the same in-memory
+PostgREST stand-in with injected latency.
+
+    cd backend
+    python -m bench.db_concurrency --clients 50 --requests 1000 --latency 0.02
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import date
+
+import httpx
+
+from bench import harness
+from bench.fake_postgrest import serve
+
+
+def seed(supabase_url: str, user_id: str, day: date, meals_per_day: int) -> None:
+    def insert(table: str, row: dict) -> dict:
+        return httpx.post(f"{supabase_url}/rest/v1/{table}", json=row).json()[0]
+
+    day_type = insert("day_types", {"user_id": user_id, "name": "Training", "calories_min": 2200, "calories_max": 2600})
+    insert("profiles", {"id": user_id, "email": "bench@example.com", "display_name": None, "default_day_type_id": day_type["id"]})
+    for i in range(meals_per_day):
+        insert("meals", {
+            "user_id": user_id,
+            "logged_date": str(day),
+            "meal_type": "Lunch",
+            "name": f"Meal {i}",
+            "calories": 500,
+            "protein_g": 30.0,
+            "carbs_g": 50.0,
+            "fat_g": 15.0,
+            "fiber_g": 5.0,
+            "notes": None,
+            "raw_weight": None,
+            "total_cooked_weight": None,
+            "portion_weight": None,
+            "recipe_id": None,
+        })
+
+
+def blocking_app(supabase_url: str, service_key: str):
+    """The pre-async get_day endpoint, reproduced on the synchronous client."""
+    from fastapi import Depends, FastAPI
+    from postgrest import SyncPostgrestClient
+
+    from app.auth import get_current_user
+    from app.schemas.nutrition import DailySummary, DayTypeResponse, MealResponse
+
+    client = SyncPostgrestClient(
+        f"{supabase_url}/rest/v1",
+        headers={"apikey": service_key, "Authorization": f"Bearer {service_key}"},
+    )
+    app = FastAPI()
+
+    @app.get("/meals/day/{day}", response_model=DailySummary)
+    async def get_day(day: date, user=Depends(get_current_user)):
+        meals = client.table("meals").select("*").eq("user_id", user["id"]).eq("logged_date", str(day)).order("created_at").execute().data or []
+        log_res = client.table("day_logs").select("day_type_id, day_types(*)").eq("user_id", user["id"]).eq("logged_date", str(day)).limit(1).execute()
+        day_type = None
+        if log_res.data and log_res.data[0].get("day_types"):
+            day_type = DayTypeResponse(**log_res.data[0]["day_types"])
+        if day_type is None:
+            profile = client.table("profiles").select("default_day_type_id").eq("id", user["id"]).single().execute().data
+            if profile and profile.get("default_day_type_id"):
+                dt = client.table("day_types").select("*").eq("id", profile["default_day_type_id"]).eq("user_id", user["id"]).single().execute().data
+                day_type = DayTypeResponse(**dt) if dt else None
+        return DailySummary(
+            date=day,
+            total_calories=sum(m["calories"] for m in meals),
+            total_protein=sum(m["protein_g"] or 0 for m in meals),
+            total_carbs=sum(m["carbs_g"] or 0 for m in meals),
+            total_fat=sum(m["fat_g"] or 0 for m in meals),
+            total_fiber=sum(m["fiber_g"] or 0 for m in meals),
+            meals=[MealResponse(**m) for m in meals],
+            day_type=day_type,
+        )
+
+    return app
+
+
+async def measure(app, token: str, path: str, clients: int, requests: int) -> harness.LoadResult:
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path, headers=headers)  # warm the connection pool and token cache
+
+        async def send(_):
+            return (await client.get(path, headers=headers)).status_code
+
+        return await harness.drive(send, clients, requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every PostgREST call")
+    parser.add_argument("--meals", type=int, default=6, help="meals logged on the benchmarked day")
+    args = parser.parse_args()
+
+    supabase_url = harness.serve_in_process(serve, args.latency)
+    harness.configure_environment(supabase_url)
+
+    from app.config import settings
+    from app.main import app
+
+    user_id = str(uuid.uuid4())
+    day = date.today()
+    seed(supabase_url, user_id, day, args.meals)
+    token = harness.user_token(user_id)
+    path = f"/meals/day/{day}"
+
+    async def run():
+        before = await measure(blocking_app(supabase_url, settings.supabase_service_role_key), token, path, args.clients, args.requests)
+        after = await measure(app, token, path, args.clients, args.requests)
+        return before, after
+
+    before, after = asyncio.run(run())
+    print(f"GET {path}: {args.clients} clients, {args.requests} requests, {args.latency * 1000:.0f} ms PostgREST latency")
+    for label, result in (("before (sync client)", before), ("after (async pool)", after)):
+        print(
+            f"  {label:<22} {result.throughput:8.1f} req/s   "
+            f"p50 {result.percentile(50) * 1000:7.1f} ms   p99 {result.percentile(99) * 1000:7.1f} ms   "
+            f"errors {result.errors}"
+        )
+    print(f"  speedup: {after.throughput / before.throughput:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
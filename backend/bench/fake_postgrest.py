@@ -0,0 +1,777 @@
+"""In-memory stand-in for Supabase's PostgREST and Auth APIs, for benchmarks.
+
+Implements the slice of PostgREST the backend uses: column/embedded selects,
+the common filter operators, order/limit/offset, single-object responses,
+insert/upsert/update/delete with `return=representation`, and RPCs registered
+as Python callables. Of Auth, it answers `GET /auth/v1/user` (AUTH_MODE=remote)
+and serves an empty JWKS. Every request sleeps for `latency` seconds first, to
+model the network round-trip to a hosted project.
+"""
+import asyncio
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from jose import jwt
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(value: Any, raw: str) -> Any:
+    """Convert a filter's string operand to the type of the stored value."""
+    if raw == "null":
+        return None
+    if isinstance(value, bool):
+        return raw == "true"
+    if isinstance(value, (int, float)):
+        return float(raw)
+    return raw
+
+
+def _split_top_level(text: str) -> list[str]:
+    """Split on commas that aren't inside parentheses or double quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return [p.strip() for p in parts]
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, operand = expression.partition(".")
+    value = row.get(column)
+    if op == "in":
+        options = [o.strip('"') for o in _split_top_level(operand[1:-1])]
+        result = value is not None and str(value) in options
+    elif op == "is":
+        result = value is None if operand == "null" else value is (operand == "true")
+    else:
+        operand = operand.strip('"')
+        target = _coerce(value, operand)
+        if value is None or target is None:
+            result = False
+        elif op == "eq":
+            result = value == target
+        elif op == "neq":
+            result = value != target
+        elif op == "gt":
+            result = value > target
+        elif op == "gte":
+            result = value >= target
+        elif op == "lt":
+            result = value < target
+        elif op == "lte":
+            result = value <= target
+        elif op in ("like", "ilike"):
+            needle = operand.replace("*", "").replace("%", "")
+            haystack = str(value)
+            result = needle.lower() in haystack.lower() if op == "ilike" else needle in haystack
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return not result if negate else result
+
+
+def _matches_or(row: dict, expression: str) -> bool:
+    for clause in _split_top_level(expression[1:-1]):
+        if clause.startswith("and("):
+            if all(_matches(row, *part.split(".", 1)) for part in _split_top_level(clause[4:-1])):
+                return True
+        elif _matches(row, *clause.split(".", 1)):
+            return True
+    return False
+
+
+# Columns looked up through hash indexes (see FakePostgrest.where); they hold ids,
+# which rows never change after insert
+INDEXED_COLUMNS = ("id", "user_id", "recipe_id", "meal_id")
+
+# Server-side column defaults the app relies on being filled in
+COLUMN_DEFAULTS = {
+    "recipes": {f"total_{macro}": 0 for macro in ("calories", "protein", "carbs", "fat", "fiber")},
+}
+
+
+# Python twins of the SQL functions in supabase/migrations, keyed by name
+RPCS: dict[str, Callable[["FakePostgrest", dict], Any]] = {}
+
+
+def rpc(fn: Callable) -> Callable:
+    RPCS[fn.__name__] = fn
+    return fn
+
+
+# Python twins of the triggers, run after any write to their table with the event
+# ("insert", "update" or "delete") and the rows written (for updates, both before
+# and after images)
+TRIGGERS: dict[str, list[Callable[["FakePostgrest", str, str, list[dict]], None]]] = {}
+
+
+def trigger(*tables: str) -> Callable:
+    def register(fn: Callable) -> Callable:
+        for table in tables:
+            TRIGGERS.setdefault(table, []).append(fn)
+        return fn
+    return register
+
+
+class FakePostgrest:
+    """Tables are plain lists of dicts, keyed by table name.
+
+    Equality lookups on INDEXED_COLUMNS go through per-column hash indexes, so
+    request cost stays flat as the dataset grows to production sizes; every
+    other filter is a scan of the candidate rows.
+    """
+
+    def __init__(self, latency: float = 0.0, primary_keys: Optional[dict[str, tuple]] = None):
+        self.latency = latency
+        self.tables: dict[str, list[dict]] = {}
+        self._indexes: dict[tuple[str, str], dict[Any, list[dict]]] = {}
+        self.primary_keys = primary_keys or {"day_logs": ("user_id", "logged_date")}
+        self.rpcs = dict(RPCS)
+        self.request_count = 0
+        self.auth_request_count = 0
+        self.xid = 0  # stands in for the writing transaction's id (see touch_row)
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{name}", self._handle_rpc, methods=["GET", "POST"]),
+            Route("/rest/v1/{table}", self._handle_table, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+            Route("/auth/v1/user", self._handle_auth_user, methods=["GET"]),
+            Route("/auth/v1/.well-known/jwks.json", self._handle_jwks, methods=["GET"]),
+            Route("/_bench/stats", self._handle_stats, methods=["GET", "DELETE"]),
+        ])
+
+    def table(self, name: str) -> list[dict]:
+        return self.tables.setdefault(name, [])
+
+    def insert(self, name: str, row: dict) -> dict:
+        row = {"created_at": _now(), **COLUMN_DEFAULTS.get(name, {}), **row}
+        if "user_id" not in self.primary_keys.get(name, ()):
+            row.setdefault("id", str(uuid.uuid4()))
+        self.table(name).append(row)
+        for (table, column), index in self._indexes.items():
+            if table == name:
+                index.setdefault(row.get(column), []).append(row)
+        return row
+
+    def delete(self, name: str, rows: list[dict]) -> None:
+        ids = {id(r) for r in rows}
+        self.tables[name] = [r for r in self.table(name) if id(r) not in ids]
+        self._indexes = {key: index for key, index in self._indexes.items() if key[0] != name}
+        self.fire(name, "delete", rows)
+
+    def where(self, table: str, column: str, value: Any) -> list[dict]:
+        """Rows whose `column` equals `value`, through an index built on first use."""
+        index = self._indexes.get((table, column))
+        if index is None:
+            index = self._indexes[(table, column)] = {}
+            for row in self.table(table):
+                index.setdefault(row.get(column), []).append(row)
+        return index.get(value, [])
+
+    def find(self, table: str, **where) -> Optional[dict]:
+        (column, value), *rest = where.items()
+        return next((r for r in self.where(table, column, value) if all(r.get(k) == v for k, v in rest)), None)
+
+    def fire(self, table: str, event: str, rows: list[dict]) -> None:
+        if rows:
+            for fn in TRIGGERS.get(table, []):
+                fn(self, table, event, rows)
+
+    # -- query evaluation -------------------------------------------------
+
+    def _candidates(self, table: str, params: list[tuple[str, str]]) -> list[dict]:
+        for key, expression in params:
+            if key in INDEXED_COLUMNS and expression.startswith("eq."):
+                return self.where(table, key, expression[3:].strip('"'))
+        return self.table(table)
+
+    def _filter(self, table: str, params: list[tuple[str, str]]) -> list[dict]:
+        rows = self._candidates(table, params)
+        for key, expression in params:
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns") or "." in key:
+                continue  # "." marks a modifier of an embedded resource, e.g. recipe_ingredients.order
+            if key == "or":
+                rows = [r for r in rows if _matches_or(r, expression)]
+            else:
+                rows = [r for r in rows if _matches(r, key, expression)]
+        return rows
+
+    def _embed(self, table: str, row: dict, embedded: str, columns: str, hint: str = "") -> Any:
+        if hint.startswith(f"{embedded}_") and hint.endswith("_fkey"):
+            # "<embedded>_<column>_fkey" names the embedded table's column that points here
+            column = hint[len(embedded) + 1:-len("_fkey")]
+            return [self._project(embedded, r, columns) for r in self.where(embedded, column, row.get("id"))]
+        many_to_one = f"{embedded.rstrip('s')}_id"
+        if many_to_one in row:
+            target = self.find(embedded, id=row[many_to_one])
+            return self._project(embedded, target, columns) if target else None
+        one_to_many = f"{table.rstrip('s')}_id"
+        return [self._project(embedded, r, columns) for r in self.where(embedded, one_to_many, row.get("id"))]
+
+    def _project(self, table: str, row: dict, select: str) -> dict:
+        if select in ("", "*"):
+            return dict(row)
+        result = {}
+        for column in _split_top_level(select):
+            if column.endswith(")"):
+                name, _, inner = column[:-1].partition("(")
+                name, _, hint = name.partition("!")
+                result[name] = self._embed(table, row, name, inner, hint)
+            elif column == "*":
+                result.update(row)
+            else:
+                result[column] = row.get(column)
+        return result
+
+    @staticmethod
+    def _sort(rows: list[dict], order: str) -> list[dict]:
+        for term in reversed(order.split(",") if order else []):
+            column, *modifiers = term.split(".")
+            rows = sorted(
+                rows,
+                key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0),
+                reverse="desc" in modifiers,
+            )
+        return rows
+
+    def _select(self, table: str, params: list[tuple[str, str]]) -> list[dict]:
+        query = dict(params)
+        rows = self._sort(self._filter(table, params), query.get("order", ""))
+        offset = int(query.get("offset", 0))
+        rows = rows[offset:]
+        if "limit" in query:
+            rows = rows[: int(query["limit"])]
+        return self._represent(table, rows, params)
+
+    def _represent(self, table: str, rows: list[dict], params: list[tuple[str, str]]) -> list[dict]:
+        """`rows` projected to the request's select, with embedded rows ordered."""
+        query = dict(params)
+        projected = [self._project(table, r, query.get("select", "*")) for r in rows]
+        for key, order in query.items():
+            embedded, _, modifier = key.partition(".")
+            if modifier == "order":
+                for row in projected:
+                    if isinstance(row.get(embedded), list):
+                        row[embedded] = self._sort(row[embedded], order)
+        return projected
+
+    def _write(self, table: str, request_json: Any, prefer: str, params: list[tuple[str, str]]) -> list[dict]:
+        rows = request_json if isinstance(request_json, list) else [request_json]
+        on_conflict = dict(params).get("on_conflict")
+        keys = tuple(on_conflict.split(",")) if on_conflict else self.primary_keys.get(table, ("id",))
+        written = []
+        for payload in rows:
+            existing = None
+            if "resolution=" in prefer and all(payload.get(k) is not None for k in keys):
+                existing = next(
+                    (r for r in self.table(table) if all(str(r.get(k)) == str(payload[k]) for k in keys)),
+                    None,
+                )
+            if existing is not None:
+                if "resolution=ignore-duplicates" in prefer:
+                    continue
+                existing.update(payload)
+                written.append(existing)
+            else:
+                written.append(self.insert(table, payload))
+        return written
+
+    # -- HTTP handlers ----------------------------------------------------
+
+    def _respond(self, request: Request, rows: Any, status_code: int = 200) -> Response:
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if not isinstance(rows, list) or len(rows) != 1:
+                return JSONResponse({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }, status_code=406)
+            rows = rows[0]
+        return JSONResponse(rows, status_code=status_code)
+
+    async def _handle_stats(self, request: Request) -> Response:
+        if request.method == "DELETE":
+            self.request_count = 0
+            self.auth_request_count = 0
+        return JSONResponse({"requests": self.request_count, "auth_requests": self.auth_request_count})
+
+    async def _handle_auth_user(self, request: Request) -> Response:
+        # Signatures aren't checked: every token the benchmarks hand out is good
+        self.auth_request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except Exception:
+            return JSONResponse({"code": 401, "msg": "invalid JWT"}, status_code=401)
+        return JSONResponse({
+            "id": claims["sub"],
+            "email": claims.get("email"),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": _now(),
+        })
+
+    async def _handle_jwks(self, request: Request) -> Response:
+        self.auth_request_count += 1
+        return JSONResponse({"keys": []})
+
+    async def _handle_table(self, request: Request) -> Response:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        table = request.path_params["table"]
+        params = list(request.query_params.multi_items())
+        prefer = request.headers.get("prefer", "")
+
+        if request.method in ("GET", "HEAD"):
+            return self._respond(request, self._select(table, params))
+        if request.method == "POST":
+            written = self._write(table, json.loads(await request.body()), prefer, params)
+            self.fire(table, "insert", written)
+            return self._respond(request, self._represent(table, written, params), 201)
+        if request.method == "PATCH":
+            changes = json.loads(await request.body())
+            rows = self._filter(table, params)
+            before = [dict(r) for r in rows]
+            for row in rows:
+                row.update(changes)
+            self.fire(table, "update", before + rows)
+            return self._respond(request, self._represent(table, rows, params))
+        rows = self._filter(table, params)
+        representation = self._represent(table, rows, params)
+        self.delete(table, rows)
+        return self._respond(request, representation)
+
+    async def _handle_rpc(self, request: Request) -> Response:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = request.path_params["name"]
+        if name not in self.rpcs:
+            return JSONResponse({"code": "PGRST202", "message": f"Unknown function {name}", "details": None, "hint": None}, status_code=404)
+        body = await request.body()
+        args = json.loads(body) if body else dict(request.query_params)
+        try:
+            result = self.rpcs[name](self, args)
+        except LookupError as e:
+            return JSONResponse({"code": "P0002", "message": str(e), "details": None, "hint": None}, status_code=400)
+        return self._respond(request, result)
+
+
+@trigger("recipe_ingredients")
+def maintain_recipe_totals(fake: FakePostgrest, table: str, event: str, rows: list[dict]) -> None:
+    for recipe_id in {r["recipe_id"] for r in rows}:
+        recipe = fake.find("recipes", id=recipe_id)
+        if recipe is None:
+            continue
+        checked = [i for i in fake.where("recipe_ingredients", "recipe_id", recipe_id) if i.get("checked", True)]
+        for macro in ("calories", "protein", "carbs", "fat", "fiber"):
+            recipe[f"total_{macro}"] = sum(i["quantity"] * i[f"{macro}_per_unit"] for i in checked)
+
+
+# resource and scope column of each versioned table (see bump_resource_version)
+VERSIONED_TABLES = {
+    "profiles": ("profile", "id"),
+    "day_types": ("day_types", "user_id"),
+    "day_logs": ("meals", "user_id"),
+    "meals": ("meals", "user_id"),
+    "recipes": ("recipes", "user_id"),
+    "recipe_ingredients": ("recipes", None),
+    "ingredients": ("ingredients", None),
+}
+
+
+@trigger(*VERSIONED_TABLES)
+def bump_resource_version(fake: FakePostgrest, table: str, event: str, rows: list[dict]) -> None:
+    resource, column = VERSIONED_TABLES[table]
+    if table == "ingredients":
+        scopes = {"00000000-0000-0000-0000-000000000000"}
+    elif table == "recipe_ingredients":
+        scopes = {(fake.find("recipes", id=recipe_id) or {}).get("user_id") for recipe_id in {r["recipe_id"] for r in rows}}
+    else:
+        scopes = {r.get(column) for r in rows}
+    versions = fake.table("resource_versions")
+    for scope in scopes - {None}:
+        row = _find(versions, scope=scope, resource=resource)
+        if row is None:
+            versions.append({"scope": scope, "resource": resource, "version": 1})
+        else:
+            row["version"] += 1
+
+
+SYNCED_TABLES = {"meals": "id", "recipes": "id", "recipe_ingredients": "id", "day_types": "id", "day_logs": "logged_date"}
+
+
+@trigger(*SYNCED_TABLES)
+def touch_row(fake: FakePostgrest, table: str, event: str, rows: list[dict]) -> None:
+    # Also the deletion log (record_deleted_rows)
+    fake.xid += 1
+    for row in rows:
+        if event != "delete":
+            row["change_xid"] = fake.xid
+            row["updated_at"] = _now()
+            continue
+        user_id = row.get("user_id") or (fake.find("recipes", id=row.get("recipe_id")) or {}).get("user_id")
+        if user_id:
+            fake.table("deleted_rows").append({
+                "user_id": user_id,
+                "table_name": table,
+                "row_key": str(row[SYNCED_TABLES[table]]),
+                "deleted_at": _now(),
+                "deleted_xid": fake.xid,
+            })
+
+
+def _find(rows: list[dict], **where) -> Optional[dict]:
+    return next((r for r in rows if all(r.get(k) == v for k, v in where.items())), None)
+
+
+def _day_type_for(fake: FakePostgrest, user_id: str, day: str) -> Optional[dict]:
+    log = fake.find("day_logs", user_id=user_id, logged_date=day)
+    profile = fake.find("profiles", id=user_id) or {}
+    day_type_id = (log or {}).get("day_type_id") or profile.get("default_day_type_id")
+    return fake.find("day_types", id=day_type_id, user_id=user_id) if day_type_id else None
+
+
+@rpc
+def get_daily_summary(fake: FakePostgrest, args: dict) -> list[dict]:
+    user_id, day = args["p_user_id"], args["p_date"]
+    meals = sorted(
+        (m for m in fake.where("meals", "user_id", user_id) if m["logged_date"] == day),
+        key=lambda m: m["created_at"],
+    )
+    return [{
+        "meals": meals,
+        "total_calories": sum(m["calories"] for m in meals),
+        "total_protein": sum(m.get("protein_g") or 0 for m in meals),
+        "total_carbs": sum(m.get("carbs_g") or 0 for m in meals),
+        "total_fat": sum(m.get("fat_g") or 0 for m in meals),
+        "total_fiber": sum(m.get("fiber_g") or 0 for m in meals),
+        "day_type": _day_type_for(fake, user_id, day),
+    }]
+
+
+@rpc
+def get_meal_history(fake: FakePostgrest, args: dict) -> list[dict]:
+    start, end, bucket = args.get("p_start"), args.get("p_end"), args.get("p_bucket", "day")
+    periods: dict[str, dict] = {}
+    for m in fake.where("meals", "user_id", args["p_user_id"]):
+        logged = m["logged_date"]
+        if (start and logged < start) or (end and logged > end):
+            continue
+        day = date.fromisoformat(logged)
+        if bucket == "week":
+            day -= timedelta(days=day.weekday())
+        elif bucket == "month":
+            day = day.replace(day=1)
+        totals = periods.setdefault(str(day), {"date": str(day), "days": set(), "meal_count": 0, "calories": 0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0, "fiber_g": 0.0})
+        totals["days"].add(logged)
+        totals["meal_count"] += 1
+        for column in ("calories", "protein_g", "carbs_g", "fat_g", "fiber_g"):
+            totals[column] += m.get(column) or 0
+    rows = []
+    for _, totals in sorted(periods.items(), reverse=True):
+        totals["days_logged"] = len(totals.pop("days"))
+        rows.append(totals)
+    return rows[: args["p_limit"]] if args.get("p_limit") else rows
+
+
+@rpc
+def lookup_upc(fake: FakePostgrest, args: dict) -> list[dict]:
+    normalized = args["p_upc"].lstrip("0")
+    if not normalized:
+        return []
+    columns = ("upc", "source", "source_name", "usda_fdc_id", "calories_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g", "fiber_per_100g")
+    ingredients = [i for i in fake.table("ingredients") if i.get("upc") and i["upc"].lstrip("0") == normalized]
+    if ingredients:
+        ingredient = max(ingredients, key=lambda i: i.get("updated_at") or i["created_at"])
+        ingredient = {**ingredient, "source": ingredient.get("source") or "manual", "source_name": ingredient.get("source_name") or ingredient["name"]}
+        return [{c: ingredient.get(c) for c in columns}]
+    product = _find(fake.table("upc_products"), upc_normalized=normalized)
+    return [{c: product.get(c) for c in columns}] if product else []
+
+
+@rpc
+def import_fdc_nutrients(fake: FakePostgrest, args: dict) -> list[dict]:
+    foods = {str(f["fdc_id"]): f for f in fake.table("fdc_foods")}
+    updated = set()
+    for row in args["p_rows"]:
+        food = foods.get(str(row["fdc_id"]))
+        if food is not None:
+            food.update({k: v for k, v in row.items() if k != "fdc_id" and v is not None})
+            updated.add(id(food))
+    return [{"updated_count": len(updated)}]
+
+
+@rpc
+def import_branded_upcs(fake: FakePostgrest, args: dict) -> list[dict]:
+    barcodes: dict[str, dict] = {}
+    for row in args["p_rows"]:
+        if row["upc_normalized"] not in barcodes or barcodes[row["upc_normalized"]]["fdc_id"] < row["fdc_id"]:
+            barcodes[row["upc_normalized"]] = row
+    products = fake.table("upc_products")
+    upserted = 0
+    for normalized, row in barcodes.items():
+        food = fake.find("fdc_foods", fdc_id=row["fdc_id"])
+        existing = _find(products, upc_normalized=normalized)
+        if food is None or (existing and existing["source"] == "usda" and int(existing["usda_fdc_id"]) > row["fdc_id"]):
+            continue
+        product = {
+            "upc_normalized": normalized,
+            "upc": row["upc"],
+            "source": "usda",
+            "source_name": food["description"].title(),
+            "usda_fdc_id": str(food["fdc_id"]),
+            **{c: food.get(c, 0) for c in ("calories_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g", "fiber_per_100g")},
+            "updated_at": _now(),
+        }
+        if existing:
+            existing.update(product)
+        else:
+            fake.insert("upc_products", product)
+        upserted += 1
+    return [{"upserted_count": upserted}]
+
+
+@rpc
+def search_fdc_foods(fake: FakePostgrest, args: dict) -> list[dict]:
+    words = [w for w in "".join(c if c.isalnum() else " " for c in args["p_query"].lower()).split()]
+    if not words:
+        return []
+
+    def matches(food: dict) -> bool:
+        tokens = "".join(c if c.isalnum() else " " for c in food["description"].lower()).split()
+        return all(any(t.startswith(w) for t in tokens) for w in words)
+
+    found = sorted(
+        (f for f in fake.table("fdc_foods") if matches(f)),
+        key=lambda f: (f["data_type"] == "branded_food", len(f["description"]), f["fdc_id"]),
+    )
+    columns = ("fdc_id", "data_type", "description", "calories_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g", "fiber_per_100g")
+    return [{c: f.get(c, 0) for c in columns} for f in found[: args.get("p_limit", 20)]]
+
+
+@rpc
+def search_ingredients(fake: FakePostgrest, args: dict) -> list[dict]:
+    term = args["p_query"].lower()
+
+    def rank(name: str) -> int:
+        name = name.lower()
+        return 2 if name.startswith(term) else 1 if f" {term}" in name else 0
+
+    def key(rank: int, name: str, ingredient_id: str) -> tuple:
+        return (-rank, len(name), name, ingredient_id)
+
+    found = sorted(
+        ({"rank": rank(i["name"]), "ingredient": dict(i)} for i in fake.table("ingredients") if term in i["name"].lower()),
+        key=lambda m: key(m["rank"], m["ingredient"]["name"], m["ingredient"]["id"]),
+    )
+    if args.get("p_after_id") is not None:
+        after = key(args["p_after_rank"], args["p_after_name"], args["p_after_id"])
+        found = [m for m in found if key(m["rank"], m["ingredient"]["name"], m["ingredient"]["id"]) > after]
+    return found[: args.get("p_limit", 20)]
+
+
+@rpc
+def log_recipe(fake: FakePostgrest, args: dict) -> list[dict]:
+    user_id, recipe_id = args["p_user_id"], args["p_recipe_id"]
+    recipe = fake.find("recipes", id=recipe_id, user_id=user_id)
+    if recipe is None:
+        raise LookupError("Recipe not found")
+    cooked, portion = args.get("p_total_cooked_weight"), args.get("p_portion_weight")
+    scale = portion / cooked if cooked and cooked > 0 and portion else 1.0
+    ingredients = {ri["id"]: ri for ri in fake.where("recipe_ingredients", "recipe_id", recipe_id)}
+    used = [(o, ingredients[o["ingredient_id"]]) for o in args["p_ingredient_overrides"] if o["ingredient_id"] in ingredients]
+
+    def total(column: str) -> float:
+        return sum(o["quantity"] * ri[column] for o, ri in used) * scale
+
+    meal = fake.insert("meals", {
+        "user_id": user_id,
+        "logged_date": args["p_logged_date"],
+        "meal_type": args["p_meal_type"],
+        "name": recipe["name"],
+        "calories": round(total("calories_per_unit")),
+        "protein_g": round(total("protein_per_unit"), 1),
+        "carbs_g": round(total("carbs_per_unit"), 1),
+        "fat_g": round(total("fat_per_unit"), 1),
+        "fiber_g": round(total("fiber_per_unit"), 1),
+        "notes": None,
+        "raw_weight": round(sum(o["quantity"] for o in args["p_ingredient_overrides"]), 1),
+        "total_cooked_weight": round(cooked, 1) if cooked else None,
+        "portion_weight": round(portion, 1) if portion else None,
+        "recipe_id": recipe_id,
+        "client_key": None,
+    })
+    for o, ri in used:
+        fake.insert("meal_ingredients", {
+            "meal_id": meal["id"],
+            "recipe_ingredient_id": ri["id"],
+            "quantity": o["quantity"],
+            **{k: ri.get(k) for k in ("food_name", "unit", "calories_per_unit", "protein_per_unit", "carbs_per_unit", "fat_per_unit", "fiber_per_unit", "usda_fdc_id")},
+        })
+    recipe["last_meal_type"] = args["p_meal_type"]
+    if cooked:
+        recipe["last_cooked_weight"] = round(cooked, 1)
+    fake.fire("meals", "insert", [meal])
+    fake.fire("recipes", "update", [recipe])
+    return [meal]
+
+
+@rpc
+def restore_recipe_from_meal(fake: FakePostgrest, args: dict) -> list[dict]:
+    user_id, recipe_id, meal_id = args["p_user_id"], args["p_recipe_id"], args["p_meal_id"]
+    recipe = fake.find("recipes", id=recipe_id, user_id=user_id)
+    if recipe is None:
+        raise LookupError("Recipe not found")
+    if fake.find("meals", id=meal_id, user_id=user_id, recipe_id=recipe_id) is None:
+        raise LookupError("Meal not found")
+    snapshot = fake.where("meal_ingredients", "meal_id", meal_id)
+    current = {ri["id"]: ri for ri in fake.where("recipe_ingredients", "recipe_id", recipe_id)}
+    used = {mi["recipe_ingredient_id"]: mi for mi in snapshot if mi.get("recipe_ingredient_id") in current}
+    for ingredient_id, ingredient in current.items():
+        ingredient["checked"] = ingredient_id in used
+        if ingredient_id in used:
+            ingredient["quantity"] = used[ingredient_id]["quantity"]
+    for mi in snapshot:
+        if mi.get("recipe_ingredient_id") not in current:
+            fake.insert("recipe_ingredients", {
+                **{k: v for k, v in mi.items() if k not in ("id", "meal_id", "recipe_ingredient_id", "created_at")},
+                "recipe_id": recipe_id,
+                "checked": True,
+            })
+    ingredients = sorted(fake.where("recipe_ingredients", "recipe_id", recipe_id), key=lambda ri: ri["created_at"])
+    fake.fire("recipe_ingredients", "update", ingredients)
+    return [{"recipe": recipe, "ingredients": ingredients}]
+
+
+def _owned_ingredient(fake: FakePostgrest, args: dict) -> Optional[dict]:
+    if fake.find("recipes", id=args["p_recipe_id"], user_id=args["p_user_id"]) is None:
+        return None
+    return fake.find("recipe_ingredients", id=args["p_ingredient_id"], recipe_id=args["p_recipe_id"])
+
+
+@rpc
+def add_recipe_ingredient(fake: FakePostgrest, args: dict) -> list[dict]:
+    if fake.find("recipes", id=args["p_recipe_id"], user_id=args["p_user_id"]) is None:
+        return []
+    ingredient = {**args["p_ingredient"], "recipe_id": args["p_recipe_id"]}
+    if ingredient.get("usda_fdc_id") is not None:
+        ingredient["usda_fdc_id"] = str(ingredient["usda_fdc_id"])
+    row = fake.insert("recipe_ingredients", ingredient)
+    fake.fire("recipe_ingredients", "insert", [row])
+    return [row]
+
+
+@rpc
+def update_recipe_ingredient(fake: FakePostgrest, args: dict) -> list[dict]:
+    row = _owned_ingredient(fake, args)
+    if row is None:
+        return []
+    for column in ("checked", "quantity"):
+        if args.get(f"p_{column}") is not None:
+            row[column] = args[f"p_{column}"]
+    fake.fire("recipe_ingredients", "update", [row])
+    return [row]
+
+
+@rpc
+def delete_recipe_ingredient(fake: FakePostgrest, args: dict) -> list[dict]:
+    row = _owned_ingredient(fake, args)
+    if row is None:
+        return []
+    fake.delete("recipe_ingredients", [row])
+    return [row]
+
+
+def _owned_by(fake: FakePostgrest, table: str, user_id: str) -> Callable[[dict], bool]:
+    if table == "recipe_ingredients":
+        recipe_ids = {r["id"] for r in fake.table("recipes") if r["user_id"] == user_id}
+        return lambda r: r["recipe_id"] in recipe_ids
+    return lambda r: r["user_id"] == user_id
+
+
+def _without_xid(rows: list[dict]) -> list[dict]:
+    return [{k: v for k, v in r.items() if k != "change_xid"} for r in rows]
+
+
+@rpc
+def sync_changes(fake: FakePostgrest, args: dict) -> list[dict]:
+    user_id, since = args["p_user_id"], int(args["p_since"])
+    horizon = fake.table("sync_horizon")
+    expired = bool(horizon) and int(horizon[0]["pruned_through"]) >= since
+
+    def changed(table: str) -> list[dict]:
+        if expired:
+            return []
+        owned = _owned_by(fake, table, user_id)
+        rows = [r for r in fake.table(table) if owned(r) and r.get("change_xid", 0) >= since]
+        return _without_xid(sorted(rows, key=lambda r: r.get("change_xid", 0)))
+
+    return [{
+        "next_cursor": str(fake.xid + 1),
+        **{table: changed(table) for table in SYNCED_TABLES},
+        "deleted": [] if expired else [
+            {"table": d["table_name"], "key": d["row_key"], "deleted_at": d["deleted_at"]}
+            for d in fake.table("deleted_rows")
+            if d["user_id"] == user_id and d["deleted_xid"] >= since
+        ],
+        "expired": expired,
+    }]
+
+
+@rpc
+def sync_page(fake: FakePostgrest, args: dict) -> list[dict]:
+    table, after = args["p_table"], args.get("p_after")
+    key, owned = SYNCED_TABLES[table], _owned_by(fake, table, args["p_user_id"])
+    rows = sorted((r for r in fake.table(table) if owned(r) and (after is None or str(r[key]) > after)), key=lambda r: str(r[key]))
+    return [{"next_cursor": str(fake.xid + 1), "rows": _without_xid(rows[: args["p_limit"]])}]
+
+
+@rpc
+def prune_deleted_rows(fake: FakePostgrest, args: dict) -> list[dict]:
+    # Intervals as app.commands.prune_deleted_rows sends them: "<n> days"
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=float(args["p_older_than"].split()[0]))).isoformat()
+    tombstones = fake.table("deleted_rows")
+    pruned = [d for d in tombstones if d["deleted_at"] < cutoff]
+    tombstones[:] = [d for d in tombstones if d["deleted_at"] >= cutoff]
+    if pruned:
+        newest = max(d["deleted_xid"] for d in pruned)
+        horizon = fake.table("sync_horizon")
+        if not horizon:
+            horizon.append({"id": True, "pruned_through": newest})
+        else:
+            horizon[0]["pruned_through"] = max(horizon[0]["pruned_through"], newest)
+    return [{"pruned_count": len(pruned)}]
+
+
+def serve(port: int, latency: float) -> None:
+    """Process entry point used by `bench.harness.serve_in_process`."""
+    import uvicorn
+
+    uvicorn.run(FakePostgrest(latency=latency).app, host="127.0.0.1", port=port, log_level="warning")
@@ -0,0 +1,74 @@
+"""Stand-ins for USDA FoodData Central and Open Food Facts, for benchmarks.
+
+Serves `GET /usda/foods/search` and `GET /off/api/v0/product/<upc>.json`.
+Each answers with a fixture response when one is given (the same one for
+every query or barcode), and otherwise with a synthetic one seeded by the
+query, so repeated queries get the same foods. Every request sleeps for
+`latency` seconds first, to model the round-trip to the public API.
+"""
+import asyncio
+import json
+from pathlib import Path
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from bench.fixtures import off_product_response, usda_search_response
+
+
+class FakeUpstreams:
+    def __init__(self, latency: float = 0.0, usda_fixture: Optional[dict] = None, off_fixture: Optional[dict] = None):
+        self.latency = latency
+        self.usda_fixture = usda_fixture
+        self.off_fixture = off_fixture
+        self.request_counts = {"usda": 0, "open_food_facts": 0}
+        self._generated: dict[str, bytes] = {}
+        self.app = Starlette(routes=[
+            Route("/usda/foods/search", self._handle_usda_search, methods=["GET"]),
+            Route("/off/api/v0/product/{upc}.json", self._handle_off_product, methods=["GET"]),
+            Route("/_bench/stats", self._handle_stats, methods=["GET", "DELETE"]),
+        ])
+
+    async def _wait(self, upstream: str) -> None:
+        self.request_counts[upstream] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _cached(self, key: str, build) -> Response:
+        # Built once per query or barcode, so the stand-in's own CPU stays out of the latencies
+        if key not in self._generated:
+            self._generated[key] = json.dumps(build()).encode()
+        return Response(self._generated[key], media_type="application/json")
+
+    async def _handle_usda_search(self, request: Request) -> Response:
+        await self._wait("usda")
+        query = request.query_params.get("query", "")
+        if self.usda_fixture is not None:
+            return JSONResponse(self.usda_fixture)
+        return self._cached(f"usda:{query}", lambda: usda_search_response(seed=sum(map(ord, query))))
+
+    async def _handle_off_product(self, request: Request) -> Response:
+        await self._wait("open_food_facts")
+        upc = request.path_params["upc"]
+        if self.off_fixture is not None:
+            return JSONResponse(self.off_fixture)
+        return self._cached(f"off:{upc}", lambda: off_product_response(upc))
+
+    async def _handle_stats(self, request: Request) -> Response:
+        if request.method == "DELETE":
+            self.request_counts = dict.fromkeys(self.request_counts, 0)
+        return JSONResponse(self.request_counts)
+
+
+def serve(port: int, latency: float, usda_fixture: Optional[str] = None, off_fixture: Optional[str] = None) -> None:
+    """Process entry point used by `bench.harness.serve_in_process`."""
+    import uvicorn
+
+    def load(path: Optional[str]) -> Optional[dict]:
+        return json.loads(Path(path).read_text()) if path else None
+
+    upstreams = FakeUpstreams(latency, load(usda_fixture), load(off_fixture))
+    uvicorn.run(upstreams.app, host="127.0.0.1", port=port, log_level="warning")
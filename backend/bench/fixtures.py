@@ -0,0 +1,181 @@
+"""Synthetic upstream responses and table rows shaped like the real ones, for benchmarks.
+
+bench/sample_responses/ holds a few hand-written USDA and Open Food Facts
+responses in the APIs' documented format (made-up fdcIds and barcodes, not
+recordings), which the bench serves and checks parsing against by default.
+The rest are generated from a seed, so they can be sized to the experiment.
+To benchmark against real responses instead, record them with
+`python -m bench.record_responses` and pass them with --fixture.
+"""
+import json
+import random
+import uuid
+from pathlib import Path
+from typing import Optional
+
+SAMPLE_RESPONSES = Path(__file__).parent / "sample_responses"
+# A /foods/search page mixing SR Legacy, Survey and branded foods
+USDA_SEARCH_SAMPLE = SAMPLE_RESPONSES / "usda_foods_search.json"
+# The branded-food search UPC lookup sends, for the page's first barcode
+USDA_UPC_SAMPLE = SAMPLE_RESPONSES / "usda_foods_search_upc.json"
+OFF_PRODUCT_SAMPLE = SAMPLE_RESPONSES / "off_product.json"
+
+# (nutrientId, nutrientNumber, nutrientName, unitName), as in FDC search results
+USDA_NUTRIENTS = [
+    (1003, "203", "Protein", "G"),
+    (1004, "204", "Total lipid (fat)", "G"),
+    (1005, "205", "Carbohydrate, by difference", "G"),
+    (1008, "208", "Energy", "KCAL"),
+    (1079, "291", "Fiber, total dietary", "G"),
+    (1087, "301", "Calcium, Ca", "MG"),
+    (1089, "303", "Iron, Fe", "MG"),
+    (1093, "307", "Sodium, Na", "MG"),
+    (1092, "306", "Potassium, K", "MG"),
+    (1104, "318", "Vitamin A, IU", "IU"),
+    (1162, "401", "Vitamin C, total ascorbic acid", "MG"),
+    (1253, "601", "Cholesterol", "MG"),
+    (1257, "605", "Fatty acids, total trans", "G"),
+    (1258, "606", "Fatty acids, total saturated", "G"),
+    (2000, "269", "Total Sugars", "G"),
+]
+
+WORDS = ["organic", "granola", "honey", "oat", "almond", "crunchy", "bar", "cereal", "whole", "grain", "dark", "chocolate", "peanut", "butter", "greek", "yogurt", "vanilla", "protein", "bites"]
+
+
+def usda_search_response(foods: int = 20, nutrients_per_food: int = 60, seed: int = 0) -> dict:
+    """A /foods/search page of branded foods, each with `nutrients_per_food` entries.
+
+    Real branded records list 30-100 nutrients, with the macros anywhere in
+    the list; the nutrients beyond USDA_NUTRIENTS get made-up ids.
+    """
+    rng = random.Random(seed)
+    page = []
+    for i in range(foods):
+        catalog = USDA_NUTRIENTS + [(3000 + n, str(700 + n), f"Nutrient {n}", "MG") for n in range(max(0, nutrients_per_food - len(USDA_NUTRIENTS)))]
+        rng.shuffle(catalog)
+        page.append({
+            "fdcId": 2000000 + i,
+            "description": " ".join(rng.sample(WORDS, 4)).upper(),
+            "dataType": "Branded Food",
+            "gtinUpc": f"{rng.randrange(10**11, 10**12):012d}",
+            "brandOwner": "Bench Foods Inc.",
+            "servingSize": rng.choice([28.0, 30.0, 40.0, 55.0, 170.0]),
+            "servingSizeUnit": "g",
+            "foodNutrients": [
+                {
+                    "nutrientId": nutrient_id,
+                    "nutrientName": name,
+                    "nutrientNumber": number,
+                    "unitName": unit,
+                    "derivationCode": "LCCS",
+                    "derivationDescription": "Calculated from value per serving size measure",
+                    "value": round(rng.uniform(0, 400), 2),
+                }
+                for nutrient_id, number, name, unit in catalog[:nutrients_per_food]
+            ],
+        })
+    return {"totalHits": foods, "currentPage": 1, "totalPages": 1, "foods": page}
+
+
+def load_or_generate_usda(fixture: Optional[Path], **kwargs) -> dict:
+    return json.loads(fixture.read_text()) if fixture else usda_search_response(**kwargs)
+
+
+FOODS = ["chicken breast", "brown rice", "broccoli", "olive oil", "black beans", "cheddar", "spinach", "sweet potato", "salmon", "quinoa", "egg", "tofu", "oats", "banana", "almonds"]
+
+
+def _timestamp(rng: random.Random) -> str:
+    return f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000000+00:00"
+
+
+def ingredient_rows(count: int = 1000, seed: int = 0) -> list[dict]:
+    """Rows of the shared `ingredients` catalog, as PostgREST returns them."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"{rng.choice(FOODS).title()} {' '.join(rng.sample(WORDS, 2))}",
+            "calories_per_100g": round(rng.uniform(10, 900), 2),
+            "protein_per_100g": round(rng.uniform(0, 40), 2),
+            "carbs_per_100g": round(rng.uniform(0, 80), 2),
+            "fat_per_100g": round(rng.uniform(0, 100), 2),
+            "fiber_per_100g": round(rng.uniform(0, 15), 2),
+            "usda_fdc_id": str(rng.randrange(100000, 2500000)) if rng.random() < 0.6 else None,
+            "upc": f"{rng.randrange(10**11, 10**12):012d}" if rng.random() < 0.3 else None,
+            "source": rng.choice(["usda", "open_food_facts", None]),
+            "source_name": None,
+            "created_at": _timestamp(rng),
+        }
+        for _ in range(count)
+    ]
+
+
+def recipe_rows(recipes: int = 200, ingredients_per_recipe: int = 12, seed: int = 0) -> list[dict]:
+    """`recipes` rows with their `recipe_ingredients(*)` embedded, as GET /recipes/ reads them."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(recipes):
+        recipe_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        ingredients = [
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "recipe_id": recipe_id,
+                "food_name": rng.choice(FOODS).title(),
+                "quantity": round(rng.uniform(5, 400), 2),
+                "unit": "g",
+                "calories_per_unit": round(rng.uniform(0.1, 9), 2),
+                "protein_per_unit": round(rng.uniform(0, 0.4), 2),
+                "carbs_per_unit": round(rng.uniform(0, 0.8), 2),
+                "fat_per_unit": round(rng.uniform(0, 1), 2),
+                "fiber_per_unit": round(rng.uniform(0, 0.15), 2),
+                "usda_fdc_id": str(rng.randrange(100000, 2500000)),
+                "checked": rng.random() < 0.9,
+                "created_at": _timestamp(rng),
+            }
+            for _ in range(ingredients_per_recipe)
+        ]
+        totals = {
+            f"total_{macro}": round(sum(i["quantity"] * i[f"{macro}_per_unit"] for i in ingredients if i["checked"]), 2)
+            for macro in ("calories", "protein", "carbs", "fat", "fiber")
+        }
+        rows.append({
+            "id": recipe_id,
+            "name": " ".join(rng.sample(FOODS, 2)).title() + " Bowl",
+            "servings": rng.randint(1, 6),
+            "last_cooked_weight": round(rng.uniform(200, 2000), 1) if rng.random() < 0.5 else None,
+            "last_meal_type": rng.choice(["Breakfast", "Lunch", "Dinner", "Snack", None]),
+            **totals,
+            "created_at": _timestamp(rng),
+            "recipe_ingredients": ingredients,
+        })
+    return rows
+
+
+def off_product_response(upc: str, seed: int = 0) -> dict:
+    """An Open Food Facts /api/v0/product/<upc>.json hit, with the usual nutriment keys."""
+    rng = random.Random(f"{seed}:{upc}")
+    per_100g = {
+        "energy-kcal_100g": round(rng.uniform(20, 600), 1),
+        "proteins_100g": round(rng.uniform(0, 30), 1),
+        "carbohydrates_100g": round(rng.uniform(0, 80), 1),
+        "fat_100g": round(rng.uniform(0, 40), 1),
+        "fiber_100g": round(rng.uniform(0, 12), 1),
+        "sugars_100g": round(rng.uniform(0, 40), 1),
+        "salt_100g": round(rng.uniform(0, 3), 2),
+    }
+    return {
+        "code": upc,
+        "status": 1,
+        "status_verbose": "product found",
+        "product": {
+            "code": upc,
+            "product_name": " ".join(rng.sample(WORDS, 3)).title(),
+            "brands": "Bench Foods",
+            "quantity": f"{rng.choice([250, 400, 500])} g",
+            "nutriments": {
+                **per_100g,
+                **{k.replace("_100g", "_serving"): round(v * 0.3, 2) for k, v in per_100g.items()},
+                "energy-kcal_unit": "kcal",
+            },
+        },
+    }
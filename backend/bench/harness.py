@@ -0,0 +1,106 @@
+"""Shared plumbing for the benchmarks: environment, servers and load drivers.
+
+Import this module before anything under `app`, so that Settings picks up the
+stand-in URLs and keys instead of a developer's `.env`.
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import httpx
+from jose import jwt
+
+BENCH_JWT_SECRET = "bench-jwt-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_process(target: Callable, *args) -> str:
+    """Run `target(port, *args)` in a child process, so the stand-in doesn't
+    compete with the app under test for the GIL; returns its base URL."""
+    port = _free_port()
+    process = multiprocessing.get_context("spawn").Process(target=target, args=(port, *args), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(500):
+        try:
+            httpx.get(f"{url}/_bench/stats")
+            return url
+        except httpx.TransportError:
+            time.sleep(0.02)
+    raise RuntimeError(f"{target.__name__} did not start")
+
+
+def configure_environment(supabase_url: str, upstream_url: Optional[str] = None) -> None:
+    """Point the app's Settings at the stand-in services."""
+    os.environ["SUPABASE_URL"] = supabase_url
+    os.environ["SUPABASE_ANON_KEY"] = jwt.encode({"role": "anon"}, BENCH_JWT_SECRET)
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = jwt.encode({"role": "service_role"}, BENCH_JWT_SECRET)
+    os.environ["SUPABASE_JWT_SECRET"] = BENCH_JWT_SECRET
+    os.environ.setdefault("USDA_API_KEY", "bench")
+    if upstream_url:
+        os.environ["USDA_API_URL"] = f"{upstream_url}/usda"
+        os.environ["OPEN_FOOD_FACTS_URL"] = f"{upstream_url}/off"
+
+
+def user_token(user_id: str, email: str = "bench@example.com", lifetime: int = 3600) -> str:
+    """A Supabase-style access token the app will accept with BENCH_JWT_SECRET."""
+    claims = {
+        "sub": user_id,
+        "email": email,
+        "role": "authenticated",
+        "aud": "authenticated",
+        "exp": int(time.time()) + lifetime,
+    }
+    return jwt.encode(claims, BENCH_JWT_SECRET, algorithm="HS256")
+
+
+@dataclass
+class LoadResult:
+    requests: int
+    elapsed: float
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(p) - 1]
+
+
+async def drive(send: Callable, concurrency: int, total: int) -> LoadResult:
+    """Issue `total` calls of `send(i)` from `concurrency` concurrent workers.
+
+    `send` returns the HTTP status code; anything >= 400 counts as an error.
+    """
+    counter = iter(range(total))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            status = await send(i)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return LoadResult(requests=total, elapsed=time.perf_counter() - started, latencies=latencies, errors=errors)
@@ -0,0 +1,59 @@
+"""Record USDA and Open Food Facts responses from the live APIs, for the benchmarks.
+
+Sends the same requests the app does (a /foods/search page, a USDA search by
+barcode and an Open Food Facts product) and writes each response as-is to
+--out, with the API key replaced wherever it's echoed back. They're named like
+the hand-written samples in bench/sample_responses/, and are passed to the
+benchmarks in their place:
+
+    cd backend
+    USDA_API_KEY=... python -m bench.record_responses --query granola --upc 016000275287 --out recorded
+    python -m bench.usda_parsing --fixture recorded/usda_foods_search.json
+    python -m bench.suite --usda-fixture recorded/usda_foods_search.json --off-fixture recorded/off_product.json
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import httpx
+
+USDA_API_URL = "https://api.nal.usda.gov/fdc/v1"
+OPEN_FOOD_FACTS_URL = "https://world.openfoodfacts.org"
+
+
+def _save(out: Path, name: str, response: httpx.Response, api_key: str) -> None:
+    response.raise_for_status()
+    text = response.text.replace(api_key, "REDACTED") if api_key else response.text
+    (out / name).write_text(json.dumps(json.loads(text), indent=1) + "\n")
+    print(f"  {out / name}: {len(text):,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--query", default="granola", help="the /foods/search query to record")
+    parser.add_argument("--upc", required=True, help="a barcode both USDA and Open Food Facts know")
+    parser.add_argument("--out", type=Path, required=True, help="directory to write the responses to")
+    args = parser.parse_args()
+    api_key = os.environ.get("USDA_API_KEY", "DEMO_KEY")
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    with httpx.Client(timeout=30) as client:
+        # Parameters as in app.routers.usda
+        _save(args.out, "usda_foods_search.json", client.get(f"{USDA_API_URL}/foods/search", params={
+            "query": args.query,
+            "api_key": api_key,
+            "dataType": ["Foundation", "SR Legacy", "Survey (FNDDS)", "Branded Food"],
+            "pageSize": 20,
+        }), api_key)
+        _save(args.out, "usda_foods_search_upc.json", client.get(f"{USDA_API_URL}/foods/search", params={
+            "query": args.upc,
+            "api_key": api_key,
+            "dataType": ["Branded Food"],
+            "pageSize": 10,
+        }), api_key)
+        _save(args.out, "off_product.json", client.get(f"{OPEN_FOOD_FACTS_URL}/api/v0/product/{args.upc}.json"), api_key)
+
+
+if __name__ == "__main__":
+    main()
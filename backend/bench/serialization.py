@@ -0,0 +1,96 @@
+"""Payload size and serialization time of the large list responses.
+
+"before" is FastAPI's default path: the route returns models, which are
+validated against response_model again, dumped, and encoded by the standard
+library's json. "after" is app.responses.prevalidated: one model_dump (or the
+raw rows, for endpoints that select exactly the model's columns) encoded by
+orjson. Sizes are reported raw and compressed the way CompressionMiddleware
+would (gzip level 6, Brotli quality 4). No network or database involved.
+
+    cd backend
+    python -m bench.serialization --recipes 200 --ingredients 12 --catalog 1000
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+
+from bench import harness
+
+harness.configure_environment("http://127.0.0.1:9")
+
+from fastapi import Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.compression import brotli  # noqa: E402
+from app.responses import prevalidated  # noqa: E402
+from app.routers.recipes import _build_response  # noqa: E402
+from app.routers.usda import _parse_search_foods  # noqa: E402
+from app.schemas.nutrition import IngredientResponse, RecipeResponse, USDAFoodResult  # noqa: E402
+from bench.fixtures import ingredient_rows, recipe_rows, usda_search_response  # noqa: E402
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=200)
+    parser.add_argument("--ingredients", type=int, default=12, help="ingredients per recipe")
+    parser.add_argument("--catalog", type=int, default=1000, help="rows in an ingredients export page")
+    parser.add_argument("--foods", type=int, default=20, help="USDA search results")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    recipes = recipe_rows(args.recipes, args.ingredients)
+    cases = [
+        # (label, response model, what the route hands over: before, after)
+        (
+            "GET /recipes/",
+            RecipeResponse,
+            lambda: [_build_response(r, r["recipe_ingredients"]) for r in recipes],
+        ),
+        ("GET /ingredients/export", IngredientResponse, lambda: ingredient_rows(args.catalog)),
+        (
+            "GET /usda/search",
+            USDAFoodResult,
+            lambda: _parse_search_foods(usda_search_response(args.foods)["foods"]),
+        ),
+    ]
+
+    loop = asyncio.new_event_loop()
+    print(f"best of {args.repeat}; sizes in KiB")
+    print(f"  {'endpoint':<24} {'items':>6} {'before ms':>10} {'after ms':>9} {'speedup':>8}   {'raw':>7} {'gzip':>7} {'br':>7}")
+    for label, model, build in cases:
+        content = build()
+        field = create_response_field(name="response", type_=list[model])
+
+        def before():
+            validated = loop.run_until_complete(serialize_response(field=field, response_content=content))
+            return JSONResponse(validated).body
+
+        def after():
+            return prevalidated(content, Response()).body
+
+        body = after()
+        assert json.loads(body) == json.loads(before()), f"{label}: the two paths disagree"
+        before_s, after_s = best_of(before, args.repeat), best_of(after, args.repeat)
+        gzipped = len(gzip.compress(body, compresslevel=6))
+        brotlied = f"{len(brotli.compress(body, quality=4)) / 1024:7.1f}" if brotli else "    n/a"
+        print(
+            f"  {label:<24} {len(content):>6} {before_s * 1000:>10.2f} {after_s * 1000:>9.2f} {before_s / after_s:>7.1f}x"
+            f"   {len(body) / 1024:>7.1f} {gzipped / 1024:>7.1f} {brotlied}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Latency and round-trips per request of the hot endpoints, at production data sizes.
+
+Runs the real app in-process against the PostgREST/Auth stand-in and the
+USDA/Open Food Facts stand-ins, each in its own process with injected latency,
+after loading a bench.datagen dataset. Every scenario sends --requests
+requests from --concurrency workers, spread over the dataset's users, and
+reports p50/p95/p99 latency and PostgREST, Auth and upstream calls per request.
+
+The upstream stand-ins serve the hand-written samples in bench/sample_responses/
+unless --generated-upstreams is given. Before the scenarios, barcode lookups
+are checked to answer the same in "race" and "sequential" UPC lookup mode,
+both for a barcode on the served USDA page (USDA hit) and for an unknown one
+(USDA miss, Open Food Facts hit), and the former to read the same whether its
+product was remembered from a USDA lookup or bulk-imported from a branded
+CSV download of the same food; a mismatch exits 1.
+
+With --baseline, exits 1 on any error, on more round-trips per request than
+the baseline records, or, for scenarios whose baseline records a p95, on a
+p95 more than --tolerance above it. Compare runs with the same arguments
+(search_foods' cache hit rate depends on --requests). The checked-in
+baseline was saved with the defaults and holds round-trips only, since
+latency depends on the machine; save one with latencies locally to compare
+a branch against main.
+
+    cd backend
+    python -m bench.suite --users 50 --years 3 --latency 0.02
+    python -m bench.suite --baseline bench/baseline.json
+    python -m bench.suite --save-baseline bench/baseline.json --round-trips-only
+    python -m bench.suite --save-baseline /tmp/main.json && git checkout my-branch \\
+        && python -m bench.suite --baseline /tmp/main.json
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+
+from bench import datagen, harness
+from bench.fake_postgrest import serve as serve_postgrest
+from bench.fake_upstreams import serve as serve_upstreams
+from bench.fixtures import OFF_PRODUCT_SAMPLE, USDA_SEARCH_SAMPLE, WORDS
+
+
+@dataclass
+class Context:
+    """What scenarios pick their requests from: the loaded dataset, indexed by user."""
+
+    dataset: datagen.Dataset
+    tokens: dict[str, str]
+    recipes: dict[str, list[dict]]
+    checked: dict[str, list[dict]]
+    recipe_meals: dict[str, list[dict]]
+
+    @classmethod
+    def build(cls, dataset: datagen.Dataset) -> "Context":
+        recipes = {user_id: [] for user_id in dataset.users}
+        for recipe in dataset.tables["recipes"]:
+            recipes[recipe["user_id"]].append(recipe)
+        checked = {}
+        for ingredient in dataset.tables["recipe_ingredients"]:
+            if ingredient["checked"]:
+                checked.setdefault(ingredient["recipe_id"], []).append(ingredient)
+        recipe_meals = {user_id: [] for user_id in dataset.users}
+        for meal in dataset.tables["meals"]:
+            if meal["recipe_id"]:
+                recipe_meals[meal["user_id"]].append(meal)
+        return cls(dataset, {u: harness.user_token(u) for u in dataset.users}, recipes, checked, recipe_meals)
+
+    def day(self, rng: random.Random) -> date:
+        return self.dataset.start + timedelta(days=rng.randrange((self.dataset.end - self.dataset.start).days + 1))
+
+
+# (method, path, JSON body) of request i, for the user whose token it's sent with
+Request = tuple[str, str, Optional[dict]]
+
+
+def get_day(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    return "GET", f"/meals/day/{ctx.day(rng)}", None
+
+
+def get_range(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    # A week view
+    start = ctx.day(rng)
+    return "GET", f"/meals/range?start={start}&end={start + timedelta(days=6)}", None
+
+
+def get_history(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    group_by, days = rng.choice([("day", 30), ("week", 182), ("month", 365)])
+    end = ctx.day(rng)
+    return "GET", f"/meals/history?group_by={group_by}&start={end - timedelta(days=days - 1)}&end={end}", None
+
+
+def list_recipes(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    return "GET", "/recipes/", None
+
+
+def log_recipe(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    recipe = rng.choice(ctx.recipes[user_id])
+    overrides = [{"ingredient_id": i["id"], "quantity": round(i["quantity"] * rng.uniform(0.8, 1.2), 2)} for i in ctx.checked[recipe["id"]]]
+    body = {"meal_type": rng.choice(datagen.MEAL_TYPES), "logged_date": str(ctx.dataset.end), "ingredient_overrides": overrides}
+    return "POST", f"/recipes/{recipe['id']}/log", body
+
+
+def restore_from_meal(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    meal = rng.choice(ctx.recipe_meals[user_id])
+    return "POST", f"/recipes/{meal['recipe_id']}/restore-from-meal/{meal['id']}", None
+
+
+# A fixed pool, so a run sees both cache misses and the hits that follow them
+SEARCH_QUERIES = [f"{a} {b}" for a, b in zip(WORDS * 6, random.Random(0).choices(WORDS, k=len(WORDS) * 6))]
+
+
+def search_foods(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    return "GET", f"/usda/search?query={rng.choice(SEARCH_QUERIES)}", None
+
+
+def lookup_upc(ctx: Context, user_id: str, rng: random.Random) -> Request:
+    return "GET", f"/usda/upc/{rng.randrange(10**11, 10**12):012d}", None
+
+
+SCENARIOS: dict[str, Callable[[Context, str, random.Random], Request]] = {
+    fn.__name__: fn
+    for fn in (get_day, get_range, get_history, list_recipes, log_recipe, restore_from_meal, search_foods, lookup_upc)
+}
+DEFAULT_SCENARIOS = ["get_day", "get_range", "get_history", "list_recipes", "log_recipe", "restore_from_meal", "search_foods"]
+
+
+@dataclass
+class ScenarioResult:
+    load: harness.LoadResult
+    db_calls: float
+    auth_calls: float
+    upstream_calls: float
+
+    def summary(self) -> dict:
+        return {
+            "p50_ms": round(self.load.percentile(50) * 1000, 2),
+            "p95_ms": round(self.load.percentile(95) * 1000, 2),
+            "p99_ms": round(self.load.percentile(99) * 1000, 2),
+            "throughput": round(self.load.throughput, 1),
+            "errors": self.load.errors,
+            "db_calls": round(self.db_calls, 2),
+            "auth_calls": round(self.auth_calls, 2),
+            "upstream_calls": round(self.upstream_calls, 2),
+        }
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, name: str, stats: dict[str, str], concurrency: int, total: int, seed: int) -> ScenarioResult:
+    build = SCENARIOS[name]
+    users = ctx.dataset.users
+
+    async def send(i: int) -> int:
+        user_id = users[i % len(users)]
+        method, path, body = build(ctx, user_id, random.Random(f"{seed}:{name}:{i}"))
+        response = await client.request(method, path, json=body, headers={"Authorization": f"Bearer {ctx.tokens[user_id]}"})
+        return response.status_code
+
+    # The stand-ins are reached over the network, not through the app's transport
+    async with httpx.AsyncClient() as stand_ins:
+        for url in stats.values():
+            await stand_ins.delete(f"{url}/_bench/stats")
+        load = await harness.drive(send, concurrency, total)
+        postgrest = (await stand_ins.get(f"{stats['postgrest']}/_bench/stats")).json()
+        upstreams = (await stand_ins.get(f"{stats['upstreams']}/_bench/stats")).json()
+    calls = {"db": postgrest["requests"], "auth": postgrest["auth_requests"], "upstream": sum(upstreams.values())}
+    return ScenarioResult(load, calls["db"] / total, calls["auth"] / total, calls["upstream"] / total)
+
+
+async def _forget_upc(supabase_url: str, upc: str) -> None:
+    # Lookups remember their answer in upc_products; drop it so the next one goes remote again
+    async with httpx.AsyncClient() as stand_in:
+        await stand_in.delete(f"{supabase_url}/rest/v1/upc_products", params={"upc_normalized": f"eq.{upc.lstrip('0')}"})
+
+
+async def upc_mode_mismatches(client: httpx.AsyncClient, ctx: Context, supabase_url: str, barcode: str) -> list[str]:
+    from app.config import settings
+
+    headers = {"Authorization": f"Bearer {ctx.tokens[ctx.dataset.users[0]]}"}
+    configured, found = settings.upc_lookup_mode, []
+    for upc in (barcode, "000000000017"):
+        answers = {}
+        for mode in ("race", "sequential"):
+            settings.upc_lookup_mode = mode
+            response = await client.get(f"/usda/upc/{upc}", headers=headers)
+            answers[mode] = (response.status_code, response.json())
+            await _forget_upc(supabase_url, upc)
+        if answers["race"] != answers["sequential"]:
+            found.append(f"/usda/upc/{upc}: race {answers['race']}, sequential {answers['sequential']}")
+    settings.upc_lookup_mode = configured
+    return found
+
+
+async def upc_import_mismatches(client: httpx.AsyncClient, ctx: Context, supabase_url: str, food: dict) -> list[str]:
+    """The product a USDA lookup remembers must match what a bulk import of the same food writes.
+
+    The food is written out as a one-food branded CSV download and loaded with
+    the import_fdc and import_branded_upcs passes.
+    """
+    from app.commands.import_branded_upcs import import_products
+    from app.commands.import_fdc import import_foods, import_nutrients
+
+    headers = {"Authorization": f"Bearer {ctx.tokens[ctx.dataset.users[0]]}"}
+    path = f"/usda/upc/{food['gtinUpc']}"
+    remote = await client.get(path, headers=headers)
+    await _forget_upc(supabase_url, food["gtinUpc"])
+
+    with tempfile.TemporaryDirectory() as download:
+        source = Path(download)
+        files = {
+            "food.csv": [{"fdc_id": food["fdcId"], "data_type": "branded_food", "description": food["description"], "publication_date": food.get("publishedDate", "")}],
+            "food_nutrient.csv": [{"fdc_id": food["fdcId"], "nutrient_id": n["nutrientId"], "amount": n.get("value", "")} for n in food["foodNutrients"]],
+            "branded_food.csv": [{"fdc_id": food["fdcId"], "gtin_upc": food["gtinUpc"]}],
+        }
+        for name, rows in files.items():
+            with open(source / name, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await import_foods(source, None, 100)
+            await import_nutrients(source, None, 100)
+            await import_products(source, 100)
+    imported = await client.get(path, headers=headers)
+
+    await _forget_upc(supabase_url, food["gtinUpc"])
+    async with httpx.AsyncClient() as stand_in:
+        await stand_in.delete(f"{supabase_url}/rest/v1/fdc_foods", params={"fdc_id": f"eq.{food['fdcId']}"})
+    answers = {"lookup": (remote.status_code, remote.json()), "import": (imported.status_code, imported.json())}
+    if answers["lookup"] != answers["import"]:
+        return [f"{path}: remembered from USDA {answers['lookup']}, bulk-imported {answers['import']}"]
+    return []
+
+
+def regressions(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    found = []
+    for name, result in results.items():
+        if result["errors"]:
+            found.append(f"{name}: {result['errors']} errors")
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in ("db_calls", "auth_calls", "upstream_calls"):
+            # Round-trips are deterministic up to cache races; allow a hair over
+            if metric in expected and result[metric] > expected[metric] + 0.05:
+                found.append(f"{name}: {metric} {result[metric]} per request, baseline {expected[metric]}")
+        if "p95_ms" in expected and result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result['p95_ms']} ms, baseline {expected['p95_ms']} ms (+{tolerance:.0%} allowed)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"comma-separated, of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every PostgREST and Auth call")
+    parser.add_argument("--upstream-latency", type=float, default=0.1, help="seconds added to every USDA and Open Food Facts call")
+    parser.add_argument("--auth-mode", choices=["local", "remote"], default="local")
+    parser.add_argument("--usda-fixture", type=Path, default=USDA_SEARCH_SAMPLE, help="a /foods/search response, served for every query; defaults to the sample")
+    parser.add_argument("--off-fixture", type=Path, default=OFF_PRODUCT_SAMPLE, help="an /api/v0/product response, served for every barcode; defaults to the sample")
+    parser.add_argument("--generated-upstreams", action="store_true", help="serve generated USDA and Open Food Facts responses instead")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--meals-per-day", type=int, default=4)
+    parser.add_argument("--recipes", type=int, default=25, help="recipes per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, help="fail on regressions against this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown against the baseline")
+    parser.add_argument("--save-baseline", type=Path, help="write this run's results here")
+    parser.add_argument("--round-trips-only", action="store_true", help="leave latencies out of the saved baseline")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    supabase_url = harness.serve_in_process(serve_postgrest, args.latency)
+    fixtures = (None, None) if args.generated_upstreams else (str(args.usda_fixture), str(args.off_fixture))
+    upstream_url = harness.serve_in_process(serve_upstreams, args.upstream_latency, *fixtures)
+    harness.configure_environment(supabase_url, upstream_url)
+    if args.auth_mode == "remote":
+        os.environ["AUTH_MODE"] = "remote"
+
+    dataset = datagen.generate(args.users, args.years, args.meals_per_day, args.recipes, seed=args.seed)
+    datagen.load(supabase_url, dataset)
+    ctx = Context.build(dataset)
+
+    from app.main import app
+
+    # A branded food the USDA stand-in serves, for the barcode lookup checks
+    usda_page = None if args.generated_upstreams else json.loads(args.usda_fixture.read_text())
+    branded = next((f for f in usda_page["foods"] if f.get("gtinUpc")), None) if usda_page else None
+
+    async def run() -> tuple[list[str], dict[str, ScenarioResult]]:
+        mismatches, results = [], {}
+        stats = {"postgrest": supabase_url, "upstreams": upstream_url}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                await client.get("/meals/day/2000-01-01", headers={"Authorization": f"Bearer {ctx.tokens[dataset.users[0]]}"})
+                if branded is not None:
+                    mismatches = await upc_mode_mismatches(client, ctx, supabase_url, branded["gtinUpc"])
+                    mismatches += await upc_import_mismatches(client, ctx, supabase_url, branded)
+                for name in names:
+                    results[name] = await run_scenario(client, ctx, name, stats, args.concurrency, args.requests, args.seed)
+        return mismatches, results
+
+    mismatches, scenario_results = asyncio.run(run())
+    results = {name: result.summary() for name, result in scenario_results.items()}
+
+    counts = ", ".join(f"{count:,} {table}" for table, count in dataset.counts().items())
+    print(f"{args.users} users x {args.years:g} years: {counts}")
+    print(
+        f"{args.requests} requests per scenario from {args.concurrency} workers, "
+        f"{args.latency * 1000:g} ms PostgREST/Auth and {args.upstream_latency * 1000:g} ms upstream latency, auth {args.auth_mode}"
+    )
+    print(f"  {'scenario':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db/req':>7} {'auth/req':>8} {'up/req':>7} {'errors':>6}")
+    for name, r in results.items():
+        print(
+            f"  {name:<18} {r['throughput']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+            f"{r['db_calls']:7.2f} {r['auth_calls']:8.2f} {r['upstream_calls']:7.2f} {r['errors']:6d}"
+        )
+
+    if args.save_baseline:
+        keep = ("db_calls", "auth_calls", "upstream_calls") + (() if args.round_trips_only else ("p95_ms",))
+        args.save_baseline.write_text(json.dumps({n: {k: r[k] for k in keep} for n, r in results.items()}, indent=2) + "\n")
+
+    if branded is not None and not mismatches:
+        print(
+            f"UPC lookups of {branded['gtinUpc']} (USDA) and an unknown barcode (Open Food Facts) agree in race and sequential mode, "
+            f"and {branded['gtinUpc']} reads the same remembered from USDA as bulk-imported"
+        )
+    for line in mismatches:
+        print(f"UPC MISMATCH {line}", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark of USDA search result parsing.
+
+Compares the previous parser, which scanned each food's nutrient list once per
+nutrient, with the single-pass nutrient index in app.routers.usda, on the
+hand-written sample page in bench/sample_responses/ by default. Both parsers
+are first checked to agree on the USDA samples. No network or database
+involved.
+
+    cd backend
+    python -m bench.usda_parsing
+    python -m bench.usda_parsing --generated --foods 20 --nutrients 60
+    python -m bench.usda_parsing --fixture recorded/usda_foods_search.json   # see bench.record_responses
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+from bench import harness
+
+harness.configure_environment("http://127.0.0.1:9")
+
+from app.routers import usda  # noqa: E402
+from app.routers.usda import NUTRIENT_FIELDS, _parse_search_foods  # noqa: E402
+from app.schemas.nutrition import USDAFoodResult  # noqa: E402
+from bench.fixtures import USDA_SEARCH_SAMPLE, USDA_UPC_SAMPLE, load_or_generate_usda  # noqa: E402
+
+
+def _extract_nutrient(nutrients: list[dict], nutrient_id: int) -> float:
+    for n in nutrients:
+        if n.get("nutrientId") == nutrient_id:
+            return round(n.get("value", 0.0), 2)
+    return 0.0
+
+
+def parse_per_nutrient_scan(foods: list[dict]) -> list[dict]:
+    """The parser before the nutrient index: one list scan per nutrient."""
+    results = []
+    for food in foods:
+        nutrients = food.get("foodNutrients", [])
+        results.append(USDAFoodResult(
+            fdc_id=food["fdcId"],
+            name=food["description"].title(),
+            **{field: _extract_nutrient(nutrients, nutrient_id) for field, nutrient_id in NUTRIENT_FIELDS.items()},
+        ).model_dump())
+    return results
+
+
+# What tracking sodium, total sugars and saturated fat as well would cost
+EXTENDED_FIELDS = {**NUTRIENT_FIELDS, "sodium_per_100g": 1093, "sugars_per_100g": 2000, "saturated_fat_per_100g": 1258}
+
+
+def _track(fields: dict[str, int]) -> None:
+    usda.NUTRIENT_FIELDS = fields
+    usda._FIELD_BY_NUTRIENT_ID = {nutrient_id: field for field, nutrient_id in fields.items()}
+
+
+def _scan_each(fields: dict[str, int]):
+    return lambda page: [[_extract_nutrient(f.get("foodNutrients", []), i) for i in fields.values()] for f in page]
+
+
+def _single_pass(page: list[dict]) -> list[dict]:
+    return [usda._extract_nutrients(f.get("foodNutrients", [])) for f in page]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", type=Path, default=USDA_SEARCH_SAMPLE, help="a /foods/search response (JSON); defaults to the sample")
+    parser.add_argument("--generated", action="store_true", help="time a generated page of branded foods instead")
+    parser.add_argument("--foods", type=int, default=20, help="foods per generated page")
+    parser.add_argument("--nutrients", type=int, default=60, help="nutrients per generated food")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for sample in (USDA_SEARCH_SAMPLE, USDA_UPC_SAMPLE):
+        page = json.loads(sample.read_text())["foods"]
+        assert parse_per_nutrient_scan(page) == _parse_search_foods(page), f"parsers disagree on {sample.name}"
+
+    fixture = None if args.generated else args.fixture
+    foods = load_or_generate_usda(fixture, foods=args.foods, nutrients_per_food=args.nutrients)["foods"]
+    assert parse_per_nutrient_scan(foods) == _parse_search_foods(foods), "parsers disagree"
+
+    def time_per_page(parse) -> float:
+        timer = timeit.Timer(lambda: parse(foods))
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=args.repeat, number=number)) / number
+
+    def report(stage: str, before, after) -> None:
+        before_time, after_time = time_per_page(before), time_per_page(after)
+        print(
+            f"  {stage:<25} per-nutrient scan {before_time * 1e6:8.1f} µs/page   "
+            f"single pass {after_time * 1e6:8.1f} µs/page   speedup {before_time / after_time:.1f}x"
+        )
+
+    print(f"{len(foods)} foods, {sum(len(f.get('foodNutrients', [])) for f in foods)} nutrient entries per page")
+    report("full parse", parse_per_nutrient_scan, _parse_search_foods)
+    report(f"extraction, {len(NUTRIENT_FIELDS)} nutrients", _scan_each(NUTRIENT_FIELDS), _single_pass)
+    _track(EXTENDED_FIELDS)
+    try:
+        report(f"extraction, {len(EXTENDED_FIELDS)} nutrients", _scan_each(EXTENDED_FIELDS), _single_pass)
+    finally:
+        _track(NUTRIENT_FIELDS)
+
+
+if __name__ == "__main__":
+    main()
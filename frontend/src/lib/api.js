@@ -25,15 +25,42 @@ async function request(method, path, body = null) {
   return res.json()
 }
 
+// One page of a keyset-paginated endpoint, with the cursor for the next (null on the last)
+async function requestPage(path, cursor = null) {
+  const separator = path.includes('?') ? '&' : '?'
+  const url = `${BASE_URL}${path}${cursor ? `${separator}cursor=${encodeURIComponent(cursor)}` : ''}`
+  const res = await fetch(url, { headers: await getHeaders() })
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}))
+    throw new Error(err.detail || `Request failed: ${res.status}`)
+  }
+  return { items: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') }
+}
+
+// Walks a keyset-paginated endpoint, following X-Next-Cursor until the last page
+async function requestAllPages(path) {
+  const items = []
+  let cursor = null
+  do {
+    const page = await requestPage(path, cursor)
+    items.push(...page.items)
+    cursor = page.nextCursor
+  } while (cursor)
+  return items
+}
+
 export const api = {
   getDay: (date) => request('GET', `/meals/day/${date}`),
+  getRange: (start, end) => request('GET', `/meals/range?start=${start}&end=${end}`),
   addMeal: (meal) => request('POST', '/meals/', meal),
   deleteMeal: (id) => request('DELETE', `/meals/${id}`),
   getHistory: (limit = 14) => request('GET', `/meals/history?limit=${limit}`),
   getProfile: () => request('GET', '/profile/'),
   updateProfile: (data) => request('PATCH', '/profile/', data),
   searchFoods: (query) => request('GET', `/usda/search?query=${encodeURIComponent(query)}`),
-  getRecipes: () => request('GET', '/recipes/'),
+  getRecipes: (cursor = null) => requestPage('/recipes/?summary=true', cursor),
+  getRecipe: (id) => request('GET', `/recipes/${id}`),
+  getRecipeIngredients: (recipeId) => request('GET', `/recipes/${recipeId}/ingredients`),
   createRecipe: (data) => request('POST', '/recipes/', data),
   deleteRecipe: (id) => request('DELETE', `/recipes/${id}`),
   addIngredient: (recipeId, data) => request('POST', `/recipes/${recipeId}/ingredients`, data),
@@ -44,7 +71,8 @@ export const api = {
   patchMealPortion: (mealId, portionWeight) => request('PATCH', `/meals/${mealId}/portion`, { portion_weight: portionWeight }),
   restoreTemplate: (recipeId, mealId) => request('POST', `/recipes/${recipeId}/restore-from-meal/${mealId}`),
   lookupUpc: (upc) => request('GET', `/usda/upc/${encodeURIComponent(upc)}`),
-  getIngredients: () => request('GET', '/ingredients/'),
+  getIngredients: () => requestAllPages('/ingredients/export?limit=1000'),
+  searchIngredients: (query, limit = 6) => request('GET', `/ingredients/search?q=${encodeURIComponent(query)}&limit=${limit}`),
   createIngredient: (data) => request('POST', '/ingredients/', data),
   updateIngredientLib: (id, data) => request('PATCH', `/ingredients/${id}`, data),
   deleteIngredient: (id) => request('DELETE', `/ingredients/${id}`),
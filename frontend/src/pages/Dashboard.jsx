@@ -107,6 +107,7 @@ export default function Dashboard() {
   const [error, setError] = useState('')
   const [showSettings, setShowSettings] = useState(false)
   const [recipes, setRecipes] = useState([])
+  const [recipesCursor, setRecipesCursor] = useState(null)
   const [showRecipeBuilder, setShowRecipeBuilder] = useState(false)
   const [showRecipePicker, setShowRecipePicker] = useState(false)
   const [activeRecipe, setActiveRecipe] = useState(null)
@@ -114,7 +115,7 @@ export default function Dashboard() {
   const [recipeIngredients, setRecipeIngredients] = useState([])
   const [recipeQuery, setRecipeQuery] = useState('')
   const [recipeGrams, setRecipeGrams] = useState('100')
-  const [ingredients, setIngredients] = useState([])
+  const [ingredientMatches, setIngredientMatches] = useState([])
   const [recipeError, setRecipeError] = useState('')
   const [builderName, setBuilderName] = useState('')
   const [logModal, setLogModal] = useState(null)
@@ -127,22 +128,43 @@ export default function Dashboard() {
   const today = localToday()
   const isToday = currentDate === today
 
+  // Newest first, a page at a time; older templates load on "more"
   const loadRecipes = useCallback(async () => {
     try {
-      const data = await api.getRecipes()
-      setRecipes(data)
+      const { items, nextCursor } = await api.getRecipes()
+      setRecipes(items)
+      setRecipesCursor(nextCursor)
     } catch (_) {}
   }, [])
 
-  const loadIngredients = useCallback(async () => {
+  async function loadMoreRecipes() {
+    if (!recipesCursor) return
     try {
-      const data = await api.getIngredients()
-      setIngredients(data)
-    } catch (_) {}
-  }, [])
+      const { items, nextCursor } = await api.getRecipes(recipesCursor)
+      setRecipes(prev => [...prev, ...items.filter(r => !prev.some(p => p.id === r.id))])
+      setRecipesCursor(nextCursor)
+    } catch (err) {
+      setError(err.message)
+    }
+  }
 
   useEffect(() => { loadRecipes() }, [loadRecipes])
-  useEffect(() => { loadIngredients() }, [loadIngredients])
+
+  useEffect(() => {
+    const query = recipeQuery.trim()
+    if (!query) {
+      setIngredientMatches([])
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const data = await api.searchIngredients(query)
+        if (!cancelled) setIngredientMatches(data)
+      } catch (_) {}
+    }, 150)
+    return () => { cancelled = true; clearTimeout(timer) }
+  }, [recipeQuery])
 
   const loadDay = useCallback(async (date) => {
     setLoading(true)
@@ -181,11 +203,22 @@ export default function Dashboard() {
     }
   }
 
-  function handleEditRecipe(recipe) {
-    setActiveRecipe(recipe)
-    setBuilderName(recipe.name)
-    setRecipeIngredients(recipe.ingredients)
-    setShowRecipeBuilder(true)
+  // The recipe list holds summaries; ingredients are fetched when a recipe is opened
+  async function withIngredients(recipe) {
+    if (recipe.ingredients) return recipe
+    return { ...recipe, ingredients: await api.getRecipeIngredients(recipe.id) }
+  }
+
+  async function handleEditRecipe(recipe) {
+    try {
+      const full = await withIngredients(recipe)
+      setActiveRecipe(full)
+      setBuilderName(full.name)
+      setRecipeIngredients(full.ingredients)
+      setShowRecipeBuilder(true)
+    } catch (err) {
+      setError(err.message)
+    }
   }
 
   async function handleRenameRecipe() {
@@ -252,8 +285,16 @@ export default function Dashboard() {
   }
 
   async function openTemplate(recipeId, meal) {
-    const recipe = recipes.find(r => r.id === recipeId)
-    if (!recipe) return
+    // Templates older than the loaded pages are fetched on their own
+    let recipe = recipes.find(r => r.id === recipeId)
+    if (!recipe) {
+      try {
+        recipe = await api.getRecipe(recipeId)
+      } catch (err) {
+        setError(err.message)
+        return
+      }
+    }
     setShowRecipePicker(false)
     setShowRecipeBuilder(false)
     if (meal) {
@@ -269,14 +310,22 @@ export default function Dashboard() {
           mealType: meal.meal_type ?? prev.mealType,
         }))
       } catch {
-        openLogModal(recipe)
+        await openRecipeLog(recipe)
       }
     } else {
-      openLogModal(recipe)
+      await openRecipeLog(recipe)
     }
     window.scrollTo({ top: 0, behavior: 'smooth' })
   }
 
+  async function openRecipeLog(recipe) {
+    try {
+      openLogModal(await withIngredients(recipe))
+    } catch (err) {
+      setError(err.message)
+    }
+  }
+
   function openLogModal(recipe) {
     const checked = new Set(recipe.ingredients.filter(i => i.checked).map(i => i.id))
     const quantities = {}
@@ -590,10 +639,10 @@ export default function Dashboard() {
                 {recipes.length === 0 ? (
                   <p className="text-xs text-slate-500 px-4 py-3">No templates yet — create one via "manage templates".</p>
                 ) : (
-                  [...recipes].sort((a, b) => a.name.localeCompare(b.name)).map(recipe => (
+                  recipes.map(recipe => (
                     <div key={recipe.id} className="flex items-center border-b border-slate-200 last:border-0 hover:bg-slate-50 transition-colors">
                       <button
-                        onClick={() => { openLogModal(recipe); setShowRecipePicker(false) }}
+                        onClick={() => { openRecipeLog(recipe); setShowRecipePicker(false) }}
                         className="flex-1 text-left px-4 py-3">
                         <p className="text-sm text-slate-900">{recipe.name}</p>
                         <div className="flex gap-3 mt-0.5 text-xs text-slate-500">
@@ -611,6 +660,12 @@ export default function Dashboard() {
                     </div>
                   ))
                 )}
+                {recipesCursor && (
+                  <button onClick={loadMoreRecipes}
+                    className="w-full px-4 py-2 text-xs text-slate-500 hover:text-blue-600 transition-colors">
+                    more
+                  </button>
+                )}
               </div>
             )}
 
@@ -621,7 +676,7 @@ export default function Dashboard() {
                   <div className="flex flex-col gap-3">
                     {recipes.length > 0 && (
                       <div className="flex flex-col gap-1">
-                        {[...recipes].sort((a, b) => a.name.localeCompare(b.name)).map(recipe => (
+                        {recipes.map(recipe => (
                           <div key={recipe.id} className="flex items-center justify-between px-3 py-2 bg-slate-200 rounded-xl">
                             <span className="text-sm text-slate-700">{recipe.name}</span>
                             <div className="flex items-center gap-2">
@@ -632,6 +687,12 @@ export default function Dashboard() {
                             </div>
                           </div>
                         ))}
+                        {recipesCursor && (
+                          <button type="button" onClick={loadMoreRecipes}
+                            className="text-xs text-slate-500 hover:text-blue-600 transition-colors py-1">
+                            more
+                          </button>
+                        )}
                       </div>
                     )}
                     <form onSubmit={handleCreateRecipe} className="flex gap-2">
@@ -665,9 +726,7 @@ export default function Dashboard() {
                       <span className="text-xs text-slate-500">g</span>
                     </div>
                     {recipeQuery.trim() && (() => {
-                      const matches = ingredients
-                        .filter(i => i.name.toLowerCase().includes(recipeQuery.toLowerCase()))
-                        .slice(0, 6)
+                      const matches = ingredientMatches
                       return matches.length > 0 ? (
                         <div className="bg-white border border-slate-300 rounded-xl overflow-hidden">
                           {matches.map(food => (
@@ -0,0 +1,37 @@
+-- One round-trip for GET /meals/day/{day}: the day's meals, their totals and the
+-- day type in effect (the day's own assignment, else the profile default).
+create or replace function public.get_daily_summary(p_user_id uuid, p_date date)
+returns table (
+  meals jsonb,
+  total_calories integer,
+  total_protein numeric,
+  total_carbs numeric,
+  total_fat numeric,
+  total_fiber numeric,
+  day_type jsonb
+)
+language sql stable
+as $$
+  select
+    coalesce(jsonb_agg(to_jsonb(m) order by m.created_at), '[]'::jsonb),
+    coalesce(sum(m.calories), 0)::integer,
+    coalesce(sum(m.protein_g), 0),
+    coalesce(sum(m.carbs_g), 0),
+    coalesce(sum(m.fat_g), 0),
+    coalesce(sum(m.fiber_g), 0),
+    (
+      select to_jsonb(dt)
+      from public.day_types dt
+      where dt.user_id = p_user_id
+        and dt.id = coalesce(
+          (select dl.day_type_id from public.day_logs dl where dl.user_id = p_user_id and dl.logged_date = p_date),
+          (select p.default_day_type_id from public.profiles p where p.id = p_user_id)
+        )
+    )
+  from public.meals m
+  where m.user_id = p_user_id and m.logged_date = p_date;
+$$;
+
+-- Takes an arbitrary user id, so only the backend (service role) may call it
+revoke execute on function public.get_daily_summary(uuid, date) from public, anon, authenticated;
+grant execute on function public.get_daily_summary(uuid, date) to service_role;
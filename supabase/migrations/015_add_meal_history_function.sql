@@ -0,0 +1,41 @@
+-- Per-day (or per-week / per-month) nutrition totals for GET /meals/history.
+-- One row per period with at least one meal, newest first.
+create or replace function public.get_meal_history(
+  p_user_id uuid,
+  p_start date default null,
+  p_end date default null,
+  p_bucket text default 'day',
+  p_limit integer default null
+)
+returns table (
+  "date" date,
+  days_logged integer,
+  meal_count integer,
+  calories bigint,
+  protein_g numeric,
+  carbs_g numeric,
+  fat_g numeric,
+  fiber_g numeric
+)
+language sql stable
+as $$
+  select
+    date_trunc(p_bucket, m.logged_date::timestamp)::date,
+    count(distinct m.logged_date)::integer,
+    count(*)::integer,
+    sum(m.calories),
+    coalesce(sum(m.protein_g), 0),
+    coalesce(sum(m.carbs_g), 0),
+    coalesce(sum(m.fat_g), 0),
+    coalesce(sum(m.fiber_g), 0)
+  from public.meals m
+  where m.user_id = p_user_id
+    and (p_start is null or m.logged_date >= p_start)
+    and (p_end is null or m.logged_date <= p_end)
+  group by 1
+  order by 1 desc
+  limit p_limit;
+$$;
+
+revoke execute on function public.get_meal_history(uuid, date, date, text, integer) from public, anon, authenticated;
+grant execute on function public.get_meal_history(uuid, date, date, text, integer) to service_role;
@@ -0,0 +1,161 @@
+-- Per-day nutrition rollup, kept in step with meals by trigger, so summary
+-- reads scan one row per day instead of every meal.
+create table public.daily_totals (
+  user_id uuid references public.profiles(id) on delete cascade not null,
+  logged_date date not null,
+  meal_count integer not null default 0,
+  calories integer not null default 0,
+  protein_g numeric not null default 0,
+  carbs_g numeric not null default 0,
+  fat_g numeric not null default 0,
+  fiber_g numeric not null default 0,
+  primary key (user_id, logged_date)
+);
+
+alter table public.daily_totals enable row level security;
+
+create policy "Users can view own daily totals"
+  on public.daily_totals for select
+  using (auth.uid() = user_id);
+
+create or replace function public.maintain_daily_totals()
+returns trigger
+language plpgsql security definer set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    update public.daily_totals set
+      meal_count = meal_count - 1,
+      calories = calories - old.calories,
+      protein_g = protein_g - coalesce(old.protein_g, 0),
+      carbs_g = carbs_g - coalesce(old.carbs_g, 0),
+      fat_g = fat_g - coalesce(old.fat_g, 0),
+      fiber_g = fiber_g - coalesce(old.fiber_g, 0)
+    where user_id = old.user_id and logged_date = old.logged_date;
+    delete from public.daily_totals
+    where user_id = old.user_id and logged_date = old.logged_date and meal_count <= 0;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into public.daily_totals as t (user_id, logged_date, meal_count, calories, protein_g, carbs_g, fat_g, fiber_g)
+    values (
+      new.user_id, new.logged_date, 1, new.calories,
+      coalesce(new.protein_g, 0), coalesce(new.carbs_g, 0), coalesce(new.fat_g, 0), coalesce(new.fiber_g, 0)
+    )
+    on conflict (user_id, logged_date) do update set
+      meal_count = t.meal_count + 1,
+      calories = t.calories + excluded.calories,
+      protein_g = t.protein_g + excluded.protein_g,
+      carbs_g = t.carbs_g + excluded.carbs_g,
+      fat_g = t.fat_g + excluded.fat_g,
+      fiber_g = t.fiber_g + excluded.fiber_g;
+  end if;
+  return null;
+end;
+$$;
+
+create trigger meals_maintain_daily_totals
+  after insert or delete or update of user_id, logged_date, calories, protein_g, carbs_g, fat_g, fiber_g
+  on public.meals
+  for each row execute function public.maintain_daily_totals();
+
+-- Recompute the rollup from meals, for one user or (p_user_id null) everyone.
+-- Blocks meal writes for the duration so no trigger update is lost.
+create or replace function public.rebuild_daily_totals(p_user_id uuid default null)
+returns table (user_count integer, day_count integer)
+language plpgsql security definer set search_path = public
+as $$
+begin
+  lock table public.meals in share mode;
+  delete from public.daily_totals where p_user_id is null or daily_totals.user_id = p_user_id;
+  insert into public.daily_totals (user_id, logged_date, meal_count, calories, protein_g, carbs_g, fat_g, fiber_g)
+  select
+    m.user_id, m.logged_date, count(*), sum(m.calories),
+    coalesce(sum(m.protein_g), 0), coalesce(sum(m.carbs_g), 0), coalesce(sum(m.fat_g), 0), coalesce(sum(m.fiber_g), 0)
+  from public.meals m
+  where p_user_id is null or m.user_id = p_user_id
+  group by m.user_id, m.logged_date;
+  return query
+    select count(distinct t.user_id)::integer, count(*)::integer
+    from public.daily_totals t
+    where p_user_id is null or t.user_id = p_user_id;
+end;
+$$;
+
+revoke execute on function public.rebuild_daily_totals(uuid) from public, anon, authenticated;
+grant execute on function public.rebuild_daily_totals(uuid) to service_role;
+
+select public.rebuild_daily_totals();
+
+-- Summary reads now come from the rollup
+create or replace function public.get_daily_summary(p_user_id uuid, p_date date)
+returns table (
+  meals jsonb,
+  total_calories integer,
+  total_protein numeric,
+  total_carbs numeric,
+  total_fat numeric,
+  total_fiber numeric,
+  day_type jsonb
+)
+language sql stable
+as $$
+  select
+    coalesce(
+      (select jsonb_agg(to_jsonb(m) order by m.created_at) from public.meals m
+       where m.user_id = p_user_id and m.logged_date = p_date),
+      '[]'::jsonb
+    ),
+    coalesce(t.calories, 0),
+    coalesce(t.protein_g, 0),
+    coalesce(t.carbs_g, 0),
+    coalesce(t.fat_g, 0),
+    coalesce(t.fiber_g, 0),
+    (
+      select to_jsonb(dt)
+      from public.day_types dt
+      where dt.user_id = p_user_id
+        and dt.id = coalesce(
+          (select dl.day_type_id from public.day_logs dl where dl.user_id = p_user_id and dl.logged_date = p_date),
+          (select p.default_day_type_id from public.profiles p where p.id = p_user_id)
+        )
+    )
+  from (select 1) as one
+  left join public.daily_totals t on t.user_id = p_user_id and t.logged_date = p_date;
+$$;
+
+create or replace function public.get_meal_history(
+  p_user_id uuid,
+  p_start date default null,
+  p_end date default null,
+  p_bucket text default 'day',
+  p_limit integer default null
+)
+returns table (
+  "date" date,
+  days_logged integer,
+  meal_count integer,
+  calories bigint,
+  protein_g numeric,
+  carbs_g numeric,
+  fat_g numeric,
+  fiber_g numeric
+)
+language sql stable
+as $$
+  select
+    date_trunc(p_bucket, t.logged_date::timestamp)::date,
+    count(*)::integer,
+    sum(t.meal_count)::integer,
+    sum(t.calories),
+    sum(t.protein_g),
+    sum(t.carbs_g),
+    sum(t.fat_g),
+    sum(t.fiber_g)
+  from public.daily_totals t
+  where t.user_id = p_user_id
+    and (p_start is null or t.logged_date >= p_start)
+    and (p_end is null or t.logged_date <= p_end)
+  group by 1
+  order by 1 desc
+  limit p_limit;
+$$;
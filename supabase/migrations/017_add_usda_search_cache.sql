@@ -0,0 +1,9 @@
+-- Persistent tier of the backend's USDA search cache (USDA_CACHE_PERSISTENT=true).
+-- Only the service role touches it, so RLS is on with no policies.
+create table public.usda_search_cache (
+  key text primary key,
+  value jsonb not null,
+  fetched_at timestamptz not null default now()
+);
+
+alter table public.usda_search_cache enable row level security;
@@ -0,0 +1,63 @@
+-- Local barcode index, so repeat scans don't go out to USDA / Open Food Facts.
+-- UPCs are matched with leading zeros stripped: the same product shows up as
+-- UPC-A, EAN-13 and GTIN-14 depending on the source.
+create table public.upc_products (
+  upc_normalized text primary key check (upc_normalized <> ''),
+  upc text not null,
+  source text not null,          -- 'usda' | 'open_food_facts'
+  source_name text not null default '',
+  usda_fdc_id text,
+  calories_per_100g numeric(8,2) not null default 0,
+  protein_per_100g numeric(8,2) not null default 0,
+  carbs_per_100g numeric(8,2) not null default 0,
+  fat_per_100g numeric(8,2) not null default 0,
+  fiber_per_100g numeric(8,2) not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+alter table public.upc_products enable row level security;
+
+create policy "Authenticated users can read upc products"
+  on public.upc_products for select using (auth.role() = 'authenticated');
+
+create index ingredients_upc_normalized_idx
+  on public.ingredients (ltrim(upc, '0'))
+  where upc is not null;
+
+-- Curated ingredients win over the index; returns at most one row
+create or replace function public.lookup_upc(p_upc text)
+returns table (
+  upc text,
+  source text,
+  source_name text,
+  usda_fdc_id text,
+  calories_per_100g numeric,
+  protein_per_100g numeric,
+  carbs_per_100g numeric,
+  fat_per_100g numeric,
+  fiber_per_100g numeric
+)
+language sql stable
+as $$
+  select upc, source, source_name, usda_fdc_id,
+    calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g
+  from (
+    select i.upc, coalesce(i.source, 'manual') as source, coalesce(i.source_name, i.name) as source_name,
+      i.usda_fdc_id, i.calories_per_100g, i.protein_per_100g, i.carbs_per_100g, i.fat_per_100g, i.fiber_per_100g,
+      0 as priority, i.updated_at
+    from public.ingredients i
+    where ltrim(i.upc, '0') = ltrim(p_upc, '0') and i.upc is not null
+    union all
+    select p.upc, p.source, p.source_name,
+      p.usda_fdc_id, p.calories_per_100g, p.protein_per_100g, p.carbs_per_100g, p.fat_per_100g, p.fiber_per_100g,
+      1 as priority, p.updated_at
+    from public.upc_products p
+    where p.upc_normalized = ltrim(p_upc, '0')
+  ) matches
+  where ltrim(p_upc, '0') <> ''
+  order by priority, updated_at desc
+  limit 1;
+$$;
+
+revoke execute on function public.lookup_upc(text) from public, anon, authenticated;
+grant execute on function public.lookup_upc(text) to service_role;
@@ -0,0 +1,91 @@
+-- Local mirror of USDA FoodData Central, loaded by app.commands.import_fdc,
+-- so /usda/search can answer without the live API (USDA_SEARCH_SOURCE).
+create table public.fdc_foods (
+  fdc_id bigint primary key,
+  data_type text not null,       -- 'foundation_food' | 'sr_legacy_food' | 'survey_fndds_food' | 'branded_food'
+  description text not null,
+  publication_date date,
+  calories_per_100g numeric(8,2) not null default 0,
+  protein_per_100g numeric(8,2) not null default 0,
+  carbs_per_100g numeric(8,2) not null default 0,
+  fat_per_100g numeric(8,2) not null default 0,
+  fiber_per_100g numeric(8,2) not null default 0,
+  search tsvector generated always as (to_tsvector('english', description)) stored,
+  imported_at timestamptz not null default now()
+);
+
+alter table public.fdc_foods enable row level security;
+
+create policy "Authenticated users can read fdc foods"
+  on public.fdc_foods for select using (auth.role() = 'authenticated');
+
+create index fdc_foods_search_idx on public.fdc_foods using gin (search);
+
+-- Merges a batch of partial nutrient rows ({fdc_id, <column>: amount, ...}),
+-- as streamed from food_nutrient.csv, into fdc_foods.
+create or replace function public.import_fdc_nutrients(p_rows jsonb)
+returns table (updated_count integer)
+language sql
+as $$
+  with amounts as (
+    select r.fdc_id,
+      max(r.calories_per_100g) as calories_per_100g,
+      max(r.protein_per_100g) as protein_per_100g,
+      max(r.carbs_per_100g) as carbs_per_100g,
+      max(r.fat_per_100g) as fat_per_100g,
+      max(r.fiber_per_100g) as fiber_per_100g
+    from jsonb_to_recordset(p_rows) as r(
+      fdc_id bigint,
+      calories_per_100g numeric,
+      protein_per_100g numeric,
+      carbs_per_100g numeric,
+      fat_per_100g numeric,
+      fiber_per_100g numeric
+    )
+    group by r.fdc_id
+  ), updated as (
+    update public.fdc_foods f set
+      calories_per_100g = coalesce(a.calories_per_100g, f.calories_per_100g),
+      protein_per_100g = coalesce(a.protein_per_100g, f.protein_per_100g),
+      carbs_per_100g = coalesce(a.carbs_per_100g, f.carbs_per_100g),
+      fat_per_100g = coalesce(a.fat_per_100g, f.fat_per_100g),
+      fiber_per_100g = coalesce(a.fiber_per_100g, f.fiber_per_100g)
+    from amounts a
+    where f.fdc_id = a.fdc_id
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
+
+-- Every word of the query must match as a prefix ("chick bre" finds "Chicken,
+-- breast"). Generic foods rank ahead of branded ones on equal relevance.
+create or replace function public.search_fdc_foods(p_query text, p_limit integer default 20)
+returns table (
+  fdc_id bigint,
+  data_type text,
+  description text,
+  calories_per_100g numeric,
+  protein_per_100g numeric,
+  carbs_per_100g numeric,
+  fat_per_100g numeric,
+  fiber_per_100g numeric
+)
+language sql stable
+as $$
+  with q as (
+    select to_tsquery('english', string_agg(quote_literal(word) || ':*', ' & ')) as query
+    from regexp_split_to_table(lower(p_query), '[^[:alnum:]]+') as word
+    where word <> ''
+  )
+  select f.fdc_id, f.data_type, f.description,
+    f.calories_per_100g, f.protein_per_100g, f.carbs_per_100g, f.fat_per_100g, f.fiber_per_100g
+  from public.fdc_foods f, q
+  where f.search @@ q.query
+  order by ts_rank_cd(f.search, q.query, 1) desc, f.data_type = 'branded_food', length(f.description), f.fdc_id
+  limit p_limit;
+$$;
+
+revoke execute on function public.import_fdc_nutrients(jsonb) from public, anon, authenticated;
+grant execute on function public.import_fdc_nutrients(jsonb) to service_role;
+revoke execute on function public.search_fdc_foods(text, integer) from public, anon, authenticated;
+grant execute on function public.search_fdc_foods(text, integer) to service_role;
@@ -0,0 +1,6 @@
+-- Client-supplied idempotency key for POST /meals/batch: a retried batch
+-- re-sends the same keys, and rows that already exist are skipped. Meals
+-- without a key (null) never conflict.
+alter table public.meals add column client_key text;
+
+create unique index meals_user_client_key_idx on public.meals (user_id, client_key);
@@ -0,0 +1,63 @@
+-- POST /recipes/{id}/restore-from-meal/{meal_id} as one transaction: the
+-- template is either fully restored to the meal's ingredient snapshot or not
+-- touched at all. Raises no_data_found (P0002) for an unknown recipe or meal.
+create or replace function public.restore_recipe_from_meal(p_user_id uuid, p_recipe_id uuid, p_meal_id uuid)
+returns table (recipe jsonb, ingredients jsonb)
+language plpgsql
+as $$
+declare
+  v_recipe public.recipes;
+begin
+  select * into v_recipe
+  from public.recipes r
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  for update;
+  if not found then
+    raise exception 'Recipe not found' using errcode = 'no_data_found';
+  end if;
+
+  perform 1 from public.meals m
+  where m.id = p_meal_id and m.user_id = p_user_id and m.recipe_id = p_recipe_id;
+  if not found then
+    raise exception 'Meal not found' using errcode = 'no_data_found';
+  end if;
+
+  -- Ingredients still in the template: check the ones the meal used, at its
+  -- quantities, and uncheck the rest
+  update public.recipe_ingredients ri set
+    checked = mi.recipe_ingredient_id is not null,
+    quantity = coalesce(mi.quantity, ri.quantity)
+  from public.recipe_ingredients cur
+  left join public.meal_ingredients mi
+    on mi.meal_id = p_meal_id and mi.recipe_ingredient_id = cur.id
+  where ri.id = cur.id and cur.recipe_id = p_recipe_id;
+
+  -- Ingredients removed from the template since: re-add them
+  insert into public.recipe_ingredients (
+    recipe_id, food_name, quantity, unit,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit,
+    usda_fdc_id, checked
+  )
+  select p_recipe_id, mi.food_name, mi.quantity, mi.unit,
+    mi.calories_per_unit, mi.protein_per_unit, mi.carbs_per_unit, mi.fat_per_unit, mi.fiber_per_unit,
+    mi.usda_fdc_id, true
+  from public.meal_ingredients mi
+  where mi.meal_id = p_meal_id
+    and not exists (
+      select 1 from public.recipe_ingredients ri
+      where ri.id = mi.recipe_ingredient_id and ri.recipe_id = p_recipe_id
+    )
+  order by mi.created_at;
+
+  return query
+  select to_jsonb(v_recipe),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) order by ri.created_at)
+      from public.recipe_ingredients ri
+      where ri.recipe_id = p_recipe_id
+    ), '[]'::jsonb);
+end;
+$$;
+
+revoke execute on function public.restore_recipe_from_meal(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.restore_recipe_from_meal(uuid, uuid, uuid) to service_role;
@@ -0,0 +1,75 @@
+-- POST /recipes/{id}/log as one transaction: totals the selected ingredients at
+-- the given quantities (scaled to the portion eaten), inserts the meal and its
+-- ingredient snapshot, and remembers the meal type and cooked weight on the
+-- recipe. Raises no_data_found (P0002) for an unknown recipe.
+create or replace function public.log_recipe(
+  p_user_id uuid,
+  p_recipe_id uuid,
+  p_logged_date date,
+  p_meal_type text,
+  p_ingredient_overrides jsonb,  -- [{"ingredient_id": ..., "quantity": grams}, ...]
+  p_total_cooked_weight numeric default null,
+  p_portion_weight numeric default null
+)
+returns setof public.meals
+language plpgsql
+as $$
+declare
+  v_recipe public.recipes;
+  v_meal public.meals;
+  v_scale numeric := 1;
+begin
+  select * into v_recipe
+  from public.recipes r
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  for update;
+  if not found then
+    raise exception 'Recipe not found' using errcode = 'no_data_found';
+  end if;
+
+  if p_total_cooked_weight > 0 and coalesce(p_portion_weight, 0) <> 0 then
+    v_scale := p_portion_weight / p_total_cooked_weight;
+  end if;
+
+  insert into public.meals (
+    user_id, logged_date, meal_type, name,
+    calories, protein_g, carbs_g, fat_g, fiber_g,
+    raw_weight, total_cooked_weight, portion_weight, recipe_id
+  )
+  select p_user_id, p_logged_date, p_meal_type, v_recipe.name,
+    round(coalesce(sum(o.quantity * ri.calories_per_unit), 0) * v_scale)::integer,
+    round(coalesce(sum(o.quantity * ri.protein_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.carbs_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.fat_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.fiber_per_unit), 0) * v_scale, 1),
+    (select round(coalesce(sum(a.quantity), 0), 1)
+     from jsonb_to_recordset(p_ingredient_overrides) as a(quantity numeric)),
+    round(nullif(p_total_cooked_weight, 0), 1),
+    round(nullif(p_portion_weight, 0), 1),
+    p_recipe_id
+  from jsonb_to_recordset(p_ingredient_overrides) as o(ingredient_id uuid, quantity numeric)
+  join public.recipe_ingredients ri on ri.id = o.ingredient_id and ri.recipe_id = p_recipe_id
+  returning * into v_meal;
+
+  -- Snapshot the ingredients as used, so the meal is unaffected by later template edits
+  insert into public.meal_ingredients (
+    meal_id, recipe_ingredient_id, food_name, quantity, unit,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit, usda_fdc_id
+  )
+  select v_meal.id, ri.id, ri.food_name, (o.item->>'quantity')::numeric, ri.unit,
+    ri.calories_per_unit, ri.protein_per_unit, ri.carbs_per_unit, ri.fat_per_unit, ri.fiber_per_unit, ri.usda_fdc_id
+  from jsonb_array_elements(p_ingredient_overrides) with ordinality as o(item, position)
+  join public.recipe_ingredients ri on ri.id = (o.item->>'ingredient_id')::uuid and ri.recipe_id = p_recipe_id
+  order by o.position;
+
+  update public.recipes set
+    last_meal_type = p_meal_type,
+    last_cooked_weight = coalesce(round(nullif(p_total_cooked_weight, 0), 1), last_cooked_weight)
+  where id = p_recipe_id;
+
+  return next v_meal;
+end;
+$$;
+
+revoke execute on function public.log_recipe(uuid, uuid, date, text, jsonb, numeric, numeric) from public, anon, authenticated;
+grant execute on function public.log_recipe(uuid, uuid, date, text, jsonb, numeric, numeric) to service_role;
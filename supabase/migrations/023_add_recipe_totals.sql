@@ -0,0 +1,127 @@
+-- Denormalized macro totals of each recipe's checked ingredients, kept current
+-- by statement-level triggers on recipe_ingredients, so recipe listings don't
+-- have to fetch and sum every ingredient row.
+alter table public.recipes
+  add column total_calories numeric not null default 0,
+  add column total_protein numeric not null default 0,
+  add column total_carbs numeric not null default 0,
+  add column total_fat numeric not null default 0,
+  add column total_fiber numeric not null default 0;
+
+create or replace function public.recompute_recipe_totals(p_recipe_ids uuid[])
+returns void
+language sql security definer set search_path = public
+as $$
+  update public.recipes r set
+    total_calories = t.calories,
+    total_protein = t.protein,
+    total_carbs = t.carbs,
+    total_fat = t.fat,
+    total_fiber = t.fiber
+  from (
+    select ids.id,
+      coalesce(sum(ri.quantity * ri.calories_per_unit), 0) as calories,
+      coalesce(sum(ri.quantity * ri.protein_per_unit), 0) as protein,
+      coalesce(sum(ri.quantity * ri.carbs_per_unit), 0) as carbs,
+      coalesce(sum(ri.quantity * ri.fat_per_unit), 0) as fat,
+      coalesce(sum(ri.quantity * ri.fiber_per_unit), 0) as fiber
+    from unnest(p_recipe_ids) as ids(id)
+    left join public.recipe_ingredients ri on ri.recipe_id = ids.id and ri.checked
+    group by ids.id
+  ) t
+  where r.id = t.id;
+$$;
+
+create or replace function public.maintain_recipe_totals()
+returns trigger
+language plpgsql security definer set search_path = public
+as $$
+begin
+  -- Transition tables exist only for the events that produce them
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform public.recompute_recipe_totals(array(select distinct recipe_id from new_rows));
+  end if;
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform public.recompute_recipe_totals(array(select distinct recipe_id from old_rows));
+  end if;
+  return null;
+end;
+$$;
+
+create trigger recipe_ingredients_totals_insert
+  after insert on public.recipe_ingredients
+  referencing new table as new_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+create trigger recipe_ingredients_totals_update
+  after update on public.recipe_ingredients
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+create trigger recipe_ingredients_totals_delete
+  after delete on public.recipe_ingredients
+  referencing old table as old_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+revoke execute on function public.recompute_recipe_totals(uuid[]) from public, anon, authenticated;
+grant execute on function public.recompute_recipe_totals(uuid[]) to service_role;
+
+-- Return the recipe as it is after the restore, with its new totals
+create or replace function public.restore_recipe_from_meal(p_user_id uuid, p_recipe_id uuid, p_meal_id uuid)
+returns table (recipe jsonb, ingredients jsonb)
+language plpgsql
+as $$
+begin
+  perform 1 from public.recipes r
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  for update;
+  if not found then
+    raise exception 'Recipe not found' using errcode = 'no_data_found';
+  end if;
+
+  perform 1 from public.meals m
+  where m.id = p_meal_id and m.user_id = p_user_id and m.recipe_id = p_recipe_id;
+  if not found then
+    raise exception 'Meal not found' using errcode = 'no_data_found';
+  end if;
+
+  -- Ingredients still in the template: check the ones the meal used, at its
+  -- quantities, and uncheck the rest
+  update public.recipe_ingredients ri set
+    checked = mi.recipe_ingredient_id is not null,
+    quantity = coalesce(mi.quantity, ri.quantity)
+  from public.recipe_ingredients cur
+  left join public.meal_ingredients mi
+    on mi.meal_id = p_meal_id and mi.recipe_ingredient_id = cur.id
+  where ri.id = cur.id and cur.recipe_id = p_recipe_id;
+
+  -- Ingredients removed from the template since: re-add them
+  insert into public.recipe_ingredients (
+    recipe_id, food_name, quantity, unit,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit,
+    usda_fdc_id, checked
+  )
+  select p_recipe_id, mi.food_name, mi.quantity, mi.unit,
+    mi.calories_per_unit, mi.protein_per_unit, mi.carbs_per_unit, mi.fat_per_unit, mi.fiber_per_unit,
+    mi.usda_fdc_id, true
+  from public.meal_ingredients mi
+  where mi.meal_id = p_meal_id
+    and not exists (
+      select 1 from public.recipe_ingredients ri
+      where ri.id = mi.recipe_ingredient_id and ri.recipe_id = p_recipe_id
+    )
+  order by mi.created_at;
+
+  return query
+  select to_jsonb(r),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) order by ri.created_at)
+      from public.recipe_ingredients ri
+      where ri.recipe_id = p_recipe_id
+    ), '[]'::jsonb)
+  from public.recipes r
+  where r.id = p_recipe_id;
+end;
+$$;
+
+select public.recompute_recipe_totals(array(select id from public.recipes));
@@ -0,0 +1,5 @@
+-- Keyset pagination for GET /recipes: pages walk (created_at, id) newest first,
+-- and each page's ingredients are read per recipe in insertion order.
+create index recipes_user_created_idx on public.recipes (user_id, created_at desc, id desc);
+
+create index recipe_ingredients_recipe_created_idx on public.recipe_ingredients (recipe_id, created_at);
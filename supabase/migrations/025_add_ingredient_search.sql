@@ -0,0 +1,46 @@
+-- Typeahead search over the shared ingredients catalog. Substring matches on
+-- the lowercased name are served by a trigram index; results rank prefix
+-- matches first, then matches at the start of a later word, then the rest,
+-- shorter names first. Pages continue after the last (rank, name, id) seen.
+create extension if not exists pg_trgm with schema extensions;
+
+create index ingredients_name_trgm_idx on public.ingredients using gin (lower(name) extensions.gin_trgm_ops);
+
+-- Keyset order of the paginated export
+create index ingredients_name_id_idx on public.ingredients (name, id);
+
+create or replace function public.search_ingredients(
+  p_query text,
+  p_limit integer default 20,
+  p_after_rank integer default null,
+  p_after_name text default null,
+  p_after_id uuid default null
+)
+returns table (rank integer, ingredient public.ingredients)
+language sql stable
+as $$
+  with term as (
+    select replace(replace(replace(lower(p_query), '\', '\\'), '%', '\%'), '_', '\_') as escaped
+  ),
+  matches as (
+    select
+      case
+        when lower(i.name) like t.escaped || '%' then 2
+        when lower(i.name) like '% ' || t.escaped || '%' then 1
+        else 0
+      end as rank,
+      i as ingredient
+    from public.ingredients i, term t
+    where lower(i.name) like '%' || t.escaped || '%'
+  )
+  select m.rank, m.ingredient
+  from matches m
+  where p_after_id is null
+     or (-m.rank, length((m.ingredient).name), (m.ingredient).name, (m.ingredient).id)
+      > (-p_after_rank, length(p_after_name), p_after_name, p_after_id)
+  order by m.rank desc, length((m.ingredient).name), (m.ingredient).name, (m.ingredient).id
+  limit p_limit;
+$$;
+
+revoke execute on function public.search_ingredients(text, integer, integer, text, uuid) from public, anon, authenticated;
+grant execute on function public.search_ingredients(text, integer, integer, text, uuid) to service_role;
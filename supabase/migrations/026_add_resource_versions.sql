@@ -0,0 +1,64 @@
+-- Change counters behind the ETags on read endpoints. Every write to a table
+-- bumps the version of the resource it belongs to, per owning user (the shared
+-- ingredients catalog uses the nil uuid), so a conditional GET costs one
+-- primary-key lookup instead of re-running the query.
+create table public.resource_versions (
+  scope uuid not null,
+  resource text not null,
+  version bigint not null default 1,
+  primary key (scope, resource)
+);
+
+alter table public.resource_versions enable row level security;
+
+-- tg_argv[0]: resource name; tg_argv[1]: expression over the changed row giving its scope
+create or replace function public.bump_resource_version()
+returns trigger
+language plpgsql
+security definer set search_path = public
+as $$
+begin
+  execute format(
+    'insert into public.resource_versions as v (scope, resource)
+     select distinct scope, %L from (select %s as scope from changed_rows) c
+     where scope is not null
+     on conflict (scope, resource) do update set version = v.version + 1',
+    tg_argv[0], tg_argv[1]
+  );
+  return null;
+end;
+$$;
+
+do $$
+declare
+  t record;
+begin
+  for t in
+    select * from (values
+      ('profiles', 'profile', 'id'),
+      ('day_types', 'day_types', 'user_id'),
+      ('day_logs', 'meals', 'user_id'),
+      ('meals', 'meals', 'user_id'),
+      ('recipes', 'recipes', 'user_id'),
+      ('recipe_ingredients', 'recipes', '(select r.user_id from public.recipes r where r.id = recipe_id)'),
+      ('ingredients', 'ingredients', '''00000000-0000-0000-0000-000000000000''::uuid')
+    ) as v(tbl, resource, scope)
+  loop
+    execute format(
+      'create trigger %1$s_version_insert after insert on public.%1$I
+         referencing new table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+    execute format(
+      'create trigger %1$s_version_update after update on public.%1$I
+         referencing new table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+    execute format(
+      'create trigger %1$s_version_delete after delete on public.%1$I
+         referencing old table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+  end loop;
+end;
+$$;
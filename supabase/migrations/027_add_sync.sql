@@ -0,0 +1,150 @@
+-- Delta sync for offline clients (GET /sync). Every synced row records when
+-- and by which transaction it was last written, and deletes leave a tombstone
+-- in deleted_rows. A client's cursor is the oldest transaction still running
+-- when it last synced: everything committed after that is newer or equal, so
+-- a slow transaction can't slip in behind the cursor (at worst a row is sent
+-- twice).
+alter table public.meals
+  add column updated_at timestamptz not null default now(),
+  add column change_xid xid8 not null default pg_current_xact_id();
+alter table public.recipes
+  add column change_xid xid8 not null default pg_current_xact_id();
+alter table public.recipe_ingredients
+  add column updated_at timestamptz not null default now(),
+  add column change_xid xid8 not null default pg_current_xact_id();
+alter table public.day_types
+  add column updated_at timestamptz not null default now(),
+  add column change_xid xid8 not null default pg_current_xact_id();
+alter table public.day_logs
+  add column updated_at timestamptz not null default now(),
+  add column change_xid xid8 not null default pg_current_xact_id();
+
+create index meals_user_change_idx on public.meals (user_id, change_xid);
+create index recipes_user_change_idx on public.recipes (user_id, change_xid);
+create index recipe_ingredients_recipe_change_idx on public.recipe_ingredients (recipe_id, change_xid);
+create index day_types_user_change_idx on public.day_types (user_id, change_xid);
+create index day_logs_user_change_idx on public.day_logs (user_id, change_xid);
+
+create or replace function public.touch_row()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  new.change_xid := pg_current_xact_id();
+  return new;
+end;
+$$;
+
+create trigger meals_touch before update on public.meals
+  for each row execute function public.touch_row();
+create trigger recipes_touch before update on public.recipes
+  for each row execute function public.touch_row();
+create trigger recipe_ingredients_touch before update on public.recipe_ingredients
+  for each row execute function public.touch_row();
+create trigger day_types_touch before update on public.day_types
+  for each row execute function public.touch_row();
+create trigger day_logs_touch before update on public.day_logs
+  for each row execute function public.touch_row();
+
+-- No foreign key to profiles: deleting a profile cascades into the tables
+-- below, whose tombstones would otherwise point at the row being deleted
+create table public.deleted_rows (
+  id bigint generated always as identity primary key,
+  user_id uuid not null,
+  table_name text not null,
+  row_key text not null,
+  deleted_at timestamptz not null default now(),
+  deleted_xid xid8 not null default pg_current_xact_id()
+);
+
+create index deleted_rows_user_xid_idx on public.deleted_rows (user_id, deleted_xid);
+
+alter table public.deleted_rows enable row level security;
+
+-- tg_argv[0]: expression over the deleted row giving its owner; tg_argv[1]: its key.
+-- Ingredients deleted along with their recipe have no owner left to look up;
+-- the recipe's own tombstone covers them.
+create or replace function public.record_deleted_rows()
+returns trigger
+language plpgsql
+security definer set search_path = public
+as $$
+begin
+  execute format(
+    'insert into public.deleted_rows (user_id, table_name, row_key)
+     select user_id, %L, row_key from (select %s as user_id, (%s)::text as row_key from old_rows) d
+     where user_id is not null',
+    tg_table_name, tg_argv[0], tg_argv[1]
+  );
+  return null;
+end;
+$$;
+
+create trigger meals_record_deletes after delete on public.meals
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger recipes_record_deletes after delete on public.recipes
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger recipe_ingredients_record_deletes after delete on public.recipe_ingredients
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('(select r.user_id from public.recipes r where r.id = recipe_id)', 'id');
+create trigger day_types_record_deletes after delete on public.day_types
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger day_logs_record_deletes after delete on public.day_logs
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'logged_date');
+
+-- Rows written and tombstones left since p_since (everything, and no
+-- tombstones, when it's null), plus the cursor for the next call
+create or replace function public.sync_changes(p_user_id uuid, p_since xid8 default null)
+returns table (
+  next_cursor xid8,
+  meals jsonb,
+  recipes jsonb,
+  recipe_ingredients jsonb,
+  day_types jsonb,
+  day_logs jsonb,
+  deleted jsonb
+)
+language sql stable
+as $$
+  select
+    pg_snapshot_xmin(pg_current_snapshot()),
+    coalesce((
+      select jsonb_agg(to_jsonb(m) - 'change_xid' order by m.change_xid)
+      from public.meals m
+      where m.user_id = p_user_id and (p_since is null or m.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(r) - 'change_xid' order by r.change_xid)
+      from public.recipes r
+      where r.user_id = p_user_id and (p_since is null or r.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) - 'change_xid' order by ri.change_xid)
+      from public.recipe_ingredients ri
+      join public.recipes r on r.id = ri.recipe_id
+      where r.user_id = p_user_id and (p_since is null or ri.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dt) - 'change_xid' order by dt.change_xid)
+      from public.day_types dt
+      where dt.user_id = p_user_id and (p_since is null or dt.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dl) - 'change_xid' order by dl.change_xid)
+      from public.day_logs dl
+      where dl.user_id = p_user_id and (p_since is null or dl.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(jsonb_build_object('table', d.table_name, 'key', d.row_key, 'deleted_at', d.deleted_at) order by d.id)
+      from public.deleted_rows d
+      where d.user_id = p_user_id and p_since is not null and d.deleted_xid >= p_since
+    ), '[]');
+$$;
+
+revoke execute on function public.sync_changes(uuid, xid8) from public, anon, authenticated;
+grant execute on function public.sync_changes(uuid, xid8) to service_role;
@@ -0,0 +1,61 @@
+-- Ingredient writes that check the recipe's owner in the same statement, so
+-- the API doesn't read the recipe first. Each returns the rows it wrote; none
+-- means the recipe isn't the caller's, or the ingredient isn't in it.
+create or replace function public.add_recipe_ingredient(p_user_id uuid, p_recipe_id uuid, p_ingredient jsonb)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  insert into public.recipe_ingredients (
+    recipe_id, food_name, quantity, unit, usda_fdc_id, checked,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit
+  )
+  select
+    r.id, i.food_name, i.quantity, coalesce(i.unit, 'g'), i.usda_fdc_id, coalesce(i.checked, true),
+    coalesce(i.calories_per_unit, 0), coalesce(i.protein_per_unit, 0), coalesce(i.carbs_per_unit, 0),
+    coalesce(i.fat_per_unit, 0), coalesce(i.fiber_per_unit, 0)
+  from public.recipes r
+  cross join jsonb_populate_record(null::public.recipe_ingredients, p_ingredient) i
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  returning *;
+$$;
+
+create or replace function public.update_recipe_ingredient(
+  p_user_id uuid,
+  p_recipe_id uuid,
+  p_ingredient_id uuid,
+  p_checked boolean default null,
+  p_quantity numeric default null
+)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  update public.recipe_ingredients ri
+  set checked = coalesce(p_checked, ri.checked),
+      quantity = coalesce(p_quantity, ri.quantity)
+  from public.recipes r
+  where ri.id = p_ingredient_id
+    and ri.recipe_id = p_recipe_id
+    and r.id = ri.recipe_id
+    and r.user_id = p_user_id
+  returning ri.*;
+$$;
+
+create or replace function public.delete_recipe_ingredient(p_user_id uuid, p_recipe_id uuid, p_ingredient_id uuid)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  delete from public.recipe_ingredients ri
+  using public.recipes r
+  where ri.id = p_ingredient_id
+    and ri.recipe_id = p_recipe_id
+    and r.id = ri.recipe_id
+    and r.user_id = p_user_id
+  returning ri.*;
+$$;
+
+revoke execute on function public.add_recipe_ingredient(uuid, uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.add_recipe_ingredient(uuid, uuid, jsonb) to service_role;
+revoke execute on function public.update_recipe_ingredient(uuid, uuid, uuid, boolean, numeric) from public, anon, authenticated;
+grant execute on function public.update_recipe_ingredient(uuid, uuid, uuid, boolean, numeric) to service_role;
+revoke execute on function public.delete_recipe_ingredient(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.delete_recipe_ingredient(uuid, uuid, uuid) to service_role;
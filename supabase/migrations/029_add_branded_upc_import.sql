@@ -0,0 +1,41 @@
+-- Upserts a batch of barcodes ({upc_normalized, upc, fdc_id}), as streamed
+-- from branded_food.csv, into upc_products, taking each product's name and
+-- nutrients from fdc_foods. When several foods share a barcode, within the
+-- batch or across batches, the highest fdc_id wins; curated Open Food Facts
+-- rows are replaced, as before.
+create or replace function public.import_branded_upcs(p_rows jsonb)
+returns table (upserted_count integer)
+language sql
+as $$
+  with barcodes as (
+    select distinct on (r.upc_normalized) r.upc_normalized, r.upc, r.fdc_id
+    from jsonb_to_recordset(p_rows) as r(upc_normalized text, upc text, fdc_id bigint)
+    order by r.upc_normalized, r.fdc_id desc
+  ), upserted as (
+    insert into public.upc_products as p (
+      upc_normalized, upc, source, source_name, usda_fdc_id,
+      calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g, updated_at
+    )
+    select b.upc_normalized, b.upc, 'usda', initcap(f.description), f.fdc_id::text,
+      f.calories_per_100g, f.protein_per_100g, f.carbs_per_100g, f.fat_per_100g, f.fiber_per_100g, now()
+    from barcodes b
+    join public.fdc_foods f on f.fdc_id = b.fdc_id
+    on conflict (upc_normalized) do update set
+      upc = excluded.upc,
+      source = excluded.source,
+      source_name = excluded.source_name,
+      usda_fdc_id = excluded.usda_fdc_id,
+      calories_per_100g = excluded.calories_per_100g,
+      protein_per_100g = excluded.protein_per_100g,
+      carbs_per_100g = excluded.carbs_per_100g,
+      fat_per_100g = excluded.fat_per_100g,
+      fiber_per_100g = excluded.fiber_per_100g,
+      updated_at = excluded.updated_at
+    where p.source <> 'usda' or p.usda_fdc_id::bigint <= excluded.usda_fdc_id::bigint
+    returning 1
+  )
+  select count(*)::integer from upserted;
+$$;
+
+revoke execute on function public.import_branded_upcs(jsonb) from public, anon, authenticated;
+grant execute on function public.import_branded_upcs(jsonb) to service_role;
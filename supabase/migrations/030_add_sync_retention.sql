@@ -0,0 +1,142 @@
+-- Tombstones in deleted_rows are only kept for a retention window: pruning
+-- (prune_deleted_rows, run daily by app.commands.prune_deleted_rows) records
+-- the newest transaction it removed a tombstone of. A client whose cursor is
+-- at or before that may have missed a delete, so sync_changes flags its cursor
+-- as expired and the client resyncs from scratch.
+create table public.sync_horizon (
+  id boolean primary key default true check (id),
+  pruned_through xid8 not null
+);
+
+alter table public.sync_horizon enable row level security;
+
+create index deleted_rows_deleted_at_idx on public.deleted_rows (deleted_at);
+
+create or replace function public.prune_deleted_rows(p_older_than interval)
+returns table (pruned_count integer)
+language plpgsql
+as $$
+declare
+  pruned integer;
+  newest xid8;
+begin
+  with gone as (
+    delete from public.deleted_rows
+    where deleted_at < now() - p_older_than
+    returning deleted_xid
+  )
+  select count(*)::integer, (select g.deleted_xid from gone g order by g.deleted_xid desc limit 1)
+  into pruned, newest
+  from gone;
+
+  if newest is not null then
+    insert into public.sync_horizon as h (pruned_through) values (newest)
+    on conflict (id) do update set pruned_through = excluded.pruned_through
+    where h.pruned_through < excluded.pruned_through;
+  end if;
+  return query select pruned;
+end;
+$$;
+
+revoke execute on function public.prune_deleted_rows(interval) from public, anon, authenticated;
+grant execute on function public.prune_deleted_rows(interval) to service_role;
+
+-- Deltas only now: the initial sync pages through sync_page instead
+drop function public.sync_changes(uuid, xid8);
+
+create function public.sync_changes(p_user_id uuid, p_since xid8)
+returns table (
+  next_cursor xid8,
+  meals jsonb,
+  recipes jsonb,
+  recipe_ingredients jsonb,
+  day_types jsonb,
+  day_logs jsonb,
+  deleted jsonb,
+  expired boolean
+)
+language sql stable
+as $$
+  with horizon as (
+    select exists (select 1 from public.sync_horizon s where s.pruned_through >= p_since) as expired
+  )
+  select
+    pg_snapshot_xmin(pg_current_snapshot()),
+    coalesce((
+      select jsonb_agg(to_jsonb(m) - 'change_xid' order by m.change_xid)
+      from public.meals m
+      where not h.expired and m.user_id = p_user_id and m.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(r) - 'change_xid' order by r.change_xid)
+      from public.recipes r
+      where not h.expired and r.user_id = p_user_id and r.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) - 'change_xid' order by ri.change_xid)
+      from public.recipe_ingredients ri
+      join public.recipes r on r.id = ri.recipe_id
+      where not h.expired and r.user_id = p_user_id and ri.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dt) - 'change_xid' order by dt.change_xid)
+      from public.day_types dt
+      where not h.expired and dt.user_id = p_user_id and dt.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dl) - 'change_xid' order by dl.change_xid)
+      from public.day_logs dl
+      where not h.expired and dl.user_id = p_user_id and dl.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(jsonb_build_object('table', d.table_name, 'key', d.row_key, 'deleted_at', d.deleted_at) order by d.id)
+      from public.deleted_rows d
+      where not h.expired and d.user_id = p_user_id and d.deleted_xid >= p_since
+    ), '[]'),
+    h.expired
+  from horizon h;
+$$;
+
+revoke execute on function public.sync_changes(uuid, xid8) from public, anon, authenticated;
+grant execute on function public.sync_changes(uuid, xid8) to service_role;
+
+-- One page of a synced table for the initial sync, in key order after p_after
+-- (from the start when null), plus the cursor later deltas start from
+create or replace function public.sync_page(p_user_id uuid, p_table text, p_after text, p_limit integer)
+returns table (next_cursor xid8, rows jsonb)
+language plpgsql stable
+as $$
+declare
+  owned text;
+  key_column text := 'id';
+  key_type text := 'uuid';
+begin
+  case p_table
+    when 'meals', 'recipes', 'day_types' then
+      owned := 't.user_id = $1';
+    when 'recipe_ingredients' then
+      owned := 'exists (select 1 from public.recipes r where r.id = t.recipe_id and r.user_id = $1)';
+    when 'day_logs' then
+      owned := 't.user_id = $1';
+      key_column := 'logged_date';
+      key_type := 'date';
+    else
+      raise exception 'unknown synced table: %', p_table using errcode = '22023';
+  end case;
+
+  return query execute format(
+    'select pg_snapshot_xmin(pg_current_snapshot()),
+       coalesce(jsonb_agg(to_jsonb(p) - ''change_xid'' order by p.%1$I), ''[]'')
+     from (
+       select * from public.%2$I t
+       where %3$s and ($2 is null or t.%1$I > $2::%4$s)
+       order by t.%1$I
+       limit $3
+     ) p',
+    key_column, p_table, owned, key_type
+  ) using p_user_id, p_after, p_limit;
+end;
+$$;
+
+revoke execute on function public.sync_page(uuid, text, text, integer) from public, anon, authenticated;
+grant execute on function public.sync_page(uuid, text, text, integer) to service_role;
@@ -39,10 +39,18 @@ create table public.recipes (
   is_public boolean not null default false,
   last_cooked_weight numeric(7,1),
   last_meal_type text check (last_meal_type in ('Breakfast', 'Lunch', 'Dinner', 'Snack')),
+  total_calories numeric not null default 0,
+  total_protein numeric not null default 0,
+  total_carbs numeric not null default 0,
+  total_fat numeric not null default 0,
+  total_fiber numeric not null default 0,
   created_at timestamptz not null default now(),
-  updated_at timestamptz not null default now()
+  updated_at timestamptz not null default now(),
+  change_xid xid8 not null default pg_current_xact_id()
 );
 
+create index recipes_user_created_idx on public.recipes (user_id, created_at desc, id desc);
+
 create table public.recipe_ingredients (
   id uuid default gen_random_uuid() primary key,
   recipe_id uuid references public.recipes(id) on delete cascade not null,
@@ -56,9 +64,13 @@ create table public.recipe_ingredients (
   fiber_per_unit numeric(8,2) not null default 0,
   usda_fdc_id text,
   checked boolean not null default true,
-  created_at timestamptz not null default now()
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  change_xid xid8 not null default pg_current_xact_id()
 );
 
+create index recipe_ingredients_recipe_created_idx on public.recipe_ingredients (recipe_id, created_at);
+
 create table public.meals (
   id uuid default gen_random_uuid() primary key,
   user_id uuid references public.profiles(id) on delete cascade not null,
@@ -75,10 +87,14 @@ create table public.meals (
   total_cooked_weight numeric(7,1),
   portion_weight numeric(7,1),
   recipe_id uuid references public.recipes(id) on delete set null,
-  created_at timestamptz not null default now()
+  client_key text,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  change_xid xid8 not null default pg_current_xact_id()
 );
 
 create index meals_user_date_idx on public.meals (user_id, logged_date desc);
+create unique index meals_user_client_key_idx on public.meals (user_id, client_key);
 
 create table public.meal_ingredients (
   id uuid default gen_random_uuid() primary key,
@@ -156,7 +172,9 @@ create table public.day_types (
   fat_max integer not null default 0,
   fiber_min integer not null default 0,
   fiber_max integer not null default 0,
-  created_at timestamptz not null default now()
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  change_xid xid8 not null default pg_current_xact_id()
 );
 
 alter table public.day_types enable row level security;
@@ -170,6 +188,8 @@ create table public.day_logs (
   user_id uuid references public.profiles(id) on delete cascade not null,
   logged_date date not null,
   day_type_id uuid references public.day_types(id) on delete set null,
+  updated_at timestamptz not null default now(),
+  change_xid xid8 not null default pg_current_xact_id(),
   primary key (user_id, logged_date)
 );
 
@@ -179,3 +199,959 @@ create policy "Users can manage own day logs"
   on public.day_logs for all
   using (user_id = auth.uid())
   with check (user_id = auth.uid());
+
+create table public.daily_totals (
+  user_id uuid references public.profiles(id) on delete cascade not null,
+  logged_date date not null,
+  meal_count integer not null default 0,
+  calories integer not null default 0,
+  protein_g numeric not null default 0,
+  carbs_g numeric not null default 0,
+  fat_g numeric not null default 0,
+  fiber_g numeric not null default 0,
+  primary key (user_id, logged_date)
+);
+
+alter table public.daily_totals enable row level security;
+
+create policy "Users can view own daily totals"
+  on public.daily_totals for select
+  using (auth.uid() = user_id);
+
+create or replace function public.maintain_daily_totals()
+returns trigger
+language plpgsql security definer set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    update public.daily_totals set
+      meal_count = meal_count - 1,
+      calories = calories - old.calories,
+      protein_g = protein_g - coalesce(old.protein_g, 0),
+      carbs_g = carbs_g - coalesce(old.carbs_g, 0),
+      fat_g = fat_g - coalesce(old.fat_g, 0),
+      fiber_g = fiber_g - coalesce(old.fiber_g, 0)
+    where user_id = old.user_id and logged_date = old.logged_date;
+    delete from public.daily_totals
+    where user_id = old.user_id and logged_date = old.logged_date and meal_count <= 0;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into public.daily_totals as t (user_id, logged_date, meal_count, calories, protein_g, carbs_g, fat_g, fiber_g)
+    values (
+      new.user_id, new.logged_date, 1, new.calories,
+      coalesce(new.protein_g, 0), coalesce(new.carbs_g, 0), coalesce(new.fat_g, 0), coalesce(new.fiber_g, 0)
+    )
+    on conflict (user_id, logged_date) do update set
+      meal_count = t.meal_count + 1,
+      calories = t.calories + excluded.calories,
+      protein_g = t.protein_g + excluded.protein_g,
+      carbs_g = t.carbs_g + excluded.carbs_g,
+      fat_g = t.fat_g + excluded.fat_g,
+      fiber_g = t.fiber_g + excluded.fiber_g;
+  end if;
+  return null;
+end;
+$$;
+
+create trigger meals_maintain_daily_totals
+  after insert or delete or update of user_id, logged_date, calories, protein_g, carbs_g, fat_g, fiber_g
+  on public.meals
+  for each row execute function public.maintain_daily_totals();
+
+create or replace function public.rebuild_daily_totals(p_user_id uuid default null)
+returns table (user_count integer, day_count integer)
+language plpgsql security definer set search_path = public
+as $$
+begin
+  lock table public.meals in share mode;
+  delete from public.daily_totals where p_user_id is null or daily_totals.user_id = p_user_id;
+  insert into public.daily_totals (user_id, logged_date, meal_count, calories, protein_g, carbs_g, fat_g, fiber_g)
+  select
+    m.user_id, m.logged_date, count(*), sum(m.calories),
+    coalesce(sum(m.protein_g), 0), coalesce(sum(m.carbs_g), 0), coalesce(sum(m.fat_g), 0), coalesce(sum(m.fiber_g), 0)
+  from public.meals m
+  where p_user_id is null or m.user_id = p_user_id
+  group by m.user_id, m.logged_date;
+  return query
+    select count(distinct t.user_id)::integer, count(*)::integer
+    from public.daily_totals t
+    where p_user_id is null or t.user_id = p_user_id;
+end;
+$$;
+
+revoke execute on function public.rebuild_daily_totals(uuid) from public, anon, authenticated;
+grant execute on function public.rebuild_daily_totals(uuid) to service_role;
+
+create or replace function public.get_daily_summary(p_user_id uuid, p_date date)
+returns table (
+  meals jsonb,
+  total_calories integer,
+  total_protein numeric,
+  total_carbs numeric,
+  total_fat numeric,
+  total_fiber numeric,
+  day_type jsonb
+)
+language sql stable
+as $$
+  select
+    coalesce(
+      (select jsonb_agg(to_jsonb(m) order by m.created_at) from public.meals m
+       where m.user_id = p_user_id and m.logged_date = p_date),
+      '[]'::jsonb
+    ),
+    coalesce(t.calories, 0),
+    coalesce(t.protein_g, 0),
+    coalesce(t.carbs_g, 0),
+    coalesce(t.fat_g, 0),
+    coalesce(t.fiber_g, 0),
+    (
+      select to_jsonb(dt)
+      from public.day_types dt
+      where dt.user_id = p_user_id
+        and dt.id = coalesce(
+          (select dl.day_type_id from public.day_logs dl where dl.user_id = p_user_id and dl.logged_date = p_date),
+          (select p.default_day_type_id from public.profiles p where p.id = p_user_id)
+        )
+    )
+  from (select 1) as one
+  left join public.daily_totals t on t.user_id = p_user_id and t.logged_date = p_date;
+$$;
+
+revoke execute on function public.get_daily_summary(uuid, date) from public, anon, authenticated;
+grant execute on function public.get_daily_summary(uuid, date) to service_role;
+
+create or replace function public.get_meal_history(
+  p_user_id uuid,
+  p_start date default null,
+  p_end date default null,
+  p_bucket text default 'day',
+  p_limit integer default null
+)
+returns table (
+  "date" date,
+  days_logged integer,
+  meal_count integer,
+  calories bigint,
+  protein_g numeric,
+  carbs_g numeric,
+  fat_g numeric,
+  fiber_g numeric
+)
+language sql stable
+as $$
+  select
+    date_trunc(p_bucket, t.logged_date::timestamp)::date,
+    count(*)::integer,
+    sum(t.meal_count)::integer,
+    sum(t.calories),
+    sum(t.protein_g),
+    sum(t.carbs_g),
+    sum(t.fat_g),
+    sum(t.fiber_g)
+  from public.daily_totals t
+  where t.user_id = p_user_id
+    and (p_start is null or t.logged_date >= p_start)
+    and (p_end is null or t.logged_date <= p_end)
+  group by 1
+  order by 1 desc
+  limit p_limit;
+$$;
+
+revoke execute on function public.get_meal_history(uuid, date, date, text, integer) from public, anon, authenticated;
+grant execute on function public.get_meal_history(uuid, date, date, text, integer) to service_role;
+
+create table public.usda_search_cache (
+  key text primary key,
+  value jsonb not null,
+  fetched_at timestamptz not null default now()
+);
+
+alter table public.usda_search_cache enable row level security;
+
+create table public.upc_products (
+  upc_normalized text primary key check (upc_normalized <> ''),
+  upc text not null,
+  source text not null,
+  source_name text not null default '',
+  usda_fdc_id text,
+  calories_per_100g numeric(8,2) not null default 0,
+  protein_per_100g numeric(8,2) not null default 0,
+  carbs_per_100g numeric(8,2) not null default 0,
+  fat_per_100g numeric(8,2) not null default 0,
+  fiber_per_100g numeric(8,2) not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+alter table public.upc_products enable row level security;
+
+create policy "Authenticated users can read upc products"
+  on public.upc_products for select using (auth.role() = 'authenticated');
+
+create index ingredients_upc_normalized_idx
+  on public.ingredients (ltrim(upc, '0'))
+  where upc is not null;
+
+create or replace function public.lookup_upc(p_upc text)
+returns table (
+  upc text,
+  source text,
+  source_name text,
+  usda_fdc_id text,
+  calories_per_100g numeric,
+  protein_per_100g numeric,
+  carbs_per_100g numeric,
+  fat_per_100g numeric,
+  fiber_per_100g numeric
+)
+language sql stable
+as $$
+  select upc, source, source_name, usda_fdc_id,
+    calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g
+  from (
+    select i.upc, coalesce(i.source, 'manual') as source, coalesce(i.source_name, i.name) as source_name,
+      i.usda_fdc_id, i.calories_per_100g, i.protein_per_100g, i.carbs_per_100g, i.fat_per_100g, i.fiber_per_100g,
+      0 as priority, i.updated_at
+    from public.ingredients i
+    where ltrim(i.upc, '0') = ltrim(p_upc, '0') and i.upc is not null
+    union all
+    select p.upc, p.source, p.source_name,
+      p.usda_fdc_id, p.calories_per_100g, p.protein_per_100g, p.carbs_per_100g, p.fat_per_100g, p.fiber_per_100g,
+      1 as priority, p.updated_at
+    from public.upc_products p
+    where p.upc_normalized = ltrim(p_upc, '0')
+  ) matches
+  where ltrim(p_upc, '0') <> ''
+  order by priority, updated_at desc
+  limit 1;
+$$;
+
+revoke execute on function public.lookup_upc(text) from public, anon, authenticated;
+grant execute on function public.lookup_upc(text) to service_role;
+
+create table public.fdc_foods (
+  fdc_id bigint primary key,
+  data_type text not null,
+  description text not null,
+  publication_date date,
+  calories_per_100g numeric(8,2) not null default 0,
+  protein_per_100g numeric(8,2) not null default 0,
+  carbs_per_100g numeric(8,2) not null default 0,
+  fat_per_100g numeric(8,2) not null default 0,
+  fiber_per_100g numeric(8,2) not null default 0,
+  search tsvector generated always as (to_tsvector('english', description)) stored,
+  imported_at timestamptz not null default now()
+);
+
+alter table public.fdc_foods enable row level security;
+
+create policy "Authenticated users can read fdc foods"
+  on public.fdc_foods for select using (auth.role() = 'authenticated');
+
+create index fdc_foods_search_idx on public.fdc_foods using gin (search);
+
+create or replace function public.import_fdc_nutrients(p_rows jsonb)
+returns table (updated_count integer)
+language sql
+as $$
+  with amounts as (
+    select r.fdc_id,
+      max(r.calories_per_100g) as calories_per_100g,
+      max(r.protein_per_100g) as protein_per_100g,
+      max(r.carbs_per_100g) as carbs_per_100g,
+      max(r.fat_per_100g) as fat_per_100g,
+      max(r.fiber_per_100g) as fiber_per_100g
+    from jsonb_to_recordset(p_rows) as r(
+      fdc_id bigint,
+      calories_per_100g numeric,
+      protein_per_100g numeric,
+      carbs_per_100g numeric,
+      fat_per_100g numeric,
+      fiber_per_100g numeric
+    )
+    group by r.fdc_id
+  ), updated as (
+    update public.fdc_foods f set
+      calories_per_100g = coalesce(a.calories_per_100g, f.calories_per_100g),
+      protein_per_100g = coalesce(a.protein_per_100g, f.protein_per_100g),
+      carbs_per_100g = coalesce(a.carbs_per_100g, f.carbs_per_100g),
+      fat_per_100g = coalesce(a.fat_per_100g, f.fat_per_100g),
+      fiber_per_100g = coalesce(a.fiber_per_100g, f.fiber_per_100g)
+    from amounts a
+    where f.fdc_id = a.fdc_id
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
+
+create or replace function public.search_fdc_foods(p_query text, p_limit integer default 20)
+returns table (
+  fdc_id bigint,
+  data_type text,
+  description text,
+  calories_per_100g numeric,
+  protein_per_100g numeric,
+  carbs_per_100g numeric,
+  fat_per_100g numeric,
+  fiber_per_100g numeric
+)
+language sql stable
+as $$
+  with q as (
+    select to_tsquery('english', string_agg(quote_literal(word) || ':*', ' & ')) as query
+    from regexp_split_to_table(lower(p_query), '[^[:alnum:]]+') as word
+    where word <> ''
+  )
+  select f.fdc_id, f.data_type, f.description,
+    f.calories_per_100g, f.protein_per_100g, f.carbs_per_100g, f.fat_per_100g, f.fiber_per_100g
+  from public.fdc_foods f, q
+  where f.search @@ q.query
+  order by ts_rank_cd(f.search, q.query, 1) desc, f.data_type = 'branded_food', length(f.description), f.fdc_id
+  limit p_limit;
+$$;
+
+revoke execute on function public.import_fdc_nutrients(jsonb) from public, anon, authenticated;
+grant execute on function public.import_fdc_nutrients(jsonb) to service_role;
+revoke execute on function public.search_fdc_foods(text, integer) from public, anon, authenticated;
+grant execute on function public.search_fdc_foods(text, integer) to service_role;
+
+create or replace function public.restore_recipe_from_meal(p_user_id uuid, p_recipe_id uuid, p_meal_id uuid)
+returns table (recipe jsonb, ingredients jsonb)
+language plpgsql
+as $$
+begin
+  perform 1 from public.recipes r
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  for update;
+  if not found then
+    raise exception 'Recipe not found' using errcode = 'no_data_found';
+  end if;
+
+  perform 1 from public.meals m
+  where m.id = p_meal_id and m.user_id = p_user_id and m.recipe_id = p_recipe_id;
+  if not found then
+    raise exception 'Meal not found' using errcode = 'no_data_found';
+  end if;
+
+  update public.recipe_ingredients ri set
+    checked = mi.recipe_ingredient_id is not null,
+    quantity = coalesce(mi.quantity, ri.quantity)
+  from public.recipe_ingredients cur
+  left join public.meal_ingredients mi
+    on mi.meal_id = p_meal_id and mi.recipe_ingredient_id = cur.id
+  where ri.id = cur.id and cur.recipe_id = p_recipe_id;
+
+  insert into public.recipe_ingredients (
+    recipe_id, food_name, quantity, unit,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit,
+    usda_fdc_id, checked
+  )
+  select p_recipe_id, mi.food_name, mi.quantity, mi.unit,
+    mi.calories_per_unit, mi.protein_per_unit, mi.carbs_per_unit, mi.fat_per_unit, mi.fiber_per_unit,
+    mi.usda_fdc_id, true
+  from public.meal_ingredients mi
+  where mi.meal_id = p_meal_id
+    and not exists (
+      select 1 from public.recipe_ingredients ri
+      where ri.id = mi.recipe_ingredient_id and ri.recipe_id = p_recipe_id
+    )
+  order by mi.created_at;
+
+  return query
+  select to_jsonb(r),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) order by ri.created_at)
+      from public.recipe_ingredients ri
+      where ri.recipe_id = p_recipe_id
+    ), '[]'::jsonb)
+  from public.recipes r
+  where r.id = p_recipe_id;
+end;
+$$;
+
+revoke execute on function public.restore_recipe_from_meal(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.restore_recipe_from_meal(uuid, uuid, uuid) to service_role;
+
+create or replace function public.log_recipe(
+  p_user_id uuid,
+  p_recipe_id uuid,
+  p_logged_date date,
+  p_meal_type text,
+  p_ingredient_overrides jsonb,
+  p_total_cooked_weight numeric default null,
+  p_portion_weight numeric default null
+)
+returns setof public.meals
+language plpgsql
+as $$
+declare
+  v_recipe public.recipes;
+  v_meal public.meals;
+  v_scale numeric := 1;
+begin
+  select * into v_recipe
+  from public.recipes r
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  for update;
+  if not found then
+    raise exception 'Recipe not found' using errcode = 'no_data_found';
+  end if;
+
+  if p_total_cooked_weight > 0 and coalesce(p_portion_weight, 0) <> 0 then
+    v_scale := p_portion_weight / p_total_cooked_weight;
+  end if;
+
+  insert into public.meals (
+    user_id, logged_date, meal_type, name,
+    calories, protein_g, carbs_g, fat_g, fiber_g,
+    raw_weight, total_cooked_weight, portion_weight, recipe_id
+  )
+  select p_user_id, p_logged_date, p_meal_type, v_recipe.name,
+    round(coalesce(sum(o.quantity * ri.calories_per_unit), 0) * v_scale)::integer,
+    round(coalesce(sum(o.quantity * ri.protein_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.carbs_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.fat_per_unit), 0) * v_scale, 1),
+    round(coalesce(sum(o.quantity * ri.fiber_per_unit), 0) * v_scale, 1),
+    (select round(coalesce(sum(a.quantity), 0), 1)
+     from jsonb_to_recordset(p_ingredient_overrides) as a(quantity numeric)),
+    round(nullif(p_total_cooked_weight, 0), 1),
+    round(nullif(p_portion_weight, 0), 1),
+    p_recipe_id
+  from jsonb_to_recordset(p_ingredient_overrides) as o(ingredient_id uuid, quantity numeric)
+  join public.recipe_ingredients ri on ri.id = o.ingredient_id and ri.recipe_id = p_recipe_id
+  returning * into v_meal;
+
+  insert into public.meal_ingredients (
+    meal_id, recipe_ingredient_id, food_name, quantity, unit,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit, usda_fdc_id
+  )
+  select v_meal.id, ri.id, ri.food_name, (o.item->>'quantity')::numeric, ri.unit,
+    ri.calories_per_unit, ri.protein_per_unit, ri.carbs_per_unit, ri.fat_per_unit, ri.fiber_per_unit, ri.usda_fdc_id
+  from jsonb_array_elements(p_ingredient_overrides) with ordinality as o(item, position)
+  join public.recipe_ingredients ri on ri.id = (o.item->>'ingredient_id')::uuid and ri.recipe_id = p_recipe_id
+  order by o.position;
+
+  update public.recipes set
+    last_meal_type = p_meal_type,
+    last_cooked_weight = coalesce(round(nullif(p_total_cooked_weight, 0), 1), last_cooked_weight)
+  where id = p_recipe_id;
+
+  return next v_meal;
+end;
+$$;
+
+revoke execute on function public.log_recipe(uuid, uuid, date, text, jsonb, numeric, numeric) from public, anon, authenticated;
+grant execute on function public.log_recipe(uuid, uuid, date, text, jsonb, numeric, numeric) to service_role;
+
+create or replace function public.recompute_recipe_totals(p_recipe_ids uuid[])
+returns void
+language sql security definer set search_path = public
+as $$
+  update public.recipes r set
+    total_calories = t.calories,
+    total_protein = t.protein,
+    total_carbs = t.carbs,
+    total_fat = t.fat,
+    total_fiber = t.fiber
+  from (
+    select ids.id,
+      coalesce(sum(ri.quantity * ri.calories_per_unit), 0) as calories,
+      coalesce(sum(ri.quantity * ri.protein_per_unit), 0) as protein,
+      coalesce(sum(ri.quantity * ri.carbs_per_unit), 0) as carbs,
+      coalesce(sum(ri.quantity * ri.fat_per_unit), 0) as fat,
+      coalesce(sum(ri.quantity * ri.fiber_per_unit), 0) as fiber
+    from unnest(p_recipe_ids) as ids(id)
+    left join public.recipe_ingredients ri on ri.recipe_id = ids.id and ri.checked
+    group by ids.id
+  ) t
+  where r.id = t.id;
+$$;
+
+create or replace function public.maintain_recipe_totals()
+returns trigger
+language plpgsql security definer set search_path = public
+as $$
+begin
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform public.recompute_recipe_totals(array(select distinct recipe_id from new_rows));
+  end if;
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform public.recompute_recipe_totals(array(select distinct recipe_id from old_rows));
+  end if;
+  return null;
+end;
+$$;
+
+create trigger recipe_ingredients_totals_insert
+  after insert on public.recipe_ingredients
+  referencing new table as new_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+create trigger recipe_ingredients_totals_update
+  after update on public.recipe_ingredients
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+create trigger recipe_ingredients_totals_delete
+  after delete on public.recipe_ingredients
+  referencing old table as old_rows
+  for each statement execute function public.maintain_recipe_totals();
+
+revoke execute on function public.recompute_recipe_totals(uuid[]) from public, anon, authenticated;
+grant execute on function public.recompute_recipe_totals(uuid[]) to service_role;
+
+create extension if not exists pg_trgm with schema extensions;
+
+create index ingredients_name_trgm_idx on public.ingredients using gin (lower(name) extensions.gin_trgm_ops);
+
+create index ingredients_name_id_idx on public.ingredients (name, id);
+
+create or replace function public.search_ingredients(
+  p_query text,
+  p_limit integer default 20,
+  p_after_rank integer default null,
+  p_after_name text default null,
+  p_after_id uuid default null
+)
+returns table (rank integer, ingredient public.ingredients)
+language sql stable
+as $$
+  with term as (
+    select replace(replace(replace(lower(p_query), '\', '\\'), '%', '\%'), '_', '\_') as escaped
+  ),
+  matches as (
+    select
+      case
+        when lower(i.name) like t.escaped || '%' then 2
+        when lower(i.name) like '% ' || t.escaped || '%' then 1
+        else 0
+      end as rank,
+      i as ingredient
+    from public.ingredients i, term t
+    where lower(i.name) like '%' || t.escaped || '%'
+  )
+  select m.rank, m.ingredient
+  from matches m
+  where p_after_id is null
+     or (-m.rank, length((m.ingredient).name), (m.ingredient).name, (m.ingredient).id)
+      > (-p_after_rank, length(p_after_name), p_after_name, p_after_id)
+  order by m.rank desc, length((m.ingredient).name), (m.ingredient).name, (m.ingredient).id
+  limit p_limit;
+$$;
+
+revoke execute on function public.search_ingredients(text, integer, integer, text, uuid) from public, anon, authenticated;
+grant execute on function public.search_ingredients(text, integer, integer, text, uuid) to service_role;
+
+create table public.resource_versions (
+  scope uuid not null,
+  resource text not null,
+  version bigint not null default 1,
+  primary key (scope, resource)
+);
+
+alter table public.resource_versions enable row level security;
+
+create or replace function public.bump_resource_version()
+returns trigger
+language plpgsql
+security definer set search_path = public
+as $$
+begin
+  execute format(
+    'insert into public.resource_versions as v (scope, resource)
+     select distinct scope, %L from (select %s as scope from changed_rows) c
+     where scope is not null
+     on conflict (scope, resource) do update set version = v.version + 1',
+    tg_argv[0], tg_argv[1]
+  );
+  return null;
+end;
+$$;
+
+do $$
+declare
+  t record;
+begin
+  for t in
+    select * from (values
+      ('profiles', 'profile', 'id'),
+      ('day_types', 'day_types', 'user_id'),
+      ('day_logs', 'meals', 'user_id'),
+      ('meals', 'meals', 'user_id'),
+      ('recipes', 'recipes', 'user_id'),
+      ('recipe_ingredients', 'recipes', '(select r.user_id from public.recipes r where r.id = recipe_id)'),
+      ('ingredients', 'ingredients', '''00000000-0000-0000-0000-000000000000''::uuid')
+    ) as v(tbl, resource, scope)
+  loop
+    execute format(
+      'create trigger %1$s_version_insert after insert on public.%1$I
+         referencing new table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+    execute format(
+      'create trigger %1$s_version_update after update on public.%1$I
+         referencing new table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+    execute format(
+      'create trigger %1$s_version_delete after delete on public.%1$I
+         referencing old table as changed_rows
+         for each statement execute function public.bump_resource_version(%2$L, %3$L)',
+      t.tbl, t.resource, t.scope);
+  end loop;
+end;
+$$;
+
+create index meals_user_change_idx on public.meals (user_id, change_xid);
+create index recipes_user_change_idx on public.recipes (user_id, change_xid);
+create index recipe_ingredients_recipe_change_idx on public.recipe_ingredients (recipe_id, change_xid);
+create index day_types_user_change_idx on public.day_types (user_id, change_xid);
+create index day_logs_user_change_idx on public.day_logs (user_id, change_xid);
+
+create or replace function public.touch_row()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  new.change_xid := pg_current_xact_id();
+  return new;
+end;
+$$;
+
+create trigger meals_touch before update on public.meals
+  for each row execute function public.touch_row();
+create trigger recipes_touch before update on public.recipes
+  for each row execute function public.touch_row();
+create trigger recipe_ingredients_touch before update on public.recipe_ingredients
+  for each row execute function public.touch_row();
+create trigger day_types_touch before update on public.day_types
+  for each row execute function public.touch_row();
+create trigger day_logs_touch before update on public.day_logs
+  for each row execute function public.touch_row();
+
+create table public.deleted_rows (
+  id bigint generated always as identity primary key,
+  user_id uuid not null,
+  table_name text not null,
+  row_key text not null,
+  deleted_at timestamptz not null default now(),
+  deleted_xid xid8 not null default pg_current_xact_id()
+);
+
+create index deleted_rows_user_xid_idx on public.deleted_rows (user_id, deleted_xid);
+
+alter table public.deleted_rows enable row level security;
+
+create or replace function public.record_deleted_rows()
+returns trigger
+language plpgsql
+security definer set search_path = public
+as $$
+begin
+  execute format(
+    'insert into public.deleted_rows (user_id, table_name, row_key)
+     select user_id, %L, row_key from (select %s as user_id, (%s)::text as row_key from old_rows) d
+     where user_id is not null',
+    tg_table_name, tg_argv[0], tg_argv[1]
+  );
+  return null;
+end;
+$$;
+
+create trigger meals_record_deletes after delete on public.meals
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger recipes_record_deletes after delete on public.recipes
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger recipe_ingredients_record_deletes after delete on public.recipe_ingredients
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('(select r.user_id from public.recipes r where r.id = recipe_id)', 'id');
+create trigger day_types_record_deletes after delete on public.day_types
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'id');
+create trigger day_logs_record_deletes after delete on public.day_logs
+  referencing old table as old_rows
+  for each statement execute function public.record_deleted_rows('user_id', 'logged_date');
+
+create or replace function public.sync_changes(p_user_id uuid, p_since xid8 default null)
+returns table (
+  next_cursor xid8,
+  meals jsonb,
+  recipes jsonb,
+  recipe_ingredients jsonb,
+  day_types jsonb,
+  day_logs jsonb,
+  deleted jsonb
+)
+language sql stable
+as $$
+  select
+    pg_snapshot_xmin(pg_current_snapshot()),
+    coalesce((
+      select jsonb_agg(to_jsonb(m) - 'change_xid' order by m.change_xid)
+      from public.meals m
+      where m.user_id = p_user_id and (p_since is null or m.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(r) - 'change_xid' order by r.change_xid)
+      from public.recipes r
+      where r.user_id = p_user_id and (p_since is null or r.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) - 'change_xid' order by ri.change_xid)
+      from public.recipe_ingredients ri
+      join public.recipes r on r.id = ri.recipe_id
+      where r.user_id = p_user_id and (p_since is null or ri.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dt) - 'change_xid' order by dt.change_xid)
+      from public.day_types dt
+      where dt.user_id = p_user_id and (p_since is null or dt.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dl) - 'change_xid' order by dl.change_xid)
+      from public.day_logs dl
+      where dl.user_id = p_user_id and (p_since is null or dl.change_xid >= p_since)
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(jsonb_build_object('table', d.table_name, 'key', d.row_key, 'deleted_at', d.deleted_at) order by d.id)
+      from public.deleted_rows d
+      where d.user_id = p_user_id and p_since is not null and d.deleted_xid >= p_since
+    ), '[]');
+$$;
+
+revoke execute on function public.sync_changes(uuid, xid8) from public, anon, authenticated;
+grant execute on function public.sync_changes(uuid, xid8) to service_role;
+
+create or replace function public.add_recipe_ingredient(p_user_id uuid, p_recipe_id uuid, p_ingredient jsonb)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  insert into public.recipe_ingredients (
+    recipe_id, food_name, quantity, unit, usda_fdc_id, checked,
+    calories_per_unit, protein_per_unit, carbs_per_unit, fat_per_unit, fiber_per_unit
+  )
+  select
+    r.id, i.food_name, i.quantity, coalesce(i.unit, 'g'), i.usda_fdc_id, coalesce(i.checked, true),
+    coalesce(i.calories_per_unit, 0), coalesce(i.protein_per_unit, 0), coalesce(i.carbs_per_unit, 0),
+    coalesce(i.fat_per_unit, 0), coalesce(i.fiber_per_unit, 0)
+  from public.recipes r
+  cross join jsonb_populate_record(null::public.recipe_ingredients, p_ingredient) i
+  where r.id = p_recipe_id and r.user_id = p_user_id
+  returning *;
+$$;
+
+create or replace function public.update_recipe_ingredient(
+  p_user_id uuid,
+  p_recipe_id uuid,
+  p_ingredient_id uuid,
+  p_checked boolean default null,
+  p_quantity numeric default null
+)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  update public.recipe_ingredients ri
+  set checked = coalesce(p_checked, ri.checked),
+      quantity = coalesce(p_quantity, ri.quantity)
+  from public.recipes r
+  where ri.id = p_ingredient_id
+    and ri.recipe_id = p_recipe_id
+    and r.id = ri.recipe_id
+    and r.user_id = p_user_id
+  returning ri.*;
+$$;
+
+create or replace function public.delete_recipe_ingredient(p_user_id uuid, p_recipe_id uuid, p_ingredient_id uuid)
+returns setof public.recipe_ingredients
+language sql
+as $$
+  delete from public.recipe_ingredients ri
+  using public.recipes r
+  where ri.id = p_ingredient_id
+    and ri.recipe_id = p_recipe_id
+    and r.id = ri.recipe_id
+    and r.user_id = p_user_id
+  returning ri.*;
+$$;
+
+revoke execute on function public.add_recipe_ingredient(uuid, uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.add_recipe_ingredient(uuid, uuid, jsonb) to service_role;
+revoke execute on function public.update_recipe_ingredient(uuid, uuid, uuid, boolean, numeric) from public, anon, authenticated;
+grant execute on function public.update_recipe_ingredient(uuid, uuid, uuid, boolean, numeric) to service_role;
+revoke execute on function public.delete_recipe_ingredient(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.delete_recipe_ingredient(uuid, uuid, uuid) to service_role;
+
+create or replace function public.import_branded_upcs(p_rows jsonb)
+returns table (upserted_count integer)
+language sql
+as $$
+  with barcodes as (
+    select distinct on (r.upc_normalized) r.upc_normalized, r.upc, r.fdc_id
+    from jsonb_to_recordset(p_rows) as r(upc_normalized text, upc text, fdc_id bigint)
+    order by r.upc_normalized, r.fdc_id desc
+  ), upserted as (
+    insert into public.upc_products as p (
+      upc_normalized, upc, source, source_name, usda_fdc_id,
+      calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g, updated_at
+    )
+    select b.upc_normalized, b.upc, 'usda', initcap(f.description), f.fdc_id::text,
+      f.calories_per_100g, f.protein_per_100g, f.carbs_per_100g, f.fat_per_100g, f.fiber_per_100g, now()
+    from barcodes b
+    join public.fdc_foods f on f.fdc_id = b.fdc_id
+    on conflict (upc_normalized) do update set
+      upc = excluded.upc,
+      source = excluded.source,
+      source_name = excluded.source_name,
+      usda_fdc_id = excluded.usda_fdc_id,
+      calories_per_100g = excluded.calories_per_100g,
+      protein_per_100g = excluded.protein_per_100g,
+      carbs_per_100g = excluded.carbs_per_100g,
+      fat_per_100g = excluded.fat_per_100g,
+      fiber_per_100g = excluded.fiber_per_100g,
+      updated_at = excluded.updated_at
+    where p.source <> 'usda' or p.usda_fdc_id::bigint <= excluded.usda_fdc_id::bigint
+    returning 1
+  )
+  select count(*)::integer from upserted;
+$$;
+
+revoke execute on function public.import_branded_upcs(jsonb) from public, anon, authenticated;
+grant execute on function public.import_branded_upcs(jsonb) to service_role;
+
+create table public.sync_horizon (
+  id boolean primary key default true check (id),
+  pruned_through xid8 not null
+);
+
+alter table public.sync_horizon enable row level security;
+
+create index deleted_rows_deleted_at_idx on public.deleted_rows (deleted_at);
+
+create or replace function public.prune_deleted_rows(p_older_than interval)
+returns table (pruned_count integer)
+language plpgsql
+as $$
+declare
+  pruned integer;
+  newest xid8;
+begin
+  with gone as (
+    delete from public.deleted_rows
+    where deleted_at < now() - p_older_than
+    returning deleted_xid
+  )
+  select count(*)::integer, (select g.deleted_xid from gone g order by g.deleted_xid desc limit 1)
+  into pruned, newest
+  from gone;
+
+  if newest is not null then
+    insert into public.sync_horizon as h (pruned_through) values (newest)
+    on conflict (id) do update set pruned_through = excluded.pruned_through
+    where h.pruned_through < excluded.pruned_through;
+  end if;
+  return query select pruned;
+end;
+$$;
+
+revoke execute on function public.prune_deleted_rows(interval) from public, anon, authenticated;
+grant execute on function public.prune_deleted_rows(interval) to service_role;
+
+drop function public.sync_changes(uuid, xid8);
+
+create function public.sync_changes(p_user_id uuid, p_since xid8)
+returns table (
+  next_cursor xid8,
+  meals jsonb,
+  recipes jsonb,
+  recipe_ingredients jsonb,
+  day_types jsonb,
+  day_logs jsonb,
+  deleted jsonb,
+  expired boolean
+)
+language sql stable
+as $$
+  with horizon as (
+    select exists (select 1 from public.sync_horizon s where s.pruned_through >= p_since) as expired
+  )
+  select
+    pg_snapshot_xmin(pg_current_snapshot()),
+    coalesce((
+      select jsonb_agg(to_jsonb(m) - 'change_xid' order by m.change_xid)
+      from public.meals m
+      where not h.expired and m.user_id = p_user_id and m.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(r) - 'change_xid' order by r.change_xid)
+      from public.recipes r
+      where not h.expired and r.user_id = p_user_id and r.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(ri) - 'change_xid' order by ri.change_xid)
+      from public.recipe_ingredients ri
+      join public.recipes r on r.id = ri.recipe_id
+      where not h.expired and r.user_id = p_user_id and ri.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dt) - 'change_xid' order by dt.change_xid)
+      from public.day_types dt
+      where not h.expired and dt.user_id = p_user_id and dt.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(to_jsonb(dl) - 'change_xid' order by dl.change_xid)
+      from public.day_logs dl
+      where not h.expired and dl.user_id = p_user_id and dl.change_xid >= p_since
+    ), '[]'),
+    coalesce((
+      select jsonb_agg(jsonb_build_object('table', d.table_name, 'key', d.row_key, 'deleted_at', d.deleted_at) order by d.id)
+      from public.deleted_rows d
+      where not h.expired and d.user_id = p_user_id and d.deleted_xid >= p_since
+    ), '[]'),
+    h.expired
+  from horizon h;
+$$;
+
+revoke execute on function public.sync_changes(uuid, xid8) from public, anon, authenticated;
+grant execute on function public.sync_changes(uuid, xid8) to service_role;
+
+create or replace function public.sync_page(p_user_id uuid, p_table text, p_after text, p_limit integer)
+returns table (next_cursor xid8, rows jsonb)
+language plpgsql stable
+as $$
+declare
+  owned text;
+  key_column text := 'id';
+  key_type text := 'uuid';
+begin
+  case p_table
+    when 'meals', 'recipes', 'day_types' then
+      owned := 't.user_id = $1';
+    when 'recipe_ingredients' then
+      owned := 'exists (select 1 from public.recipes r where r.id = t.recipe_id and r.user_id = $1)';
+    when 'day_logs' then
+      owned := 't.user_id = $1';
+      key_column := 'logged_date';
+      key_type := 'date';
+    else
+      raise exception 'unknown synced table: %', p_table using errcode = '22023';
+  end case;
+
+  return query execute format(
+    'select pg_snapshot_xmin(pg_current_snapshot()),
+       coalesce(jsonb_agg(to_jsonb(p) - ''change_xid'' order by p.%1$I), ''[]'')
+     from (
+       select * from public.%2$I t
+       where %3$s and ($2 is null or t.%1$I > $2::%4$s)
+       order by t.%1$I
+       limit $3
+     ) p',
+    key_column, p_table, owned, key_type
+  ) using p_user_id, p_after, p_limit;
+end;
+$$;
+
+revoke execute on function public.sync_page(uuid, text, text, integer) from public, anon, authenticated;
+grant execute on function public.sync_page(uuid, text, text, integer) to service_role;